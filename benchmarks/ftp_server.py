@@ -0,0 +1,97 @@
+"""Servidor FTP local que faz o papel do servidor do Ministério nos benchmarks.
+
+Serve uma pasta (ex.: com `.7z` gerados por synthetic_rais) em modo anônimo,
+com banda limitada por conexão de dados e latência acrescentada a cada
+resposta do canal de controle, para simular o servidor remoto.
+
+Uso:
+    python -m benchmarks.ftp_server pasta --port 2121 --bandwidth-mb 5 --latency-ms 80
+
+Depende do pyftpdlib (benchmarks/requirements.txt).
+"""
+import argparse
+import logging
+import multiprocessing
+import time
+
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler, ThrottledDTPHandler
+from pyftpdlib.log import config_logging
+from pyftpdlib.servers import FTPServer
+
+def make_server(root, host="127.0.0.1", port=0, bandwidth=0, latency=0.0):
+    """Cria o servidor; `bandwidth` em bytes/s por conexão (0 = sem limite), `latency` em segundos."""
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(root)
+
+    class DTPHandler(ThrottledDTPHandler):
+        read_limit = bandwidth
+        write_limit = bandwidth
+
+        def _throttle_bandwidth(self, len_chunk, max_speed):
+            # O original mede janelas de 1 s e deixa o primeiro segundo sem
+            # limite; aqui o total transferido segue a taxa desde o início
+            now = time.monotonic()
+            if not self._datacount:
+                self._started = now
+            self._datacount += len_chunk
+            sleepfor = self._started + self._datacount / max_speed - now
+            if sleepfor > 0.01:
+                def unsleep():
+                    self.add_channel(events=self.ioloop.READ if self.receive else self.ioloop.WRITE)
+
+                self.del_channel()
+                self._cancel_throttler()
+                self._throttler = self.ioloop.call_later(sleepfor, unsleep, _errback=self.handle_error)
+
+    class Handler(FTPHandler):
+        dtp_handler = DTPHandler if bandwidth else FTPHandler.dtp_handler
+        # sendfile ignora o limite de banda
+        use_sendfile = False
+
+        def respond(self, resp, *args, **kwargs):
+            if not latency:
+                return super().respond(resp, *args, **kwargs)
+            # Todas as respostas esperam o mesmo tempo, então a ordem é mantida
+            self.ioloop.call_later(latency, self._respond_later, resp, args, kwargs)
+
+        def _respond_later(self, resp, args, kwargs):
+            if self.connected:
+                super(Handler, self).respond(resp, *args, **kwargs)
+
+    Handler.authorizer = authorizer
+    server = FTPServer((host, port), Handler)
+    server.max_cons = 256
+    server.max_cons_per_ip = 0
+    return server
+
+def _serve(root, host, port, bandwidth, latency, address_queue):
+    # O log de cada comando poluiria a saída dos benchmarks
+    config_logging(level=logging.WARNING)
+    server = make_server(root, host, port, bandwidth, latency)
+    address_queue.put(server.address)
+    server.serve_forever(handle_exit=False)
+
+def start_server(root, host="127.0.0.1", port=0, bandwidth=0, latency=0.0):
+    """Inicia o servidor em outro processo e retorna (processo, "host:porta")."""
+    address_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(root, host, port, bandwidth, latency, address_queue),
+                                      daemon=True)
+    process.start()
+    bound_host, bound_port = address_queue.get(timeout=10)[:2]
+    return process, f"{bound_host}:{bound_port}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor FTP local com banda e latência configuráveis.")
+    parser.add_argument("root", help="pasta servida")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2121)
+    parser.add_argument("--bandwidth-mb", type=float, default=0, help="MB/s por conexão de dados (0 = sem limite)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="atraso de cada resposta do canal de controle")
+    args = parser.parse_args(argv)
+    server = make_server(args.root, args.host, args.port, int(args.bandwidth_mb * 1024 * 1024), args.latency_ms / 1000)
+    print(f"Servindo {args.root} em {server.address[0]}:{server.address[1]}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
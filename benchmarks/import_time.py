@@ -0,0 +1,83 @@
+"""Tempo de importação dos módulos da abertura do programa.
+
+Cada alvo é importado em um interpretador novo (sem nada em cache na
+memória), `--repeat` vezes, e é informada a mediana. Para cada alvo também
+são listadas as dependências pesadas que acabaram carregadas:
+
+    splash        o que gui.py importa antes de mostrar o splash
+    main_window   a janela principal, importada enquanto o splash está na tela
+    worker        download_manager, importado por cada processo de download
+    pandas        referência
+
+Uso:
+    python -m benchmarks.import_time --repeat 7
+    python -m benchmarks.import_time --root ../outra_copia --output antes.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+TARGETS = {
+    'splash': ("src.ui.splash_screen", "src.controllers.ftp_service"),
+    'main_window': ("src.ui.main_window",),
+    'worker': ("src.controllers.download_manager",),
+    'pandas': ("pandas",),
+}
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "py7zr", "PIL", "psutil")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def measure(modules, root=ROOT):
+    """Importa `modules` em um processo novo; retorna (segundos da importação, segundos do processo, pesados)."""
+    code = _CHILD.format(modules=tuple(modules), heavy=HEAVY_MODULES)
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+    process_seconds = time.perf_counter() - started
+    result = json.loads(output.strip().splitlines()[-1])
+    return result['seconds'], process_seconds, result['loaded']
+
+def run(args):
+    results = []
+    print(f"{'alvo':<14}{'importação':>12}{'processo':>12}  pesados carregados")
+    for name in args.only or TARGETS:
+        # A primeira execução compila os .pyc e aquece o cache de disco
+        measure(TARGETS[name], args.root)
+        samples = [measure(TARGETS[name], args.root) for _ in range(args.repeat)]
+        summary = {'name': name, 'modules': list(TARGETS[name]),
+                   'import_seconds': round(statistics.median(s[0] for s in samples), 4),
+                   'process_seconds': round(statistics.median(s[1] for s in samples), 4),
+                   'heavy_loaded': samples[-1][2]}
+        results.append(summary)
+        print(f"{name:<14}{summary['import_seconds'] * 1000:>9.0f} ms{summary['process_seconds'] * 1000:>9.0f} ms  "
+              f"{', '.join(summary['heavy_loaded']) or '-'}")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'root': os.path.abspath(args.root),
+                       'python': sys.version.split()[0], 'repeat': args.repeat, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.output}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação dos módulos da abertura do programa.")
+    parser.add_argument("--repeat", type=int, default=5, help="execuções por alvo (padrão: %(default)s)")
+    parser.add_argument("--only", nargs="+", choices=list(TARGETS), help="alvos a medir (padrão: todos)")
+    parser.add_argument("--root", default=ROOT, help="cópia do projeto a medir (padrão: esta)")
+    parser.add_argument("--output", help="arquivo JSON de resultados")
+    return run(parser.parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
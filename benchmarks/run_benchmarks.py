@@ -0,0 +1,329 @@
+"""Benchmarks das etapas do pipeline com dados sintéticos e FTP local.
+
+Gera um arquivo de vínculos (synthetic_rais), comprime em `.7z`, serve pelo
+FTP local (ftp_server) com a banda e a latência pedidas e mede, cada etapa
+em um processo próprio:
+
+    download      worker_download do servidor local
+    decompress    worker_decompress do .7z
+    parse         leitura e conversão dos chunks (_iter_rais_chunks)
+    sqlite_load   importação para o banco (worker_process_db, com agregados)
+    indexes       criação dos índices e ANALYZE
+    export_<fmt>  exportação para SQLite, TXT, CSV, EXCEL e PARQUET
+
+Para cada etapa são gravados o tempo, MB/s, linhas/s e o pico de memória
+(RSS somado do processo e dos filhos) em `benchmarks/results/<data>.json`,
+junto com a máquina e a configuração. Duas execuções são comparadas com
+`--compare`.
+
+Uso:
+    python -m benchmarks.run_benchmarks --size-mb 200 --bandwidth-mb 20 --latency-ms 50
+    python -m benchmarks.run_benchmarks --rows 100000 --only parse sqlite_load
+    python -m benchmarks.run_benchmarks --compare results/antes.json results/depois.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from queue import Empty, Queue
+
+import pandas as pd
+import psutil
+import py7zr
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.ftp_server import start_server
+from benchmarks.synthetic_rais import TEMPLATE_PATH, RaisTemplate, generate
+from src.controllers.aggregates import DEFAULT_AGGREGATES
+from src.controllers.download_manager import (DownloadManager, IMPORT_CHUNK_SIZE, _iter_rais_chunks,
+                                              worker_build_indexes, worker_decompress, worker_download,
+                                              worker_process_db)
+from src.controllers.index_builder import DEFAULT_INDEXES
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+YEAR = "2021"
+ARCHIVE_NAME = "RAIS_VINC_PUB_SINTETICO.7z"
+TEXT_NAME = "RAIS_VINC_PUB_SINTETICO.txt"
+REMOTE_DIR = f"/pdet/microdados/RAIS/{YEAR}"
+EXPORT_FORMATS = ("SQLite", "TXT", "CSV", "EXCEL", "PARQUET")
+EXPORT_EXTENSIONS = {"SQLite": ".db", "TXT": ".txt", "CSV": ".csv", "EXCEL": ".xlsx"}
+BENCHMARKS = ("download", "decompress", "parse", "sqlite_load", "indexes") + tuple(f"export_{f.lower()}" for f in EXPORT_FORMATS)
+RSS_INTERVAL = 0.05  # segundos entre amostras de memória
+
+class _Discard:
+    """Fila de mensagens que descarta tudo (os workers só precisam de `put`)."""
+
+    def put(self, item, *args, **kwargs):
+        pass
+
+def _worker_result(result_queue):
+    ok, value, detail = result_queue.get_nowait()
+    if not ok:
+        raise RuntimeError(detail)
+    return value
+
+def _bench_download(ctx):
+    dest = os.path.join(ctx['work_dir'], f"{YEAR}_{ARCHIVE_NAME}")
+    for path in (dest, dest + ".part", dest + ".segpart", dest + ".segpart.json"):
+        if os.path.exists(path):
+            os.remove(path)
+    result_queue = Queue()
+    worker_download(ctx['ftp_host'], f"{REMOTE_DIR}/{ARCHIVE_NAME}", dest, YEAR, _Discard(), result_queue,
+                    ctx['segments'])
+    _worker_result(result_queue)
+    return {'bytes': os.path.getsize(dest)}
+
+def _bench_decompress(ctx):
+    out_dir = os.path.join(ctx['work_dir'], "descomprimido")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    result_queue = Queue()
+    worker_decompress(ctx['archive'], out_dir, _Discard(), YEAR, result_queue)
+    extracted = _worker_result(result_queue)
+    return {'bytes': sum(os.path.getsize(p) for p in extracted)}
+
+def _bench_parse(ctx):
+    rows = 0
+    for chunk in _iter_rais_chunks(ctx['text'], YEAR, chunk_size=ctx['chunk_size'], parse_workers=ctx['parse_workers']):
+        rows += len(chunk)
+    return {'bytes': os.path.getsize(ctx['text']), 'rows': rows}
+
+def _bench_sqlite_load(ctx):
+    db_path = ctx['db_path']
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    result_queue = Queue()
+    worker_process_db(ctx['text'], YEAR, db_path, _Discard(), None, result_queue, parse_workers=ctx['parse_workers'],
+                      aggregates=DEFAULT_AGGREGATES, chunk_size=ctx['chunk_size'])
+    _worker_result(result_queue)
+    return {'bytes': os.path.getsize(ctx['text']), 'rows': _count_rows(db_path)}
+
+def _bench_indexes(ctx):
+    db_path = ctx['db_path']
+    if not os.path.exists(db_path):
+        raise RuntimeError("o banco não existe; rode também sqlite_load")
+    # build_indexes mantém os índices que já existem; cada repetição mede a criação de todos
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            for spec in DEFAULT_INDEXES:
+                conn.execute(f'DROP INDEX IF EXISTS "{spec.name}"')
+    finally:
+        conn.close()
+    result_queue = Queue()
+    worker_build_indexes(db_path, DownloadManager.NOME_TABELA_FINAL, DEFAULT_INDEXES, _Discard(), result_queue)
+    timings = _worker_result(result_queue)
+    return {'rows': _count_rows(db_path), 'detail': {name: round(secs, 3) for name, secs in timings}}
+
+def _bench_export(ctx, export_format):
+    out_dir = os.path.join(ctx['work_dir'], "exportados")
+    os.makedirs(out_dir, exist_ok=True)
+    if export_format == "PARQUET":
+        dest = os.path.join(out_dir, "parquet")
+        shutil.rmtree(dest, ignore_errors=True)
+    else:
+        dest = os.path.join(out_dir, f"{YEAR}_sintetico{EXPORT_EXTENSIONS[export_format]}")
+        if os.path.exists(dest):
+            os.remove(dest)
+    messages = Queue()
+    # O nome com o ano define a partição do Parquet, como nos .txt extraídos
+    DownloadManager(messages).export_file(ctx['text'], dest, export_format, None)
+    while True:
+        msg_type, value = messages.get_nowait()
+        if msg_type == "EXPORT_COMPLETE":
+            break
+    if not value['ok']:
+        raise RuntimeError(value['message'])
+    return {'bytes': os.path.getsize(ctx['text']), 'rows': ctx['rows']}
+
+def _count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT count(*) FROM {DownloadManager.NOME_TABELA_FINAL}").fetchone()[0]
+    finally:
+        conn.close()
+
+def _bench_function(name):
+    if name.startswith("export_"):
+        export_format = next(f for f in EXPORT_FORMATS if f.lower() == name[len("export_"):])
+        return lambda ctx: _bench_export(ctx, export_format)
+    return globals()[f"_bench_{name}"]
+
+def _run_child(name, ctx, result_queue):
+    started = time.perf_counter()
+    try:
+        result = _bench_function(name)(ctx)
+        result.update(ok=True, error=None)
+    except Exception as e:
+        result = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+    result['seconds'] = time.perf_counter() - started
+    result_queue.put(result)
+
+def _tree_rss(process):
+    try:
+        processes = [process] + process.children(recursive=True)
+    except psutil.Error:
+        return 0
+    total = 0
+    for p in processes:
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+def run_benchmark(name, ctx):
+    """Executa a etapa `name` em um processo próprio e retorna o resultado com o pico de RSS."""
+    result_queue = multiprocessing.Queue(maxsize=1)
+    child = multiprocessing.Process(target=_run_child, args=(name, ctx, result_queue))
+    child.start()
+    monitor = psutil.Process(child.pid)
+    peak = 0
+    result = None
+    while result is None:
+        peak = max(peak, _tree_rss(monitor))
+        try:
+            result = result_queue.get(timeout=RSS_INTERVAL)
+        except Empty:
+            if not child.is_alive():
+                result = {'ok': False, 'error': f"processo terminou com código {child.exitcode}", 'seconds': None}
+    child.join()
+
+    seconds = result['seconds']
+    summary = {'name': name, 'ok': result['ok'], 'error': result['error'],
+               'seconds': round(seconds, 3) if seconds is not None else None,
+               'peak_rss_mb': round(peak / 1048576, 1)}
+    if result['ok']:
+        if result.get('bytes') is not None:
+            summary['bytes'] = result['bytes']
+            summary['mb_per_s'] = round(result['bytes'] / 1048576 / seconds, 2) if seconds else None
+        if result.get('rows') is not None:
+            summary['rows'] = result['rows']
+            summary['rows_per_s'] = round(result['rows'] / seconds) if seconds else None
+        if result.get('detail'):
+            summary['detail'] = result['detail']
+    return summary
+
+def prepare_data(work_dir, rows, size_bytes, seed, template_path):
+    """Gera o .txt e o .7z sintéticos (reaproveitando os de uma execução igual) e retorna os caminhos."""
+    template = RaisTemplate.from_file(template_path)
+    if rows is None:
+        rows = max(1, int(size_bytes / template.row_bytes))
+    data_dir = os.path.join(work_dir, f"dados_{rows}_{seed}")
+    text = os.path.join(data_dir, f"{YEAR}_{TEXT_NAME}")
+    ftp_root = os.path.join(data_dir, "ftp")
+    archive = os.path.join(ftp_root, REMOTE_DIR.lstrip("/"), ARCHIVE_NAME)
+    if not (os.path.exists(text) and os.path.exists(archive)):
+        os.makedirs(os.path.dirname(archive), exist_ok=True)
+        print(f"Gerando {rows} linhas sintéticas...")
+        generate(text, rows, template=template, seed=seed)
+        print(f"Comprimindo {os.path.getsize(text) / 1048576:.1f} MB em .7z...")
+        with py7zr.SevenZipFile(archive + ".tmp", 'w') as z:
+            z.write(text, TEXT_NAME)
+        os.replace(archive + ".tmp", archive)
+    return rows, text, archive, ftp_root
+
+def machine_info():
+    memory = psutil.virtual_memory()
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'cpu_count': os.cpu_count(),
+            'memory_gb': round(memory.total / 1024 ** 3, 1), 'pandas': pd.__version__,
+            'sqlite': sqlite3.sqlite_version, 'py7zr': py7zr.__version__}
+
+def run(args):
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="rais_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    size_bytes = args.size_mb * 1048576 if args.size_mb else None
+    rows, text, archive, ftp_root = prepare_data(work_dir, args.rows, size_bytes, args.seed, args.template)
+
+    server = None
+    selected = args.only or BENCHMARKS
+    ctx = {'work_dir': work_dir, 'text': text, 'archive': archive, 'rows': rows,
+           'db_path': os.path.join(work_dir, "rais.db"), 'segments': args.segments,
+           'parse_workers': args.parse_workers, 'chunk_size': args.chunk_size}
+    results = []
+    try:
+        if "download" in selected:
+            server, ctx['ftp_host'] = start_server(ftp_root, bandwidth=int(args.bandwidth_mb * 1048576),
+                                                   latency=args.latency_ms / 1000)
+        for name in BENCHMARKS:
+            if name not in selected:
+                continue
+            print(f"{name}...", end=" ", flush=True)
+            summary = run_benchmark(name, ctx)
+            results.append(summary)
+            if summary['ok']:
+                print(f"{summary['seconds']:.2f} s, pico de {summary['peak_rss_mb']:.0f} MB")
+            else:
+                print(f"erro: {summary['error']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.join()
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {'created': time.strftime("%Y-%m-%dT%H:%M:%S"), 'machine': machine_info(),
+              'config': {'rows': rows, 'text_bytes': os.path.getsize(text) if os.path.exists(text) else None,
+                         'seed': args.seed, 'bandwidth_mb': args.bandwidth_mb, 'latency_ms': args.latency_ms,
+                         'segments': args.segments, 'parse_workers': args.parse_workers,
+                         'chunk_size': args.chunk_size},
+              'results': results}
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d_%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {output}")
+    return 0 if all(r['ok'] for r in results) else 1
+
+def compare(path_a, path_b):
+    """Imprime as métricas de duas execuções lado a lado, com a razão B/A."""
+    reports = []
+    for path in (path_a, path_b):
+        with open(path, encoding='utf-8') as f:
+            reports.append({r['name']: r for r in json.load(f)['results']})
+    print(f"{'etapa':<16}{'métrica':<13}{'A':>12}{'B':>12}{'B/A':>8}")
+    for name in BENCHMARKS:
+        a, b = reports[0].get(name), reports[1].get(name)
+        if not a or not b:
+            continue
+        for metric in ('seconds', 'mb_per_s', 'rows_per_s', 'peak_rss_mb'):
+            value_a, value_b = a.get(metric), b.get(metric)
+            if value_a is None or value_b is None:
+                continue
+            ratio = f"{value_b / value_a:.2f}" if value_a else "-"
+            print(f"{name:<16}{metric:<13}{value_a:>12,.2f}{value_b:>12,.2f}{ratio:>8}")
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede as etapas do pipeline com dados sintéticos e FTP local.")
+    parser.add_argument("--compare", nargs=2, metavar=("A.json", "B.json"), help="compara duas execuções e sai")
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--rows", type=int, help="linhas do arquivo sintético")
+    size.add_argument("--size-mb", type=float, default=100, help="tamanho aproximado do .txt (padrão: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--template", default=TEMPLATE_PATH, help="arquivo modelo (padrão: %(default)s)")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="etapas a medir (padrão: todas)")
+    parser.add_argument("--bandwidth-mb", type=float, default=0, help="MB/s por conexão do FTP local (0 = sem limite)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="latência de cada resposta do FTP local")
+    parser.add_argument("--segments", type=int, default=DownloadManager.DEFAULT_SEGMENTS_PER_FILE,
+                        help="conexões por arquivo grande no download")
+    parser.add_argument("--parse-workers", type=int, default=DownloadManager.DEFAULT_PARSE_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument("--work-dir", help="pasta de trabalho mantida entre execuções (os dados gerados são reaproveitados)")
+    parser.add_argument("--output", help="arquivo JSON de resultados (padrão: benchmarks/results/<data>.json)")
+    args = parser.parse_args(argv)
+    if args.compare:
+        return compare(*args.compare)
+    return run(args)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Gerador de arquivos sintéticos de vínculos da RAIS, de qualquer tamanho.
+
+Cada coluna é sorteada da distribuição de valores do arquivo modelo
+(data/RAIS_VINC_PUB_NI.txt), com o texto exatamente como aparece nele:
+cabeçalho em latin-1, espaços de preenchimento, vírgula decimal, `n/d`,
+códigos de "ignorado" etc. As colunas são sorteadas de forma independente,
+então a cardinalidade e a taxa de compressão ficam próximas das de um
+arquivo real, mas as combinações entre colunas não.
+
+Uso:
+    python -m benchmarks.synthetic_rais saida.txt --size-mb 500
+    python -m benchmarks.synthetic_rais saida.txt --rows 1000000 --seed 7
+"""
+import argparse
+import os
+from collections import Counter
+
+import numpy as np
+
+TEMPLATE_PATH = os.path.join("data", "RAIS_VINC_PUB_NI.txt")
+BLOCK_ROWS = 50000
+# Colunas constantes no modelo sorteadas com os valores de outra coluna.
+# No arquivo NI o Município é sempre 999999; o do local de trabalho dá
+# municípios reais e, com eles, partições por UF no Parquet.
+SUBSTITUTE_COLUMNS = {'Município': 'Mun Trab'}
+
+class RaisTemplate:
+    """Distribuição de valores de cada coluna de um arquivo de vínculos."""
+
+    def __init__(self, header, names, values, probabilities, newline, row_bytes):
+        self.header = header
+        self.names = names
+        # Por coluna: valores distintos (bytes) e a probabilidade de cada um
+        self.values = values
+        self.probabilities = probabilities
+        self.newline = newline
+        self.row_bytes = row_bytes
+
+    @classmethod
+    def from_file(cls, path=TEMPLATE_PATH, encoding='latin-1'):
+        with open(path, 'rb') as f:
+            data = f.read()
+        newline = b'\r\n' if b'\r\n' in data[:65536] else b'\n'
+        lines = data.split(newline)
+        header = lines[0]
+        names = header.decode(encoding).split(';')
+        rows = [line.split(b';') for line in lines[1:] if line]
+        rows = [row for row in rows if len(row) == len(names)]
+        if not rows:
+            raise ValueError(f"nenhuma linha válida no arquivo modelo {path}")
+        values, probabilities = [], []
+        for i in range(len(names)):
+            counts = Counter(row[i] for row in rows)
+            column_values = np.empty(len(counts), dtype=object)
+            column_values[:] = list(counts)
+            values.append(column_values)
+            weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+            probabilities.append(weights / weights.sum())
+        row_bytes = (len(data) - len(header)) / len(rows)
+        return cls(header, names, values, probabilities, newline, row_bytes)
+
+    def sample_block(self, rng, count):
+        """`count` linhas sorteadas, já unidas em bytes (terminando com a quebra de linha)."""
+        sampled = {}
+        columns = []
+        for name, values, probabilities in zip(self.names, self.values, self.probabilities):
+            source = SUBSTITUTE_COLUMNS.get(name)
+            if len(values) == 1 and source in self.names:
+                column = sampled.get(source)
+                if column is None:
+                    i = self.names.index(source)
+                    column = self.values[i][rng.choice(len(self.values[i]), count, p=self.probabilities[i])].tolist()
+                    sampled[source] = column
+            elif len(values) == 1:
+                column = [values[0]] * count
+            else:
+                column = values[rng.choice(len(values), count, p=probabilities)].tolist()
+                sampled[name] = column
+            columns.append(column)
+        return self.newline.join(map(b';'.join, zip(*columns))) + self.newline
+
+def generate(path, rows=None, size_bytes=None, template=None, seed=0, block_rows=BLOCK_ROWS):
+    """Grava um arquivo com `rows` linhas (ou cerca de `size_bytes` bytes) e retorna o número de linhas."""
+    template = template or RaisTemplate.from_file()
+    if rows is None:
+        if size_bytes is None:
+            raise ValueError("informe rows ou size_bytes")
+        rows = max(1, int(size_bytes / template.row_bytes))
+    rng = np.random.default_rng(seed)
+    written = 0
+    with open(path, 'wb') as f:
+        f.write(template.header + template.newline)
+        while written < rows:
+            count = min(block_rows, rows - written)
+            f.write(template.sample_block(rng, count))
+            written += count
+    return written
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera um arquivo sintético de vínculos da RAIS.")
+    parser.add_argument("output", help="arquivo .txt de saída")
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--rows", type=int, help="número de linhas")
+    size.add_argument("--size-mb", type=float, help="tamanho aproximado em MB")
+    parser.add_argument("--template", default=TEMPLATE_PATH, help="arquivo modelo (padrão: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    size_bytes = args.size_mb * 1024 * 1024 if args.size_mb else None
+    rows = generate(args.output, args.rows, size_bytes, RaisTemplate.from_file(args.template), args.seed)
+    print(f"{rows} linhas gravadas em {args.output} ({os.path.getsize(args.output) / 1048576:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Execução da ferramenta sem interface gráfica, para servidores e agendadores.
+
+Percorre catálogo → download → descompressão → importação/exportação a partir
+dos argumentos ou de um arquivo de tarefa (JSON com as mesmas opções), e
+escreve o progresso em stdout como uma linha JSON por evento:
+
+    {"ts": 1700000000.0, "event": "LOG", "value": "OK: RAIS_VINC_PUB_SUL.7z"}
+
+Os eventos METRIC (uma etapa de um arquivo: bytes, linhas, tempo, CPU e
+pico de memória) também são gravados em um arquivo de métricas da execução.
+O último evento é RESULT, com o código de saída, os arquivos extraídos, as
+falhas e os totais de cada etapa. Códigos de saída: 0 sucesso, 1 falha em algum arquivo ou etapa, 2
+argumentos inválidos, 3 catálogo indisponível ou nenhum arquivo selecionado,
+130 interrompido (Ctrl+C ou SIGTERM).
+
+Exemplos:
+    python cli.py --years 2021 --files "RAIS_VINC_PUB_*" --output db
+    python cli.py --job tarefas/sul_2021.json --parse-workers 31
+"""
+import argparse
+import fnmatch
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from queue import Empty
+
+from src.controllers.ftp_service import FTPService
+from src.controllers.download_manager import DownloadManager
+from src.controllers.parquet_sink import ParquetDatasetWriter
+from src.controllers.row_filter import RowFilter
+from src.controllers.stage_metrics import METRIC, MetricsLog, StageTotals
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+EXIT_NO_DATA = 3
+EXIT_INTERRUPTED = 130
+
+OUTPUTS = ("txt", "db", "parquet")
+EXPORT_FORMATS = ("SQLite", "TXT", "CSV", "EXCEL", "PARQUET")
+EXPORT_EXTENSIONS = {"SQLite": ".db", "TXT": ".txt", "CSV": ".csv", "EXCEL": ".xlsx"}
+
+class ProgressPrinter(threading.Thread):
+    """Consome a fila de mensagens dos controladores e escreve cada uma como JSON em `stream`.
+
+    Guarda a última mensagem de cada tipo em `last`; `sync()` espera até que
+    tudo o que foi posto na fila antes dela tenha sido escrito. Os eventos
+    METRIC também vão para `metrics_log` e são somados em `totals`.
+    """
+    SYNC = "CLI_SYNC"
+
+    def __init__(self, queue, stream=sys.stdout, metrics_log=None):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.stream = stream
+        self.metrics_log = metrics_log
+        self.totals = StageTotals()
+        self.last = {}
+        self._synced = threading.Condition()
+        self._sync_count = 0
+        self._stopping = False
+
+    def emit(self, event, value=None, **fields):
+        record = {'ts': round(time.time(), 3), 'event': event}
+        if value is not None:
+            record['value'] = value
+        record.update(fields)
+        self.stream.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.stream.flush()
+
+    def run(self):
+        while not self._stopping:
+            try:
+                msg_type, value = self.queue.get(timeout=0.2)
+            except Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if msg_type == self.SYNC:
+                with self._synced:
+                    self._sync_count = max(self._sync_count, value)
+                    self._synced.notify_all()
+                continue
+            self.last[msg_type] = value
+            if msg_type == METRIC:
+                self.totals.add(value)
+                if self.metrics_log is not None:
+                    self.metrics_log.write(value)
+            self.emit(msg_type, value)
+
+    def sync(self, timeout=10):
+        with self._synced:
+            token = self._sync_count + 1
+            self.queue.put((self.SYNC, token))
+            self._synced.wait_for(lambda: self._sync_count >= token, timeout)
+
+    def stop(self):
+        self.sync()
+        self._stopping = True
+        self.join(timeout=1)
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Baixa, descomprime e importa microdados da RAIS sem interface gráfica.")
+    parser.add_argument("--job", help="arquivo JSON com as opções (os argumentos da linha de comando têm precedência)")
+    parser.add_argument("--list", action="store_true", help="apenas publica o catálogo do FTP (evento CATALOG) e sai")
+    parser.add_argument("--years", nargs="+", help="anos a processar (padrão: todos do catálogo)")
+    parser.add_argument("--files", nargs="+",
+                        help="arquivos .7z a baixar; aceita curingas, ex.: 'RAIS_VINC_PUB_*' (padrão: todos)")
+    parser.add_argument("--output", choices=OUTPUTS, default="db",
+                        help="txt: só extrai; db: importa no banco; parquet: grava o dataset Parquet (padrão: db)")
+    parser.add_argument("--stream-import", action="store_true",
+                        help="importa direto dos .7z, sem gravar os .txt em disco")
+    parser.add_argument("--compression", choices=ParquetDatasetWriter.COMPRESSIONS,
+                        default=ParquetDatasetWriter.DEFAULT_COMPRESSION,
+                        help="compressão dos arquivos Parquet (padrão: %(default)s)")
+    parser.add_argument("--filter", dest="row_filter", help="filtro de linhas, ex.: 'Município = 355030; Idade entre 18 e 29'")
+    parser.add_argument("--normalized", action="store_true",
+                        help="grava o banco com tabelas de dimensão (em um banco já criado no outro modo, use --replace)")
+    parser.add_argument("--replace", action="store_true",
+                        help="descarta a tabela, o manifesto e os agregados existentes antes de importar")
+    parser.add_argument("--covering-indexes", action="store_true", help="cria também os índices de cobertura")
+    parser.add_argument("--export", choices=EXPORT_FORMATS, help="exporta cada .txt extraído neste formato")
+    parser.add_argument("--export-dir", help="pasta de destino da exportação (padrão: data/exportados)")
+    parser.add_argument("--max-connections", type=int, default=DownloadManager.DEFAULT_MAX_CONNECTIONS,
+                        help="downloads simultâneos")
+    parser.add_argument("--segments", type=int, default=DownloadManager.DEFAULT_SEGMENTS_PER_FILE,
+                        help="conexões por arquivo grande (download segmentado)")
+    parser.add_argument("--decompress-workers", type=int, default=DownloadManager.DEFAULT_DECOMPRESS_WORKERS,
+                        help="descompressões simultâneas")
+    parser.add_argument("--parse-workers", type=int, default=DownloadManager.DEFAULT_PARSE_WORKERS,
+                        help="processos de leitura de cada .txt importado")
+    parser.add_argument("--chunk-size", type=int, default=DownloadManager.DEFAULT_CHUNK_SIZE,
+                        help="linhas por chunk na importação sequencial e direta do .7z")
+    parser.add_argument("--listing-connections", type=int, default=FTPService.DEFAULT_LISTING_CONNECTIONS,
+                        help="conexões usadas para listar o catálogo")
+    parser.add_argument("--ftp-host", default=FTPService.FTP_HOST, help="servidor FTP (ou espelho) dos microdados")
+    parser.add_argument("--metrics-file", help="arquivo JSON Lines com as métricas de cada etapa "
+                                               "(padrão: data/metricas/<data>_<pid>.jsonl)")
+    return parser
+
+def _check_job_values(parser, args, dests):
+    """Aplica `type` e `choices` de cada opção aos valores vindos do arquivo de tarefa."""
+    for action in parser._actions:
+        if action.dest not in dests:
+            continue
+        value = getattr(args, action.dest)
+        if value is None:
+            continue
+        option = action.option_strings[0] if action.option_strings else action.dest
+        if action.nargs == 0:
+            if not isinstance(value, bool):
+                parser.error(f"{option} no arquivo de tarefa deve ser true ou false")
+            continue
+        is_list = action.nargs in ('+', '*')
+        if is_list and not isinstance(value, list):
+            parser.error(f"{option} no arquivo de tarefa deve ser uma lista")
+        values = value if is_list else [value]
+        if action.type is not None:
+            try:
+                values = [action.type(v) for v in values]
+            except (TypeError, ValueError):
+                parser.error(f"valor inválido para {option} no arquivo de tarefa: {value!r}")
+        if action.choices is not None:
+            invalid = [v for v in values if v not in action.choices]
+            if invalid:
+                parser.error(f"valor inválido para {option} no arquivo de tarefa: {invalid[0]!r} "
+                             f"(opções: {', '.join(map(str, action.choices))})")
+        setattr(args, action.dest, values if is_list else values[0])
+
+def parse_args(argv):
+    """Lê os argumentos; as opções do arquivo de tarefa viram os valores padrão."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.job:
+        try:
+            with open(args.job, encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"não foi possível ler o arquivo de tarefa {args.job}: {e}")
+        if not isinstance(job, dict):
+            parser.error("o arquivo de tarefa deve conter um objeto JSON")
+        known = {action.dest for action in parser._actions}
+        unknown = sorted(key.replace('-', '_') for key in job if key.replace('-', '_') not in known)
+        if unknown:
+            parser.error(f"opções desconhecidas no arquivo de tarefa: {', '.join(unknown)}")
+        parser.set_defaults(**{key.replace('-', '_'): value for key, value in job.items()})
+        args = parser.parse_args(argv)
+        # Os valores padrão não passam pelas validações do argparse
+        _check_job_values(parser, args, {key.replace('-', '_') for key in job})
+    if args.years:
+        args.years = [str(year) for year in args.years]
+    if args.stream_import and args.output == "txt":
+        parser.error("--stream-import exige --output db ou parquet")
+    if args.stream_import and args.export:
+        parser.error("--export precisa dos .txt extraídos e não pode ser usado com --stream-import")
+    return parser, args
+
+def select_files(available_data, years, patterns):
+    """Retorna (anos, arquivos) do catálogo que correspondem aos anos e padrões pedidos."""
+    years = [y for y in (years or available_data) if y in available_data]
+    names = sorted({name for y in years for name in available_data[y]['files']})
+    if patterns:
+        names = [name for name in names if any(fnmatch.fnmatch(name.lower(), p.lower()) for p in patterns)]
+    return years, names
+
+def export_files(manager, printer, txt_paths, export_format, export_dir, compression, row_filter):
+    """Exporta cada .txt e retorna os nomes dos que falharam."""
+    os.makedirs(export_dir, exist_ok=True)
+    failures = []
+    for txt_path in txt_paths:
+        if export_format == "PARQUET":
+            dest = export_dir
+        else:
+            dest = os.path.join(export_dir, os.path.splitext(os.path.basename(txt_path))[0] + EXPORT_EXTENSIONS[export_format])
+        manager.export_file(txt_path, dest, export_format, None, compression, row_filter)
+        printer.sync()
+        if not printer.last.get("EXPORT_COMPLETE", {}).get('ok'):
+            failures.append(os.path.basename(txt_path))
+    return failures
+
+def run(args, printer, queue):
+    ftp_service = FTPService(queue, args.listing_connections)
+    ftp_service.FTP_HOST = args.ftp_host
+    ftp_service.fetch_available_data()
+    printer.sync()
+    updated = printer.last.get("CATALOG_UPDATED")
+    available_data = updated['data'] if updated else printer.last.get("FETCH_COMPLETE")
+    if not available_data:
+        printer.emit("RESULT", exit_code=EXIT_NO_DATA, error="catálogo do FTP indisponível")
+        return EXIT_NO_DATA
+    if args.list:
+        printer.emit("CATALOG", available_data)
+        return EXIT_OK
+
+    years, files = select_files(available_data, args.years, args.files)
+    if not files:
+        printer.emit("RESULT", exit_code=EXIT_NO_DATA, error="nenhum arquivo do catálogo corresponde à seleção")
+        return EXIT_NO_DATA
+
+    row_filter = RowFilter.parse(args.row_filter) if args.row_filter else None
+    manager = DownloadManager(queue, args.max_connections, args.segments, args.decompress_workers,
+                              args.parse_workers, covering_indexes=args.covering_indexes, chunk_size=args.chunk_size)
+    manager.ftp_host = args.ftp_host
+    started = time.perf_counter()
+    try:
+        manager.start_processing(years, files, available_data, stream_import=args.stream_import,
+                                 import_to_db=args.output != "txt", parquet_output=args.output == "parquet",
+                                 parquet_compression=args.compression, row_filter=row_filter,
+                                 normalized_storage=args.normalized, replace=args.replace)
+        failures = list(manager.failures)
+        if args.export:
+            export_dir = args.export_dir or os.path.join(DownloadManager.DATA_DIR, "exportados")
+            failures += export_files(manager, printer, manager.extracted_files, args.export, export_dir,
+                                     args.compression, row_filter)
+    except KeyboardInterrupt:
+        manager.cancel_active_downloads()
+        printer.sync()
+        printer.emit("RESULT", exit_code=EXIT_INTERRUPTED, error="interrompido")
+        return EXIT_INTERRUPTED
+
+    printer.sync()
+    exit_code = EXIT_FAILURES if failures else EXIT_OK
+    printer.emit("RESULT", exit_code=exit_code, elapsed=round(time.perf_counter() - started, 1),
+                 extracted=manager.extracted_files, failures=failures, stages=dict(printer.totals.ordered()),
+                 metrics_file=printer.metrics_log.path if printer.totals.stages else None)
+    return exit_code
+
+def main(argv=None):
+    parser, args = parse_args(argv)
+    if args.row_filter:
+        try:
+            RowFilter.parse(args.row_filter)
+        except ValueError as e:
+            parser.error(f"filtro de linhas inválido: {e}")
+
+    main_pid = os.getpid()
+
+    def on_sigterm(signum, frame):
+        # Os processos de trabalho herdam o tratador no fork e devem só terminar
+        if os.getpid() != main_pid:
+            os._exit(128 + signum)
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+
+    queue = multiprocessing.Queue()
+    metrics_log = MetricsLog(args.metrics_file)
+    printer = ProgressPrinter(queue, metrics_log=metrics_log)
+    printer.start()
+    try:
+        return run(args, printer, queue)
+    except KeyboardInterrupt:
+        printer.emit("RESULT", exit_code=EXIT_INTERRUPTED, error="interrompido")
+        return EXIT_INTERRUPTED
+    finally:
+        printer.stop()
+        metrics_log.close()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
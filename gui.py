@@ -3,43 +3,79 @@ import multiprocessing
 import threading
 from queue import Empty
 
-from src.ui.main_window import MainApplicationWindow
+# Só o necessário para o splash: a janela principal (e com ela pandas, py7zr
+# etc.) é importada em segundo plano enquanto o splash já está na tela
 from src.ui.splash_screen import SplashScreen
 from src.controllers.ftp_service import FTPService
 
-def check_queue(root, queue, splash):
-    try:
-        message = queue.get_nowait()
+class MainWindowLoader(threading.Thread):
+    """Importa a janela principal em segundo plano; o erro, se houver, é relançado em `window_class()`."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self._window_class = None
+        self._error = None
+
+    def run(self):
+        try:
+            from src.ui.main_window import MainApplicationWindow
+            self._window_class = MainApplicationWindow
+        except BaseException as e:
+            self._error = e
+
+    def window_class(self):
+        if self._error is not None:
+            raise self._error
+        return self._window_class
+
+def check_queue(root, queue, splash, loader, fetched_data=None):
+    last_status = None
+    # Depois do FETCH_COMPLETE as mensagens seguintes ficam na fila para a janela principal
+    while fetched_data is None:
+        try:
+            message = queue.get_nowait()
+        except Empty:
+            break
         msg_type, value = message
 
         if msg_type == "LOG":
-            splash.update_status(value)
+            last_status = value
         elif msg_type == "FETCH_COMPLETE":
-            splash.close()
-            app = MainApplicationWindow(root, queue, fetched_data=value)
-            return # Stop checking the queue
-    except Empty:
-        pass
-    
-    root.after(100, check_queue, root, queue, splash)
+            fetched_data = value
+
+    if fetched_data is not None and not loader.is_alive():
+        splash.close()
+        app = loader.window_class()(root, queue, fetched_data=fetched_data)
+        return # Stop checking the queue
+
+    if fetched_data is not None:
+        splash.update_status("Carregando a interface...")
+    elif last_status is not None:
+        splash.update_status(last_status)
+    root.after(50, check_queue, root, queue, splash, loader, fetched_data)
 
 if __name__ == "__main__":
     multiprocessing.freeze_support()
-    
+
     mp_queue = multiprocessing.Queue()
-    
+
     root = tk.Tk()
     app_icon = tk.PhotoImage(file='img/Logoapp.png')
     root.iconphoto(False, app_icon)
     root.withdraw() # Hide the root window initially
 
     splash = SplashScreen(root)
-    
+    # Desenha o splash antes de começar o trabalho em segundo plano
+    splash.update()
+
     ftp_service = FTPService(mp_queue)
-    
+
     fetch_thread = threading.Thread(target=ftp_service.fetch_available_data, daemon=True)
     fetch_thread.start()
-    
-    check_queue(root, mp_queue, splash)
-    
+
+    loader = MainWindowLoader()
+    loader.start()
+
+    check_queue(root, mp_queue, splash, loader)
+
     root.mainloop()
@@ -0,0 +1,180 @@
+import os
+from collections import namedtuple
+
+from src.controllers.parquet_sink import ParquetDatasetWriter
+from src.controllers.rais_schema import RAIS_COLUMNS, normalize_column_name
+from src.controllers.sqlite_loader import _quote, _to_rows, transaction
+
+# `keys` e `measures` usam os nomes do cabeçalho da RAIS; o ano é sempre a
+# primeira chave. Cada medida gera as colunas soma_<medida>, n_<medida>
+# (valores não nulos) e media_<medida>; `linhas` conta as linhas do grupo.
+AggregateSpec = namedtuple('AggregateSpec', 'name keys measures')
+
+# Somar 'Vínculo Ativo 31/12' (0/1) dá o estoque de empregos em 31/12
+DEFAULT_AGGREGATES = (
+    AggregateSpec('agg_vinculos_municipio_cbo', ('Município', 'CBO Ocupação 2002'),
+                  ('Vínculo Ativo 31/12', 'Vl Remun Média Nom')),
+    AggregateSpec('agg_vinculos_municipio_cnae', ('Município', 'CNAE 2.0 Classe'),
+                  ('Vínculo Ativo 31/12', 'Vl Remun Média Nom')),
+    AggregateSpec('agg_vinculos_municipio_sexo', ('Município', 'Sexo Trabalhador'),
+                  ('Vínculo Ativo 31/12', 'Vl Remun Média Nom')),
+)
+
+def _key_columns(spec):
+    return ['ano'] + [normalize_column_name(c) for c in spec.keys]
+
+def _measure_columns(spec):
+    return [normalize_column_name(c) for c in spec.measures]
+
+def partial_aggregate(chunk, spec):
+    """Agregado parcial de um chunk (colunas já normalizadas), ou None se faltar alguma coluna.
+
+    Chaves nulas formam o seu próprio grupo.
+    """
+    import pandas as pd
+
+    keys, measures = _key_columns(spec), _measure_columns(spec)
+    if any(c not in chunk.columns for c in keys + measures):
+        return None
+    groups = chunk.groupby(keys, dropna=False, sort=False)
+    parts = {'linhas': groups.size()}
+    for m in measures:
+        parts[f'soma_{m}'] = groups[m].sum(min_count=0)
+        parts[f'n_{m}'] = groups[m].count()
+    return pd.DataFrame(parts).reset_index()
+
+class SQLiteAggregates:
+    """Tabelas de agregados no SQLite mantidas à medida que os chunks são importados.
+
+    O agregado parcial de cada chunk é somado à tabela com UPSERT sobre um
+    índice único das chaves (com `ifnull`, já que chaves nulas também formam
+    grupos). As médias são colunas geradas a partir de soma e contagem, então
+    continuam corretas qualquer que seja a ordem dos chunks. Ao reimportar uma
+    origem, `subtract_rows` desconta antes a contribuição anterior dela.
+
+    Uso:
+        aggregates = SQLiteAggregates(conn, DEFAULT_AGGREGATES, queue)
+        aggregates.create_tables(replace=True)
+        for chunk in chunks:
+            aggregates.add_chunk(chunk)
+    """
+
+    def __init__(self, conn, specs=DEFAULT_AGGREGATES, queue=None):
+        self.conn = conn
+        self.specs = list(specs)
+        self.queue = queue
+        self._skipped = set()
+
+    def create_tables(self, replace=False):
+        with transaction(self.conn):
+            for spec in self.specs:
+                table = _quote(spec.name)
+                if replace:
+                    self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+                keys = _key_columns(spec)
+                definitions = [f"{_quote(k)} {_sql_type(k)}" for k in keys] + ['"linhas" INTEGER']
+                for m in _measure_columns(spec):
+                    definitions += [f'"soma_{m}" REAL', f'"n_{m}" INTEGER',
+                                    f'"media_{m}" REAL GENERATED ALWAYS AS ("soma_{m}" / NULLIF("n_{m}", 0)) VIRTUAL']
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(definitions)})")
+                self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote(spec.name + '_chaves')} "
+                                  f"ON {table} ({_conflict_target(keys)})")
+
+    def add_chunk(self, chunk):
+        with transaction(self.conn):
+            for spec in self.specs:
+                partial = partial_aggregate(chunk, spec)
+                if partial is None:
+                    self._log_skipped(spec)
+                    continue
+                self.conn.executemany(self._upsert_sql(spec, partial.columns), _to_rows(partial))
+
+    def subtract_rows(self, source_table, column, value):
+        """Desconta dos agregados as linhas de `source_table` com `column` = `value`.
+
+        Usado antes de apagar as linhas de uma origem reimportada; roda na
+        transação do chamador. Grupos que ficam sem linhas são removidos.
+        """
+        available = {row[1] for row in self.conn.execute(f"PRAGMA table_info({_quote(source_table)})")}
+        for spec in self.specs:
+            keys, measures = _key_columns(spec), _measure_columns(spec)
+            if any(c not in available for c in keys + measures):
+                continue
+            columns = keys + ['linhas'] + [c for m in measures for c in (f'soma_{m}', f'n_{m}')]
+            selects = [_quote(k) for k in keys] + ['-count(*)']
+            for m in measures:
+                # total() dá 0.0 (e não NULL) quando todos os valores são nulos
+                selects += [f"-total({_quote(m)})", f"-count({_quote(m)})"]
+            keys_sql = ', '.join(_quote(k) for k in keys)
+            updates = ", ".join(f"{_quote(c)} = {_quote(c)} + excluded.{_quote(c)}" for c in columns[len(keys):])
+            self.conn.execute(f"INSERT INTO {_quote(spec.name)} ({', '.join(_quote(c) for c in columns)}) "
+                              f"SELECT {', '.join(selects)} FROM {_quote(source_table)} WHERE {_quote(column)} = ? "
+                              f"GROUP BY {keys_sql} "
+                              f"ON CONFLICT ({_conflict_target(keys)}) DO UPDATE SET {updates}", (value,))
+            self.conn.execute(f"DELETE FROM {_quote(spec.name)} WHERE linhas <= 0")
+
+    def _upsert_sql(self, spec, columns):
+        keys = _key_columns(spec)
+        values = [c for c in columns if c not in keys]
+        updates = ", ".join(f"{_quote(c)} = {_quote(c)} + excluded.{_quote(c)}" for c in values)
+        return (f"INSERT INTO {_quote(spec.name)} ({', '.join(_quote(c) for c in columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)}) "
+                f"ON CONFLICT ({_conflict_target(keys)}) DO UPDATE SET {updates}")
+
+    def _log_skipped(self, spec):
+        if spec.name not in self._skipped and self.queue is not None:
+            self.queue.put(("LOG", f"  - Agregado '{spec.name}' não atualizado: colunas ausentes na importação."))
+        self._skipped.add(spec.name)
+
+class ParquetAggregates:
+    """Agregados de um arquivo de origem, gravados em Parquet ao final da importação.
+
+    Os parciais são somados em memória (o tamanho é o número de grupos, não o
+    de linhas) e cada agregado vira um dataset em `<root_dir>/_agregados/<nome>`
+    com um arquivo por origem, substituído quando a origem é reimportada. O
+    prefixo '_' faz o pyarrow ignorar a pasta ao ler o dataset principal.
+    """
+    DIR_NAME = '_agregados'
+
+    def __init__(self, root_dir, file_name, specs=DEFAULT_AGGREGATES, queue=None, compression='zstd'):
+        self.root_dir = os.path.join(root_dir, self.DIR_NAME)
+        self.file_name = file_name
+        self.specs = list(specs)
+        self.queue = queue
+        self.compression = compression
+        self._totals = {}
+
+    def add_chunk(self, chunk):
+        import pandas as pd
+
+        for spec in self.specs:
+            partial = partial_aggregate(chunk, spec)
+            if partial is None:
+                continue
+            total = self._totals.get(spec.name)
+            if total is not None:
+                partial = pd.concat([total, partial], ignore_index=True)
+                partial = partial.groupby(_key_columns(spec), dropna=False, sort=False).sum(min_count=0).reset_index()
+            self._totals[spec.name] = partial
+
+    def close(self):
+        for spec in self.specs:
+            total = self._totals.get(spec.name)
+            if total is None:
+                continue
+            for m in _measure_columns(spec):
+                total[f'media_{m}'] = total[f'soma_{m}'] / total[f'n_{m}'].where(total[f'n_{m}'] > 0)
+            types = {k: _sql_type(k) for k in _key_columns(spec)}
+            with ParquetDatasetWriter(os.path.join(self.root_dir, spec.name), self.file_name, None,
+                                      self.compression, types) as writer:
+                writer.write_chunk(total)
+        self._totals = {}
+
+def _sql_type(column):
+    if column == 'ano':
+        return 'INTEGER'
+    spec = next((s for name, s in RAIS_COLUMNS.items() if normalize_column_name(name) == column), None)
+    return spec.type if spec else 'TEXT'
+
+def _conflict_target(keys):
+    return ", ".join(f"ifnull({_quote(k)}, '')" for k in keys)
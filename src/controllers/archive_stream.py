@@ -0,0 +1,131 @@
+import io
+import threading
+from queue import Queue, Full, Empty
+
+import py7zr
+from py7zr.io import Py7zIO, WriterFactory
+
+# Blocos descomprimidos em trânsito entre o descompressor e o leitor. Limita a
+# memória usada quando o leitor (parser) é mais lento que a descompressão.
+STREAM_QUEUE_BLOCKS = 64
+
+_END_OF_STREAM = object()
+
+class StreamClosed(Exception):
+    """O leitor foi fechado antes do fim da descompressão."""
+
+class _BlockChannel:
+    """Fila limitada de blocos de bytes entre a thread de descompressão e o leitor."""
+    def __init__(self, maxsize):
+        self.blocks = Queue(maxsize=maxsize)
+        self.closed = threading.Event()
+
+    def put(self, item):
+        while True:
+            if self.closed.is_set():
+                raise StreamClosed()
+            try:
+                self.blocks.put(item, timeout=0.5)
+                return
+            except Full:
+                continue
+
+class _ChannelWriter(Py7zIO):
+    """Destino do py7zr que repassa cada bloco descomprimido para o canal."""
+    def __init__(self, channel):
+        self.channel = channel
+        self._size = 0
+
+    def write(self, s):
+        if s:
+            self.channel.put(bytes(s))
+            self._size += len(s)
+        return len(s)
+
+    def read(self, size=None):
+        return b""
+
+    def seek(self, offset, whence=0):
+        return self._size
+
+    def flush(self):
+        pass
+
+    def size(self):
+        return self._size
+
+class _ChannelWriterFactory(WriterFactory):
+    def __init__(self, channel):
+        self.channel = channel
+
+    def create(self, filename):
+        return _ChannelWriter(self.channel)
+
+class _ChannelReader(io.RawIOBase):
+    """Leitura sequencial dos blocos publicados no canal."""
+    def __init__(self, channel, thread):
+        self.channel = channel
+        self.thread = thread
+        self._pending = b""
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending and not self._eof:
+            item = self.channel.blocks.get()
+            if item is _END_OF_STREAM:
+                self._eof = True
+            elif isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            else:
+                self._pending = item
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.channel.closed.set()
+            # Libera a thread de descompressão caso esteja bloqueada na fila cheia
+            try:
+                while True:
+                    self.channel.blocks.get_nowait()
+            except Empty:
+                pass
+            self.thread.join(timeout=5)
+        super().close()
+
+def list_text_members(path_7z):
+    """Nomes dos arquivos .txt contidos no arquivo .7z."""
+    with py7zr.SevenZipFile(path_7z, mode='r') as z:
+        return [name for name in z.getnames() if name.lower().endswith('.txt')]
+
+def open_member_stream(path_7z, member, buffer_size=io.DEFAULT_BUFFER_SIZE * 128):
+    """Abre um membro do .7z como um arquivo binário somente leitura.
+
+    A descompressão ocorre em uma thread à medida que o conteúdo é lido, sem
+    gravar o membro em disco. Erros de descompressão (inclusive CRC) são
+    relançados no leitor.
+    """
+    channel = _BlockChannel(STREAM_QUEUE_BLOCKS)
+
+    def extract():
+        try:
+            with py7zr.SevenZipFile(path_7z, mode='r') as z:
+                z.extract(targets=[member], factory=_ChannelWriterFactory(channel))
+            channel.put(_END_OF_STREAM)
+        except StreamClosed:
+            pass
+        except BaseException as e:
+            try:
+                channel.put(e)
+            except StreamClosed:
+                pass
+
+    thread = threading.Thread(target=extract, name=f"7z-stream-{member}", daemon=True)
+    thread.start()
+    return io.BufferedReader(_ChannelReader(channel, thread), buffer_size=buffer_size)
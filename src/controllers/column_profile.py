@@ -0,0 +1,176 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.controllers.rais_schema import RAIS_COLUMNS, read_csv_options, coerce_chunk
+
+PROFILE_SUFFIX = ".profile.json"
+PROFILE_VERSION = 1
+PROFILE_CHUNK_SIZE = 200000
+
+class HyperLogLog:
+    """Contagem aproximada de valores distintos em memória fixa (2**p registradores).
+
+    O erro padrão é de cerca de 1,04 / sqrt(2**p): ~1,6% com p = 12.
+    """
+    P = 12
+
+    def __init__(self, p=P):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """Acrescenta valores já convertidos em hashes de 64 bits (vetor uint64)."""
+        if not len(hashes):
+            return
+        rest_bits = 64 - self.p
+        buckets = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Posição do primeiro bit 1 nos bits restantes; frexp é exato porque rest < 2**53
+        _, bit_length = np.frexp(rest.astype(np.float64))
+        ranks = (rest_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, ranks)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Contagem linear, mais precisa para poucos valores
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+class ColumnProfile:
+    """Estatísticas de uma coluna acumuladas chunk a chunk.
+
+    `nulls` conta os valores ausentes (vazio, `n/d`, `{ñ class}`) e os que
+    não puderam ser convertidos; `sentinels`, os códigos de "ignorado"/"não se
+    aplica" do layout (ex.: 9997). Os valores mais frequentes são mantidos em
+    um conjunto limitado de candidatos, exato enquanto a coluna tiver até
+    TOP_CANDIDATES valores distintos.
+    """
+    TOP_VALUES = 5
+    TOP_CANDIDATES = 1000
+
+    def __init__(self):
+        self.rows = 0
+        self.nulls = 0
+        self.sentinels = 0
+        self.min = None
+        self.max = None
+        self._distinct = HyperLogLog()
+        self._counts = {}
+
+    def update(self, raw, values, sentinels=()):
+        """`raw`: a coluna como o parser a entregou; `values`: a mesma coluna após `coerce_chunk`."""
+        self.rows += len(raw)
+        sentinel_count = int(raw.isin(sentinels).sum()) if sentinels and raw.dtype != object else 0
+        self.sentinels += sentinel_count
+        self.nulls += int(values.isna().sum()) - sentinel_count
+
+        codes, uniques = pd.factorize(values)
+        if not len(uniques):
+            return
+        if uniques.dtype.kind in 'iuf':
+            # 5 e 5.0 são o mesmo valor mesmo que cheguem com dtypes diferentes
+            uniques = uniques.astype(np.float64)
+        self._distinct.add_hashes(pd.util.hash_array(np.asarray(uniques)))
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self._update_min_max(uniques)
+        for value, count in zip(uniques.tolist(), counts.tolist()):
+            self._counts[value] = self._counts.get(value, 0) + count
+        if len(self._counts) > 2 * self.TOP_CANDIDATES:
+            kept = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)[:self.TOP_CANDIDATES]
+            self._counts = dict(kept)
+
+    def _update_min_max(self, uniques):
+        try:
+            low, high = uniques.min(), uniques.max()
+            self.min = low if self.min is None else min(self.min, low)
+            self.max = high if self.max is None else max(self.max, high)
+        except TypeError:
+            # Números e textos na mesma coluna: compara como texto
+            text = [str(v) for v in uniques.tolist() + [self.min, self.max] if v is not None]
+            self.min, self.max = min(text), max(text)
+
+    def to_dict(self):
+        top = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)[:self.TOP_VALUES]
+        return {
+            'rows': self.rows,
+            'nulls': self.nulls,
+            'sentinels': self.sentinels,
+            'distinct': self._distinct.estimate(),
+            'min': _plain(self.min),
+            'max': _plain(self.max),
+            'top': [[_plain(value), count] for value, count in top],
+        }
+
+def profile_columns(path, chunk_size=PROFILE_CHUNK_SIZE, queue=None, layout=RAIS_COLUMNS):
+    """Percorre o .txt uma vez, em chunks, e retorna {'rows': n, 'columns': {coluna: estatísticas}}."""
+    started = time.perf_counter()
+    profiles = {}
+    rows = 0
+    read_csv_args = {'sep': ';', 'encoding': 'latin-1', 'low_memory': False, 'on_bad_lines': 'warn', **read_csv_options()}
+    for chunk in pd.read_csv(path, chunksize=chunk_size, **read_csv_args):
+        raw = {name: chunk[name] for name in chunk.columns}
+        coerce_chunk(chunk, layout)
+        for name in chunk.columns:
+            spec = layout.get(name)
+            profile = profiles.setdefault(name, ColumnProfile())
+            profile.update(raw[name], chunk[name], spec.sentinels if spec else ())
+        rows += len(chunk)
+    if queue is not None:
+        elapsed = time.perf_counter() - started
+        queue.put(("LOG", f"  - Perfil de {len(profiles)} colunas calculado sobre {rows} linhas em {elapsed:.1f}s."))
+    return {'rows': rows, 'columns': {name: profile.to_dict() for name, profile in profiles.items()}}
+
+def profile_path(path):
+    return path + PROFILE_SUFFIX
+
+def load_cached_profile(path):
+    """Retorna o perfil salvo ao lado de `path`, ou None se ausente ou desatualizado."""
+    stat = os.stat(path)
+    try:
+        with open(profile_path(path), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (cached.get('version') != PROFILE_VERSION or cached.get('size') != stat.st_size
+            or cached.get('mtime_ns') != stat.st_mtime_ns):
+        return None
+    return cached['profile']
+
+def save_profile(path, profile):
+    stat = os.stat(path)
+    cached = {'version': PROFILE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'profile': profile}
+    tmp_path = profile_path(path) + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cached, f, ensure_ascii=False)
+        os.replace(tmp_path, profile_path(path))
+    except OSError:
+        # Sem permissão de escrita o perfil só vale para esta sessão
+        pass
+
+def profile_file(path, queue=None):
+    """Perfil das colunas de `path`, do cache quando ainda corresponde ao arquivo."""
+    profile = load_cached_profile(path)
+    if profile is None:
+        profile = profile_columns(path, queue=queue)
+        save_profile(path, profile)
+    return profile
+
+def _plain(value):
+    """Converte escalares do numpy em tipos do JSON (floats inteiros viram int)."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        if np.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
@@ -0,0 +1,124 @@
+from src.controllers.rais_schema import RAIS_COLUMNS, normalize_column_name
+from src.controllers.sqlite_loader import _quote, transaction
+
+# Colunas de código TEXT que se repetem em todas as linhas. Município, Mun
+# Trab e Tipo Estab já são gravados como INTEGER e não ganham com a troca,
+# mas podem ser incluídos em uma lista própria.
+DIMENSION_COLUMNS = (
+    'CBO Ocupação 2002',
+    'CNAE 2.0 Classe',
+    'CNAE 95 Classe',
+    'CNAE 2.0 Subclasse',
+    'Tipo Estab.1',
+)
+FACT_SUFFIX = "_fato"
+ID_SUFFIX = "_id"
+DIMENSION_PREFIX = "dim_"
+
+def fact_table_name(table):
+    return table + FACT_SUFFIX
+
+def prepare_storage(conn, table, normalized, replace):
+    """Ajusta o banco ao modo de armazenamento e retorna a tabela que recebe as linhas.
+
+    No modo normalizado as linhas vão para `<table>_fato` e `table` é uma
+    view; no modo comum `table` é a própria tabela. Com `replace`, a tabela e
+    a view de uma carga anterior (em qualquer modo) são removidas; as
+    dimensões são mantidas, já que os ids continuam válidos.
+    """
+    existing = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    kind = existing[0] if existing else None
+    if replace:
+        with transaction(conn):
+            if kind == 'view':
+                conn.execute(f"DROP VIEW {_quote(table)}")
+            elif kind == 'table':
+                conn.execute(f"DROP TABLE {_quote(table)}")
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(fact_table_name(table))}")
+    elif (normalized and kind == 'table') or (not normalized and kind == 'view'):
+        current = "normalizado" if kind == 'view' else "comum"
+        raise Exception(f"'{table}' já está no modo de armazenamento {current}; importe substituindo a tabela para trocar de modo")
+    return fact_table_name(table) if normalized else table
+
+class DimensionEncoder:
+    """Troca colunas de código por ids inteiros de tabelas de dimensão.
+
+    Cada coluna tem uma tabela `dim_<coluna>` (id, codigo). O mapa
+    código → id é lido do banco na criação e mantido em memória, então só os
+    códigos ainda não vistos geram INSERTs e os ids são os mesmos em todos os
+    chunks e arquivos. A conversão é vetorizada: só os valores distintos de
+    cada chunk passam pelo mapa.
+
+    Uso:
+        encoder = DimensionEncoder(conn)
+        for chunk in chunks:
+            encoder.encode(chunk)
+            loader.write_chunk(chunk)
+        encoder.create_view("vinculos", "vinculos_fato", loader.columns)
+    """
+
+    def __init__(self, conn, columns=DIMENSION_COLUMNS):
+        self.conn = conn
+        self.columns = [normalize_column_name(c) for c in columns]
+        self._types = {normalize_column_name(c): RAIS_COLUMNS[c].type if c in RAIS_COLUMNS else 'TEXT' for c in columns}
+        self._ids = {}
+
+    @property
+    def column_types(self):
+        """{coluna de id: tipo SQLite} para a tabela fato."""
+        return {name + ID_SUFFIX: 'INTEGER' for name in self.columns}
+
+    def _ids_for(self, name):
+        ids = self._ids.get(name)
+        if ids is None:
+            table = _quote(DIMENSION_PREFIX + name)
+            with transaction(self.conn):
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, codigo {self._types[name]} NOT NULL UNIQUE)")
+            ids = dict(self.conn.execute(f"SELECT codigo, id FROM {table}"))
+            self._ids[name] = ids
+        return ids
+
+    def encode(self, chunk):
+        """Substitui (in-place) cada coluna de código de `chunk` por `<coluna>_id`; nulos continuam nulos."""
+        import numpy as np
+        import pandas as pd
+
+        renames = {}
+        for name in self.columns:
+            if name not in chunk.columns:
+                continue
+            ids = self._ids_for(name)
+            codes, uniques = pd.factorize(chunk[name])
+            new_codes = [u for u in uniques.tolist() if u not in ids]
+            if new_codes:
+                next_id = max(ids.values(), default=0) + 1
+                new_ids = {code: next_id + i for i, code in enumerate(new_codes)}
+                with transaction(self.conn):
+                    self.conn.executemany(f"INSERT INTO {_quote(DIMENSION_PREFIX + name)} (id, codigo) VALUES (?, ?)",
+                                          [(i, code) for code, i in new_ids.items()])
+                ids.update(new_ids)
+            lookup = np.array([ids[u] for u in uniques.tolist()], dtype=np.float64)
+            values = np.full(len(codes), np.nan)
+            valid = codes >= 0
+            values[valid] = lookup[codes[valid]]
+            chunk[name] = values if not valid.all() else values.astype(np.int64)
+            renames[name] = name + ID_SUFFIX
+        if renames:
+            chunk.rename(columns=renames, inplace=True)
+        return chunk
+
+    def create_view(self, view, fact_table, fact_columns):
+        """(Re)cria a view com o formato largo original, trocando cada id pelo código."""
+        selects, joins = [], []
+        for column in fact_columns:
+            name = column[:-len(ID_SUFFIX)] if column.endswith(ID_SUFFIX) else None
+            if name in self.columns:
+                alias = f"d{len(joins)}"
+                joins.append(f"LEFT JOIN {_quote(DIMENSION_PREFIX + name)} {alias} ON {alias}.id = f.{_quote(column)}")
+                selects.append(f"{alias}.codigo AS {_quote(name)}")
+            else:
+                selects.append(f"f.{_quote(column)}")
+        with transaction(self.conn):
+            self.conn.execute(f"DROP VIEW IF EXISTS {_quote(view)}")
+            self.conn.execute(f"CREATE VIEW {_quote(view)} AS SELECT {', '.join(selects)} "
+                              f"FROM {_quote(fact_table)} f {' '.join(joins)}")
@@ -1,114 +1,1091 @@
 import os
+import json
 import sqlite3
 import ftplib
-import py7zr
-import pandas as pd
 import re
+import shutil
 import time
 import socket
+import threading
 import multiprocessing
-from queue import Empty
+import multiprocessing.connection
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from queue import Queue, Empty, Full
+
+from src.controllers.sqlite_loader import SQLiteBulkLoader, single_transaction
+from src.controllers.rais_schema import RAIS_COLUMNS, read_csv_options, coerce_chunk, column_types, normalize_column_name
+from src.controllers.parquet_sink import ParquetDatasetWriter
+from src.controllers.aggregates import DEFAULT_AGGREGATES, SQLiteAggregates, ParquetAggregates
+from src.controllers.dimension_tables import DimensionEncoder, fact_table_name, prepare_storage
+from src.controllers.index_builder import DEFAULT_INDEXES, COVERING_INDEXES, build_indexes, drop_indexes, missing_indexes
+from src.controllers.import_manifest import ImportManifest, SOURCE_COLUMN, import_options_key
+from src.controllers.stage_metrics import StageMeter
+
+# pandas, py7zr e os módulos que dependem deles são importados dentro das
+# funções que os usam: a interface e os processos de download abrem sem eles
+
+# Parâmetros de retomada de downloads interrompidos
+PART_SUFFIX = ".part"
+DOWNLOAD_BLOCK_SIZE = 1048576
+DOWNLOAD_MAX_RETRIES = 5
+DOWNLOAD_RETRY_BACKOFF = 2  # segundos; dobra a cada tentativa consecutiva sem progresso
+# Falhas transitórias: timeouts, conexões derrubadas e respostas 4xx do servidor.
+# Erros de E/S locais (disco cheio, permissão, pasta inexistente) não se
+# resolvem com uma nova tentativa e são propagados.
+RETRYABLE_FTP_ERRORS = (ConnectionError, socket.timeout, TimeoutError, EOFError, ftplib.error_temp)
+
+# Download segmentado: um arquivo grande dividido em faixas de bytes, cada uma
+# em sua própria conexão. Usa um temporário próprio porque o arquivo é
+# pré-alocado com o tamanho final e não pode ser confundido com um `.part`.
+SEGMENTED_SUFFIX = ".segpart"
+# Faixas e bytes já gravados de cada uma, para retomar o `.segpart`
+SEGMENT_STATE_SUFFIX = ".segpart.json"
+SEGMENT_MIN_SIZE = 256 * 1024 * 1024
+
+PROGRESS_INTERVAL = 0.25  # segundos entre mensagens de progresso de um mesmo arquivo
+
+# Linhas por chunk na importação (leitura sequencial e direta do .7z; a
+# leitura paralela usa faixas de bytes, ver split_reader)
+IMPORT_CHUNK_SIZE = 500000
+
+class ProgressReporter:
+    """Publica FILE_PROGRESS_UPDATE no máximo uma vez a cada PROGRESS_INTERVAL.
+
+    Pode ser compartilhado entre as threads de um download segmentado.
+    """
+    def __init__(self, queue, progress_key, bytes_so_far=0):
+        self.queue = queue
+        self.progress_key = progress_key
+        self.bytes_so_far = bytes_so_far
+        self._last_sent = 0.0
+        self._lock = threading.Lock()
+
+    def reset(self, bytes_so_far):
+        with self._lock:
+            self.bytes_so_far = bytes_so_far
+
+    def add(self, nbytes):
+        with self._lock:
+            self.bytes_so_far += nbytes
+            now = time.monotonic()
+            if now - self._last_sent < PROGRESS_INTERVAL:
+                return
+            self._last_sent = now
+            current = self.bytes_so_far
+        self.queue.put(("FILE_PROGRESS_UPDATE", {"file": self.progress_key, "bytes_downloaded": current}))
+
+    def flush(self):
+        """Publica a posição atual, mesmo dentro do intervalo."""
+        with self._lock:
+            current = self.bytes_so_far
+        self.queue.put(("FILE_PROGRESS_UPDATE", {"file": self.progress_key, "bytes_downloaded": current}))
 
 # As funções worker são executadas em processos separados
 
-def worker_download(ftp_host, ftp_path, dest, year, queue, result_queue):
-    """Baixa um único arquivo. Executado em um processo separado."""
-    ftp = None
+def _connect_ftp(ftp_host, remote_dir):
+    """Abre uma conexão anônima, em modo passivo e binário, no diretório informado.
+
+    `ftp_host` aceita uma porta (`host:porta`), usada por espelhos e pelo
+    servidor local dos benchmarks.
+    """
+    host, _, port = ftp_host.partition(':')
+    ftp = ftplib.FTP(timeout=10)
     try:
-        ftp = ftplib.FTP(ftp_host, timeout=10)
+        ftp.connect(host, int(port or 21))
         ftp.login()
         if ftp.sock:
             ftp.sock.settimeout(15.0)
         ftp.set_pasv(True)
-        ftp.cwd(os.path.dirname(ftp_path))
-        file_name = os.path.basename(ftp_path)
-        total_size = ftp.size(file_name)
-        queue.put(("FILE_PROGRESS_START", {"file": file_name, "total_size": total_size}))
-        
-        class ProgressTracker:
-            def __init__(self, q):
-                self.q = q
-                self.bytes_so_far = 0
-            def __call__(self, chunk):
-                f.write(chunk)
-                self.bytes_so_far += len(chunk)
-                self.q.put(("FILE_PROGRESS_UPDATE", {"file": file_name, "bytes_downloaded": self.bytes_so_far}))
-
-        with open(dest, 'wb') as f:
-            tracker = ProgressTracker(queue)
-            ftp.retrbinary(f'RETR {file_name}', tracker, blocksize=1048576)
+        ftp.cwd(remote_dir)
+        # SIZE só é confiável (e em alguns servidores só é aceito) em modo binário
+        ftp.voidcmd('TYPE I')
+    except BaseException:
+        ftp.close()
+        raise
+    return ftp
+
+def _close_ftp(ftp):
+    if ftp is None:
+        return
+    try:
         ftp.quit()
+    except ftplib.all_errors:
+        try: ftp.close()
+        except: pass
 
-        if os.path.getsize(dest) != total_size:
-             raise Exception("Tamanho do arquivo final não confere com o original.")
+def _retry_delay(attempt, progress_key, error, queue):
+    """Registra a falha transitória e retorna a espera antes da próxima tentativa."""
+    if attempt > DOWNLOAD_MAX_RETRIES:
+        raise error
+    delay = DOWNLOAD_RETRY_BACKOFF * 2 ** (attempt - 1)
+    queue.put(("LOG", f"Conexão interrompida em {progress_key} ({error}). Nova tentativa {attempt}/{DOWNLOAD_MAX_RETRIES} em {delay}s..."))
+    return delay
 
-        result_queue.put((True, dest, year))
-    except Exception as e:
+def _download_single_stream(ftp, ftp_host, ftp_path, part_path, total_size, reporter, queue):
+    """Baixa o arquivo em uma única conexão, retomando do fim de `part_path`."""
+    file_name = os.path.basename(ftp_path)
+    progress_key = reporter.progress_key
+
+    class ProgressTracker:
+        def __init__(self, f):
+            self.f = f
+        def __call__(self, chunk):
+            self.f.write(chunk)
+            reporter.add(len(chunk))
+
+    attempt = 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        try:
+            if ftp is None:
+                ftp = _connect_ftp(ftp_host, os.path.dirname(ftp_path))
+            if offset:
+                queue.put(("LOG", f"Retomando {progress_key} a partir de {offset} bytes..."))
+            with open(part_path, 'ab') as f:
+                if offset < total_size:
+                    reporter.reset(offset)
+                    tracker = ProgressTracker(f)
+                    ftp.retrbinary(f'RETR {file_name}', tracker, blocksize=DOWNLOAD_BLOCK_SIZE, rest=offset or None)
+            _close_ftp(ftp)
+            return
+        except RETRYABLE_FTP_ERRORS as e:
+            if ftp:
+                try: ftp.close()
+                except: pass
+            ftp = None
+            # Uma tentativa que avançou no arquivo não conta para o limite
+            if os.path.exists(part_path) and os.path.getsize(part_path) > offset:
+                attempt = 0
+            attempt += 1
+            time.sleep(_retry_delay(attempt, progress_key, e, queue))
+
+def _open_extra_connections(ftp_host, remote_dir, count):
+    """Tenta abrir até `count` conexões; para na primeira recusa do servidor."""
+    connections = []
+    for _ in range(count):
+        try:
+            connections.append(_connect_ftp(ftp_host, remote_dir))
+        except ftplib.all_errors:
+            break
+    return connections
+
+class SegmentState:
+    """Faixas de um download segmentado e até onde cada uma já foi gravada.
+
+    Salvo em `dest + SEGMENT_STATE_SUFFIX` no máximo a cada PROGRESS_INTERVAL
+    e ao fim de cada faixa; a posição só avança depois que os bytes foram
+    gravados no `.segpart`, então retomar do estado salvo nunca pula dados.
+    """
+    def __init__(self, path, total_size, ranges):
+        self.path = path
+        self.total_size = total_size
+        # [início, posição já gravada, fim) de cada faixa
+        self.ranges = [list(r) for r in ranges]
+        self._last_saved = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path, seg_path, total_size, num_segments):
+        with open(seg_path, 'wb') as f:
+            f.truncate(total_size)
+        segment_size = -(-total_size // num_segments)
+        ranges = [(start, start, min(start + segment_size, total_size)) for start in range(0, total_size, segment_size)]
+        state = cls(path, total_size, ranges)
+        state.save()
+        return state
+
+    @classmethod
+    def load(cls, path, seg_path, total_size):
+        """O estado salvo, ou None se não existir ou não corresponder ao `.segpart` e ao tamanho no servidor."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                saved = json.load(f)
+            ranges = saved['ranges']
+            if (saved['size'] != total_size or os.path.getsize(seg_path) != total_size
+                    or not all(0 <= start <= position <= end <= total_size for start, position, end in ranges)):
+                return None
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return cls(path, total_size, ranges)
+
+    def done_bytes(self):
+        with self._lock:
+            return sum(position - start for start, position, _ in self.ranges)
+
+    def pending(self):
+        """Índices das faixas ainda incompletas."""
+        with self._lock:
+            return [i for i, (_, position, end) in enumerate(self.ranges) if position < end]
+
+    def advance(self, index, position):
+        with self._lock:
+            self.ranges[index][1] = position
+            if time.monotonic() - self._last_saved < PROGRESS_INTERVAL:
+                return
+        self.save()
+
+    def save(self):
+        with self._lock:
+            self._last_saved = time.monotonic()
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'size': self.total_size, 'ranges': self.ranges}, f)
+            os.replace(tmp_path, self.path)
+
+def _download_segment(ftp, ftp_host, ftp_path, seg_path, state, index, progress, progress_key, queue):
+    """Baixa o que falta da faixa `index` com REST + leitura limitada e grava na posição correspondente."""
+    file_name = os.path.basename(ftp_path)
+    _, position, end = state.ranges[index]
+    attempt = 0
+    try:
+        while position < end:
+            attempt_start = position
+            try:
+                if ftp is None:
+                    ftp = _connect_ftp(ftp_host, os.path.dirname(ftp_path))
+                conn = ftp.transfercmd(f'RETR {file_name}', rest=position)
+                try:
+                    with open(seg_path, 'r+b') as f:
+                        f.seek(position)
+                        while position < end:
+                            data = conn.recv(min(DOWNLOAD_BLOCK_SIZE, end - position))
+                            if not data:
+                                break
+                            f.write(data)
+                            f.flush()
+                            position += len(data)
+                            state.advance(index, position)
+                            progress(len(data))
+                finally:
+                    conn.close()
+                # A transferência foi abortada no fim da faixa; a resposta do servidor
+                # (226 ou 426) é descartada junto com a conexão de controle.
+                ftp.close()
+                ftp = None
+                if position < end:
+                    raise EOFError("conexão de dados encerrada antes do fim do segmento")
+            except RETRYABLE_FTP_ERRORS as e:
+                if ftp:
+                    try: ftp.close()
+                    except: pass
+                ftp = None
+                if position > attempt_start:
+                    attempt = 0
+                attempt += 1
+                time.sleep(_retry_delay(attempt, progress_key, e, queue))
+    finally:
         if ftp:
             try: ftp.close()
             except: pass
-        if os.path.exists(dest):
-            os.remove(dest)
+        state.save()
+
+def _download_segmented(connections, ftp_host, ftp_path, seg_path, state, reporter, queue):
+    """Baixa as faixas incompletas de `state` em paralelo, no máximo uma por conexão aberta.
+
+    As conexões abertas atendem às primeiras faixas; as demais abrem a sua
+    ao começar, quando uma faixa anterior termina.
+    """
+    pending = state.pending()
+    reporter.reset(state.done_bytes())
+    connections = list(connections)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(len(connections), len(pending)))) as executor:
+            futures = [
+                executor.submit(_download_segment, connections.pop(0) if connections else None, ftp_host, ftp_path,
+                                seg_path, state, index, reporter.add, reporter.progress_key, queue)
+                for index in pending
+            ]
+            for future in futures:
+                future.result()
+    finally:
+        # Sobram conexões quando há menos faixas incompletas que conexões
+        for ftp in connections:
+            _close_ftp(ftp)
+
+def worker_download(ftp_host, ftp_path, dest, year, queue, result_queue, segments=1):
+    """Baixa um único arquivo. Executado em um processo separado.
+
+    Os dados são gravados em `dest + PART_SUFFIX`. Se a conexão cair, o
+    download é retomado a partir dos bytes já gravados (comando REST), com
+    novas tentativas espaçadas exponencialmente. O arquivo só recebe o nome
+    final depois que o tamanho confere com o do servidor; em caso de falha o
+    `.part` é mantido para ser retomado na próxima execução.
+
+    Com `segments > 1`, arquivos a partir de SEGMENT_MIN_SIZE são divididos
+    em faixas de bytes baixadas em conexões paralelas. Se o servidor não
+    aceitar ao menos duas conexões, o download segue em fluxo único. Em caso
+    de falha, o `.segpart` e o estado das faixas (SegmentState) são mantidos
+    e a próxima execução retoma cada faixa de onde parou, com as conexões
+    que conseguir abrir (mesmo uma só).
+    """
+    file_name = os.path.basename(ftp_path)
+    remote_dir = os.path.dirname(ftp_path)
+    # O nome local inclui o ano, evitando colisões entre downloads simultâneos
+    progress_key = os.path.basename(dest)
+    part_path = dest + PART_SUFFIX
+    seg_path = dest + SEGMENTED_SUFFIX
+    state_path = dest + SEGMENT_STATE_SUFFIX
+    ftp = None
+    extra = []
+    reporter = None
+    offset = 0
+    meter = StageMeter(queue, "download", progress_key).start()
+
+    try:
+        attempt = 0
+        while ftp is None:
+            try:
+                ftp = _connect_ftp(ftp_host, remote_dir)
+                total_size = ftp.size(file_name)
+            except RETRYABLE_FTP_ERRORS as e:
+                if ftp:
+                    try: ftp.close()
+                    except: pass
+                ftp = None
+                attempt += 1
+                time.sleep(_retry_delay(attempt, progress_key, e, queue))
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if offset > total_size:
+            # Sobra de uma versão diferente do arquivo no servidor
+            os.remove(part_path)
+            offset = 0
+        queue.put(("FILE_PROGRESS_START", {"file": progress_key, "total_size": total_size}))
+        reporter = ProgressReporter(queue, progress_key, offset)
+
+        state = SegmentState.load(state_path, seg_path, total_size)
+        if state is None:
+            # Sobra de um download segmentado de outra versão do arquivo
+            for path in (seg_path, state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        else:
+            offset = state.done_bytes()
+            reporter.reset(offset)
+
+        # Um `.part` existente é retomado em fluxo único, sem refazer os bytes já baixados
+        if state is not None or (segments > 1 and total_size >= SEGMENT_MIN_SIZE and not offset):
+            extra = _open_extra_connections(ftp_host, remote_dir, segments - 1)
+            if extra or state is not None:
+                connections = [ftp] + extra
+                ftp, extra = None, []
+                if state is None:
+                    state = SegmentState.create(state_path, seg_path, total_size, len(connections))
+                    queue.put(("LOG", f"{progress_key}: download segmentado em {len(connections)} conexões."))
+                else:
+                    queue.put(("LOG", f"Retomando {progress_key}: {offset} bytes já baixados, "
+                                      f"{len(state.pending())} faixas incompletas em {len(connections)} conexões..."))
+                _download_segmented(connections, ftp_host, ftp_path, seg_path, state, reporter, queue)
+                check = _connect_ftp(ftp_host, remote_dir)
+                remote_size = check.size(file_name)
+                _close_ftp(check)
+                if state.pending() or remote_size != total_size or os.path.getsize(seg_path) != total_size:
+                    for path in (seg_path, state_path):
+                        os.remove(path)
+                    raise Exception("Tamanho do arquivo final não confere com o original.")
+                os.replace(seg_path, dest)
+                os.remove(state_path)
+                result_queue.put((True, dest, year))
+                return
+            queue.put(("LOG", f"{progress_key}: o servidor recusou conexões adicionais; usando fluxo único."))
+
+        _download_single_stream(ftp, ftp_host, ftp_path, part_path, total_size, reporter, queue)
+        ftp = None
+
+        if os.path.getsize(part_path) != total_size:
+            os.remove(part_path)
+            raise Exception("Tamanho do arquivo final não confere com o original.")
+
+        os.replace(part_path, dest)
+        result_queue.put((True, dest, year))
+    except Exception as e:
+        for conn in [ftp] + extra:
+            if conn:
+                try: conn.close()
+                except: pass
+        meter.ok = False
         result_queue.put((False, dest, str(e)))
+    finally:
+        if reporter:
+            reporter.flush()
+            meter.bytes = reporter.bytes_so_far - offset
+        meter.finish()
+        queue.put(("FILE_PROGRESS_END", {"file": progress_key}))
+
+def worker_decompress(path, out_dir, queue, year=None, result_queue=None):
+    """Descomprime um arquivo .7z.
 
-def worker_decompress(path, out_dir, queue):
-    """Descomprime um arquivo .7z."""
+    Com `year`, os .txt extraídos recebem o prefixo "{year}_" (como os .7z
+    baixados), evitando que arquivos homônimos de anos diferentes se
+    sobrescrevam. O resultado, se pedido, é (sucesso, [caminhos .txt], ano).
+    """
+    import py7zr
+
+    meter = StageMeter(queue, "decompress", os.path.basename(path)).start()
     try:
-        with py7zr.SevenZipFile(path, mode='r') as z:
-            z.extractall(path=out_dir)
-            queue.put(("LOG", f"OK: {os.path.basename(path)} descomprimido."))
+        if year is None:
+            with py7zr.SevenZipFile(path, mode='r') as z:
+                z.extractall(path=out_dir)
+                extracted = [os.path.join(out_dir, n) for n in z.getnames() if n.lower().endswith('.txt')]
+        else:
+            tmp_dir = os.path.join(out_dir, f".extract_{os.path.basename(path)}")
+            with py7zr.SevenZipFile(path, mode='r') as z:
+                z.extractall(path=tmp_dir)
+                names = z.getnames()
+            extracted = []
+            for name in names:
+                src = os.path.join(tmp_dir, name)
+                if not os.path.isfile(src):
+                    continue
+                target = os.path.join(out_dir, f"{year}_{os.path.basename(name)}")
+                os.replace(src, target)
+                if target.lower().endswith('.txt'):
+                    extracted.append(target)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        meter.bytes = sum(os.path.getsize(p) for p in extracted)
+        meter.finish()
+        queue.put(("LOG", f"OK: {os.path.basename(path)} descomprimido."))
+        if result_queue is not None:
+            result_queue.put((True, extracted, year))
     except Exception as e:
+        meter.ok = False
+        meter.finish()
         queue.put(("LOG", f"Erro ao descomprimir {path}: {e}"))
+        if result_queue is not None:
+            result_queue.put((False, path, str(e)))
+
+def _prepare_chunk(chunk, year, normalize_names, row_filter=None, drop_columns=(), coerce=True):
+    rows_scanned = len(chunk)
+    if row_filter is not None:
+        chunk = row_filter.apply(chunk, drop_columns)
+    if coerce:
+        coerce_chunk(chunk)
+    if year is not None:
+        chunk['ano'] = int(year)
+    if normalize_names:
+        chunk.rename(columns={col: normalize_column_name(col) for col in chunk.columns}, inplace=True)
+    if row_filter is not None:
+        # Chega ao processo que consome os chunks mesmo quando o filtro roda no pool
+        chunk.attrs['rows_scanned'] = rows_scanned
+    return chunk
+
+def _iter_rais_chunks(source, year, selected_columns=None, chunk_size=IMPORT_CHUNK_SIZE, normalize_names=True, parse_workers=1,
+                      row_filter=None, raw=False):
+    """Lê `source` (caminho ou arquivo binário) em chunks já convertidos.
+
+    As colunas conhecidas do layout da RAIS são convertidas para INTEGER,
+    REAL ou TEXT (ver rais_schema), a coluna `ano` é acrescentada (se `year`
+    for dado) e os nomes são normalizados para os usados no banco. Com
+    `parse_workers` > 1 e um caminho de arquivo, o arquivo é dividido em
+    faixas de bytes lidas e convertidas em paralelo (ver split_reader); os
+    chunks continuam chegando na ordem do arquivo.
+
+    Com `row_filter` (um RowFilter), só as linhas que passam no filtro seguem
+    adiante; as colunas do filtro são lidas mesmo fora da seleção e
+    descartadas depois. As linhas lidas e mantidas são somadas no próprio
+    filtro, e chunks que ficarem vazios são omitidos (exceto o primeiro, que
+    define o esquema).
+
+    Com `raw`, os valores ficam como o texto do arquivo (espaços de
+    preenchimento, vírgula decimal, códigos sentinela), sem conversão; o
+    filtro de linhas continua valendo.
+    """
+    import pandas as pd
+    from src.controllers.split_reader import iter_split_chunks
+
+    read_csv_args = {
+        'sep': ';', 'encoding': 'latin-1', 'low_memory': False,
+        'on_bad_lines': 'warn',
+        **({'dtype': str, 'keep_default_na': False} if raw else read_csv_options())
+    }
+    drop_columns = []
+    if row_filter is not None and selected_columns:
+        selected = selected_columns if callable(selected_columns) else set(selected_columns).__contains__
+        drop_columns = [c for c in row_filter.columns if not selected(c)]
+        if callable(selected_columns):
+            selected_columns = lambda c: selected(c) or c in row_filter.columns
+        else:
+            selected_columns = list(selected_columns) + drop_columns
+    if selected_columns:
+        read_csv_args['usecols'] = selected_columns
+
+    transform_args = (year, normalize_names, row_filter, drop_columns, not raw)
+    if parse_workers > 1 and isinstance(source, str):
+        chunks = iter_split_chunks(source, read_csv_args, parse_workers, _prepare_chunk, transform_args)
+    else:
+        chunks = (_prepare_chunk(chunk, *transform_args) for chunk in pd.read_csv(source, chunksize=chunk_size, **read_csv_args))
+    for i, chunk in enumerate(chunks):
+        if row_filter is not None:
+            row_filter.record(chunk.attrs.pop('rows_scanned', len(chunk)), len(chunk))
+            if i > 0 and chunk.empty:
+                continue
+        yield chunk
+
+def _log_filter_summary(row_filter, source_name, queue):
+    if row_filter is not None:
+        queue.put(("LOG", f"  - {source_name}: {row_filter.summary()}"))
+        row_filter.reset_counts()
+
+def _output_column_types(selected_columns=None):
+    types = column_types(selected_columns or RAIS_COLUMNS)
+    types['ano'] = 'INTEGER'
+    return types
 
-def worker_process_db(txt_path, year, conn_str, is_first, queue, selected_columns=None):
-    """Processa um arquivo de texto e o insere no banco de dados."""
+class _StageMeters:
+    """Medidores de leitura e de gravação de um mesmo texto, intercaladas chunk a chunk.
+
+    Com `publish=False` as medições são descartadas (o chamador mede a etapa
+    inteira).
+    """
+
+    def __init__(self, queue, source_name, text, publish=True):
+        target = queue if publish else Queue()
+        self.parse = StageMeter(target, "parse", source_name, sections=True)
+        self.write = StageMeter(target, "write", source_name, sections=True)
+        if isinstance(text, str):
+            self.parse.bytes = os.path.getsize(text)
+
+    def __enter__(self):
+        self.parse.start()
+        self.write.start()
+        return self.parse, self.write
+
+    def __exit__(self, exc_type, exc, tb):
+        for meter in (self.parse, self.write):
+            meter.__exit__(exc_type, exc, tb)
+        return False
+
+def _load_text_into_db(texts, source, conn, queue, selected_columns=None, parse_workers=1, row_filter=None,
+                       aggregates=None, normalized=False, chunk_size=IMPORT_CHUNK_SIZE):
+    """Substitui no banco as linhas da origem `source` (um SourceInfo) pelas lidas de `texts`.
+
+    `texts` é uma sequência de (fonte, nome), com fonte um caminho ou um
+    arquivo binário. As linhas anteriores da origem são removidas pelo
+    manifesto de importações (ver import_manifest) e as novas levam o id da
+    origem em `origem_id`; as demais origens não são tocadas. O esquema é
+    definido pelo primeiro chunk e colunas novas são acrescentadas.
+
+    Com `aggregates` (lista de AggregateSpec), as tabelas de agregados são
+    atualizadas chunk a chunk, depois de descontada a contribuição anterior
+    da origem. Com `normalized`, as colunas de código viram ids de tabelas de
+    dimensão, as linhas vão para `vinculos_fato` e `vinculos` passa a ser uma
+    view com o formato original.
+
+    Tudo acontece em uma única transação: se a carga falhar (ou o processo
+    for encerrado), as linhas antigas, os agregados, os índices e o manifesto
+    ficam como estavam. Numa tabela vazia os índices são removidos antes da
+    carga e recriados por `build_indexes` ao final; numa tabela com outros
+    anos eles são mantidos.
+    """
+    view = DownloadManager.NOME_TABELA_FINAL
+    table = fact_table_name(view) if normalized else view
+    column_types = _output_column_types(selected_columns)
+    column_types[SOURCE_COLUMN] = 'INTEGER'
+    encoder = None
+    if normalized:
+        encoder = DimensionEncoder(conn)
+        column_types.update(encoder.column_types)
+    with SQLiteBulkLoader(conn, table, queue, column_types) as loader, single_transaction(conn):
+        prepare_storage(conn, view, normalized, False)
+        drop_indexes(conn, view)
+        manifest = ImportManifest(conn, view)
+        manifest.create_table()
+        summaries = None
+        if aggregates:
+            summaries = SQLiteAggregates(conn, aggregates, queue)
+            summaries.create_tables()
+        source_id = manifest.begin(source, import_options_key(selected_columns, row_filter), summaries)
+        for text, source_name in texts:
+            with _StageMeters(queue, source_name, text) as (parse_meter, write_meter):
+                chunks = _iter_rais_chunks(text, source.year, selected_columns, chunk_size, parse_workers=parse_workers,
+                                           row_filter=row_filter)
+                for i, chunk in enumerate(parse_meter.iterate(chunks)):
+                    with write_meter.section():
+                        if summaries is not None:
+                            summaries.add_chunk(chunk)
+                        if encoder is not None:
+                            encoder.encode(chunk)
+                        chunk[SOURCE_COLUMN] = source_id
+                        if loader.columns != list(chunk.columns):
+                            loader.create_table(chunk.columns, sample=chunk)
+                        loader.write_chunk(chunk)
+                    write_meter.add(rows=len(chunk))
+                    queue.put(("LOG", f"  - Chunk {i+1} de {source_name}: {loader.rows_written} linhas ({loader.rows_per_second:,.0f} linhas/s)"))
+            _log_filter_summary(row_filter, source_name, queue)
+        if encoder is not None and loader.columns:
+            encoder.create_view(view, table, loader.columns)
+        manifest.finish(source_id, loader.rows_written)
+
+def _load_text_into_parquet(source, source_name, year, parquet_dir, queue, selected_columns=None,
+                            compression=ParquetDatasetWriter.DEFAULT_COMPRESSION, parse_workers=1, row_filter=None,
+                            aggregates=None, chunk_size=IMPORT_CHUNK_SIZE, measure_stages=True):
+    """Grava `source` no dataset Parquet em `parquet_dir`, particionado por ano e UF, e retorna as linhas gravadas.
+
+    A coluna Município é sempre lida, pois a partição por UF depende dela.
+    Com `aggregates`, os agregados do arquivo são gravados ao final em
+    `parquet_dir/_agregados`. Sem `measure_stages` (na exportação, medida
+    como uma etapa só), não publica as métricas de leitura e gravação.
+    """
+    if selected_columns and ParquetDatasetWriter.UF_SOURCE_COLUMN not in selected_columns:
+        selected_columns = list(selected_columns) + [ParquetDatasetWriter.UF_SOURCE_COLUMN]
+    file_name = os.path.splitext(source_name)[0]
+    if year is not None and not file_name.startswith(f"{year}_"):
+        file_name = f"{year}_{file_name}"
+    summaries = ParquetAggregates(parquet_dir, file_name, aggregates, queue, compression) if aggregates else None
+    with _StageMeters(queue, source_name, source, measure_stages) as (parse_meter, write_meter):
+        with ParquetDatasetWriter(parquet_dir, file_name, queue, compression, _output_column_types(selected_columns)) as writer:
+            chunks = _iter_rais_chunks(source, year, selected_columns, chunk_size, parse_workers=parse_workers,
+                                       row_filter=row_filter)
+            for i, chunk in enumerate(parse_meter.iterate(chunks)):
+                with write_meter.section():
+                    if summaries is not None:
+                        summaries.add_chunk(chunk)
+                    writer.write_chunk(chunk)
+                write_meter.add(rows=len(chunk))
+                queue.put(("LOG", f"  - Chunk {i+1} de {source_name}: {writer.rows_written} linhas"))
+            # Os últimos row groups só são gravados ao fechar os arquivos
+            with write_meter.section():
+                writer.close()
+                if summaries is not None:
+                    summaries.close()
+    _log_filter_summary(row_filter, source_name, queue)
+    return writer.rows_written
+
+def _load_text(texts, year, conn_str, queue, selected_columns=None, parquet_dir=None,
+               compression=ParquetDatasetWriter.DEFAULT_COMPRESSION, parse_workers=1, row_filter=None, aggregates=None,
+               normalized=False, source=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Envia os textos de `texts` ((fonte, nome)) para o dataset Parquet (se `parquet_dir` for dado) ou para o banco.
+
+    No banco, todos pertencem à origem `source` (um SourceInfo) do manifesto
+    de importações. `normalized` só vale para o banco: o Parquet já codifica
+    por dicionário as colunas repetitivas.
+    """
+    if parquet_dir:
+        for text, source_name in texts:
+            _load_text_into_parquet(text, source_name, year, parquet_dir, queue, selected_columns, compression,
+                                    parse_workers, row_filter, aggregates, chunk_size)
+        return
     conn = sqlite3.connect(conn_str)
     try:
-        chunk_size = 500000
-        year_str = str(year)
-        dtype_map = {'10': str, '11': str}
-        
-        read_csv_args = {
-            'sep': ';', 'encoding': 'latin-1', 'low_memory': False,
-            'chunksize': chunk_size, 'dtype': dtype_map, 'on_bad_lines': 'warn'
-        }
-        if selected_columns:
-            read_csv_args['usecols'] = selected_columns
-
-        for i, chunk in enumerate(pd.read_csv(txt_path, **read_csv_args)):
-            queue.put(("LOG", f"  - Processando chunk {i+1} de {os.path.basename(txt_path)}..."))
-            chunk['ano'] = year_str
-            new_cols = {col: re.sub(r'[^\w]', '', col.strip().replace(' ', '_')) for col in chunk.columns}
-            chunk.rename(columns=new_cols, inplace=True)
-            if_exists = 'replace' if is_first and i == 0 else 'append'
-            chunk.to_sql(DownloadManager.NOME_TABELA_FINAL, conn, if_exists=if_exists, index=False)
+        _load_text_into_db(texts, source, conn, queue, selected_columns, parse_workers, row_filter, aggregates,
+                           normalized, chunk_size)
+    finally:
+        conn.close()
+
+def worker_process_db(txt_path, year, conn_str, queue, selected_columns=None, result_queue=None,
+                      parquet_dir=None, compression=ParquetDatasetWriter.DEFAULT_COMPRESSION, parse_workers=1,
+                      row_filter=None, aggregates=None, normalized=False, source=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Processa um arquivo de texto e o insere no banco de dados (ou no dataset Parquet).
+
+    No banco, as linhas de uma importação anterior do mesmo arquivo são
+    substituídas; `source` é o SourceInfo do arquivo, calculado aqui se
+    omitido. Com `parse_workers` > 1, o arquivo é lido em paralelo por faixas
+    de bytes. Com `row_filter`, só as linhas que passam no filtro são gravadas.
+    """
+    try:
+        if source is None and not parquet_dir:
+            source = _source_info(conn_str, txt_path, year)
+        _load_text([(txt_path, os.path.basename(txt_path))], year, conn_str, queue, selected_columns, parquet_dir,
+                   compression, parse_workers, row_filter, aggregates, normalized, source, chunk_size)
+        if result_queue is not None:
+            result_queue.put((True, txt_path, year))
     except Exception as e:
         queue.put(("LOG", f"  - Erro ao processar {os.path.basename(txt_path)}: {e}"))
+        if result_queue is not None:
+            result_queue.put((False, txt_path, str(e)))
+
+def _member_streams(path_7z, members, queue):
+    from src.controllers.archive_stream import open_member_stream
+
+    for member in members:
+        queue.put(("LOG", f"Importando {member} direto de {os.path.basename(path_7z)}..."))
+        with open_member_stream(path_7z, member) as stream:
+            yield stream, member
+
+def worker_stream_import(path_7z, year, conn_str, queue, result_queue, selected_columns=None,
+                         parquet_dir=None, compression=ParquetDatasetWriter.DEFAULT_COMPRESSION, row_filter=None,
+                         aggregates=None, normalized=False, source=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Importa os .txt de um .7z direto para o banco, sem extraí-los para o disco.
+
+    O conteúdo descomprimido é lido como fluxo pelo parser de CSV, então a
+    importação começa assim que os primeiros blocos são decodificados. No
+    banco, o próprio .7z é a origem no manifesto de importações. Com
+    `parquet_dir`, o destino é o dataset Parquet.
+    """
+    from src.controllers.archive_stream import list_text_members
+
+    try:
+        members = list_text_members(path_7z)
+        if not members:
+            raise Exception("nenhum arquivo .txt encontrado no arquivo compactado")
+        if source is None and not parquet_dir:
+            source = _source_info(conn_str, path_7z, year)
+        _load_text(_member_streams(path_7z, members, queue), year, conn_str, queue, selected_columns, parquet_dir,
+                   compression, row_filter=row_filter, aggregates=aggregates, normalized=normalized, source=source,
+                   chunk_size=chunk_size)
+        result_queue.put((True, path_7z, year))
+    except Exception as e:
+        queue.put(("LOG", f"  - Erro ao importar {os.path.basename(path_7z)}: {e}"))
+        result_queue.put((False, path_7z, str(e)))
+
+def _source_info(conn_str, path, year):
+    conn = sqlite3.connect(conn_str)
+    try:
+        return ImportManifest(conn, DownloadManager.NOME_TABELA_FINAL).source_info(path, year)
     finally:
         conn.close()
 
+# Limite de linhas de uma planilha do Excel, incluindo o cabeçalho
+EXCEL_MAX_ROWS = 1048576
+# Chunks menores que os da importação: a exportação roda junto com a
+# interface, nas estações dos analistas
+EXPORT_CHUNK_SIZE = 100000
+
+def _nullable_integers(chunk):
+    """Colunas INTEGER com nulos chegam como float; Int64 evita o '44.0' nas células."""
+    for name in chunk.columns:
+        spec = RAIS_COLUMNS.get(name)
+        if spec is not None and spec.type == 'INTEGER' and chunk[name].dtype.kind == 'f':
+            try:
+                chunk[name] = chunk[name].astype('Int64')
+            except (TypeError, ValueError):
+                pass
+    return chunk
+
+def _excel_rows(chunk):
+    """Linhas de `chunk` como tuplas, com None nas células vazias."""
+    chunk = _nullable_integers(chunk).astype(object)
+    return chunk.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+def _export_text(txt_path, dest, export_format, selected_columns, queue, row_filter=None):
+    """Exporta para TXT (tabulado), CSV ou Excel, um chunk por vez.
+
+    TXT e CSV repetem os valores como estão no arquivo de origem. No Excel os
+    valores são convertidos (números viram células numéricas, códigos de
+    "ignorado" ficam vazios) e as linhas vão direto para uma planilha em modo
+    somente escrita do openpyxl, que não guarda a pasta de trabalho na memória.
+    """
+    file_name = os.path.basename(txt_path)
+    rows = 0
+    if export_format == "EXCEL":
+        from openpyxl import Workbook
+
+        chunks = _iter_rais_chunks(txt_path, None, selected_columns, EXPORT_CHUNK_SIZE, normalize_names=False,
+                                   row_filter=row_filter)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        for i, chunk in enumerate(chunks):
+            if rows + len(chunk) >= EXCEL_MAX_ROWS:
+                raise Exception(f"o Excel suporta no máximo {EXCEL_MAX_ROWS - 1} linhas por planilha")
+            if i == 0:
+                sheet.append(list(chunk.columns))
+            for row in _excel_rows(chunk):
+                sheet.append(row)
+            rows += len(chunk)
+            queue.put(("LOG", f"  - {file_name}: {rows} linhas exportadas"))
+        workbook.save(dest)
+        _log_filter_summary(row_filter, file_name, queue)
+        return rows
+
+    chunks = _iter_rais_chunks(txt_path, None, selected_columns, EXPORT_CHUNK_SIZE, normalize_names=False,
+                               row_filter=row_filter, raw=True)
+    sep = '\t' if export_format == "TXT" else ','
+    with open(dest, 'w', encoding='utf-8', newline='') as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, sep=sep, index=False, header=i == 0)
+            rows += len(chunk)
+            queue.put(("LOG", f"  - {file_name}: {rows} linhas exportadas"))
+    _log_filter_summary(row_filter, file_name, queue)
+    return rows
+
+def _export_sqlite(txt_path, dest, selected_columns, queue, row_filter=None):
+    """Exporta para um banco SQLite próprio, em uma tabela com o nome do arquivo; retorna (tabela, linhas)."""
+    table = os.path.splitext(os.path.basename(txt_path))[0]
+    conn = sqlite3.connect(dest)
+    try:
+        with SQLiteBulkLoader(conn, table, queue, _output_column_types(selected_columns)) as loader:
+            chunks = _iter_rais_chunks(txt_path, None, selected_columns, EXPORT_CHUNK_SIZE, row_filter=row_filter)
+            for i, chunk in enumerate(chunks):
+                if i == 0:
+                    loader.create_table(chunk.columns, replace=True, sample=chunk)
+                loader.write_chunk(chunk)
+        _log_filter_summary(row_filter, os.path.basename(txt_path), queue)
+        return table, loader.rows_written
+    finally:
+        conn.close()
+
+# Linhas por lote enviado dos processos de leitura ao processo escritor
+BATCH_IMPORT_CHUNK_SIZE = 100000
+# Com a fila de lotes cheia, intervalo entre as verificações de que o escritor segue vivo
+BATCH_PUT_TIMEOUT = 1.0  # segundos
+
+def _put_batch(batch_queue, item, writer_stopped=None):
+    """Envia um lote ao processo escritor; retorna False se ele parou antes de recebê-lo.
+
+    Sem isso, um escritor que morre deixa os processos de leitura presos para
+    sempre na fila cheia.
+    """
+    while not _writer_stopped(batch_queue, writer_stopped):
+        try:
+            batch_queue.put(item, timeout=BATCH_PUT_TIMEOUT)
+            return True
+        except Full:
+            pass
+    return False
+
+def _flush_batches(batch_queue, writer_stopped=None):
+    """Espera os lotes enviados saírem do buffer da fila; retorna False se o escritor parou antes."""
+    batch_queue.close()
+    flusher = threading.Thread(target=batch_queue.join_thread, daemon=True)
+    flusher.start()
+    while flusher.is_alive():
+        flusher.join(BATCH_PUT_TIMEOUT)
+        if flusher.is_alive() and _writer_stopped(batch_queue, writer_stopped):
+            return False
+    return True
+
+def _writer_stopped(batch_queue, writer_stopped):
+    if writer_stopped is None or not writer_stopped.is_set():
+        return False
+    # Os lotes no buffer da fila nunca serão lidos; sem isso, o processo
+    # ficaria preso ao sair esperando gravá-los
+    batch_queue.cancel_join_thread()
+    return True
+
+def _year_from_file_name(file_name):
+    """Ano do prefixo dado aos .txt extraídos (ex.: 2020_RAIS_...txt), ou None."""
+    match = re.match(r'(\d{4})_', file_name)
+    return match.group(1) if match else None
+
+def worker_parse_file(txt_path, year, selected_columns, batch_queue, queue, result_queue, parse_workers=1,
+                      row_filter=None, writer_stopped=None):
+    """Lê e converte um .txt, enviando os chunks tipados ao processo escritor.
+
+    As colunas selecionadas ausentes no arquivo são ignoradas, já que a mesma
+    seleção vale para todos os arquivos do lote. Ao final envia (arquivo, None).
+    A leitura é interrompida se `writer_stopped` (um Event) indicar que o
+    escritor parou.
+    """
+    file_name = os.path.basename(txt_path)
+    usecols = (lambda c: c in selected_columns) if selected_columns else None
+    started = time.perf_counter()
+    rows = 0
+    # A espera pelo escritor (fila cheia) não conta como tempo de leitura
+    meter = StageMeter(queue, "parse", file_name, sections=True)
+    meter.bytes = os.path.getsize(txt_path)
+    try:
+        with meter:
+            chunks = _iter_rais_chunks(txt_path, year, usecols, BATCH_IMPORT_CHUNK_SIZE, parse_workers=parse_workers,
+                                       row_filter=row_filter)
+            for chunk in meter.iterate(chunks):
+                if not _put_batch(batch_queue, (file_name, chunk), writer_stopped):
+                    raise Exception("o processo escritor do banco parou")
+                rows += len(chunk)
+        if not _put_batch(batch_queue, (file_name, None), writer_stopped) or not _flush_batches(batch_queue, writer_stopped):
+            raise Exception("o processo escritor do banco parou")
+        _log_filter_summary(row_filter, file_name, queue)
+        elapsed = time.perf_counter() - started
+        queue.put(("LOG", f"  - {file_name}: {rows} linhas lidas em {elapsed:.1f}s ({rows / elapsed if elapsed > 0 else 0:,.0f} linhas/s)"))
+        result_queue.put((True, txt_path, rows))
+    except Exception as e:
+        queue.put(("LOG", f"  - Erro ao processar {file_name}: {e}"))
+        result_queue.put((False, txt_path, str(e)))
+
+def worker_db_writer(conn_str, table, batch_queue, queue, selected_columns, replace, result_queue, aggregates=None,
+                     normalized=False, sources=None, options="", stopped=None):
+    """Único dono da conexão SQLite: grava os lotes recebidos até receber None.
+
+    `sources` mapeia o nome de cada arquivo ao seu SourceInfo; no primeiro
+    lote de um arquivo, as linhas de uma importação anterior dele são
+    removidas pelo manifesto de importações, e o arquivo é registrado como
+    concluído ao receber (arquivo, None). Colunas novas em um lote (arquivos
+    com layouts diferentes) são acrescentadas à tabela. Em caso de erro,
+    sinaliza `stopped` (um Event) para que os processos de leitura parem e
+    continua consumindo a fila para não bloqueá-los. Com
+    `aggregates`, as tabelas de agregados são atualizadas a cada lote. Com
+    `normalized`, grava no modo com tabelas de dimensão (ver
+    _load_text_into_db).
+
+    O lote inteiro é uma única transação (os arquivos chegam intercalados):
+    com um erro, nenhum arquivo do lote é gravado e o banco fica como estava.
+    """
+    conn = sqlite3.connect(conn_str)
+    rows_per_file = {}
+    source_ids = {}
+    # Gravação de cada arquivo, do primeiro lote ao (arquivo, None)
+    meters = {}
+    error = None
+    summaries = None
+    try:
+        view, table = table, fact_table_name(table) if normalized else table
+        column_types = _output_column_types(selected_columns)
+        column_types[SOURCE_COLUMN] = 'INTEGER'
+        encoder = None
+        if normalized:
+            encoder = DimensionEncoder(conn)
+            column_types.update(encoder.column_types)
+        with SQLiteBulkLoader(conn, table, queue, column_types) as loader, single_transaction(conn):
+            prepare_storage(conn, view, normalized, replace)
+            drop_indexes(conn, view)
+            manifest = ImportManifest(conn, view)
+            manifest.create_table(replace=replace)
+            if aggregates:
+                summaries = SQLiteAggregates(conn, aggregates, queue)
+                summaries.create_tables(replace=replace)
+            while True:
+                item = batch_queue.get()
+                if item is None:
+                    break
+                file_name, chunk = item
+                meter = meters.get(file_name)
+                if meter is None:
+                    meter = meters[file_name] = StageMeter(queue, "write", file_name, sections=True).start()
+                with meter.section():
+                    if file_name not in source_ids:
+                        source_ids[file_name] = manifest.begin(sources[file_name], options, summaries)
+                    if chunk is None:
+                        manifest.finish(source_ids[file_name], rows_per_file.get(file_name, 0))
+                    else:
+                        if summaries is not None:
+                            summaries.add_chunk(chunk)
+                        if encoder is not None:
+                            encoder.encode(chunk)
+                        chunk[SOURCE_COLUMN] = source_ids[file_name]
+                        if loader.columns != list(chunk.columns):
+                            loader.create_table(chunk.columns, replace=replace and loader.columns is None, sample=chunk)
+                        loader.write_chunk(chunk)
+                if chunk is None:
+                    meter.finish()
+                    queue.put(("LOG", f"OK: {file_name} importado ({rows_per_file.get(file_name, 0)} linhas)."))
+                    continue
+                meter.add(rows=len(chunk))
+                rows_per_file[file_name] = rows_per_file.get(file_name, 0) + len(chunk)
+            if encoder is not None and loader.columns:
+                encoder.create_view(view, table, loader.columns)
+    except Exception as e:
+        error = str(e)
+        if stopped is not None:
+            stopped.set()
+        queue.put(("LOG", f"  - Erro ao gravar no banco: {e}"))
+        for meter in meters.values():
+            meter.ok = False
+            meter.finish()
+        while batch_queue.get() is not None:
+            pass
+    finally:
+        conn.close()
+    result_queue.put((error is None, rows_per_file, error))
+
+def worker_build_indexes(conn_str, table, indexes, queue, result_queue):
+    conn = sqlite3.connect(conn_str)
+    try:
+        with StageMeter(queue, "indexes", table):
+            timings = build_indexes(conn, table, indexes, queue)
+        result_queue.put((True, timings, None))
+    except Exception as e:
+        queue.put(("LOG", f"[ERROR] Falha ao criar os índices: {e}"))
+        result_queue.put((False, [], str(e)))
+    finally:
+        conn.close()
+
+def worker_profile_file(txt_path, queue, result_queue):
+    from src.controllers.column_profile import profile_file
+
+    file_name = os.path.basename(txt_path)
+    try:
+        queue.put(("LOG", f"Calculando o perfil das colunas de {file_name}..."))
+        result_queue.put((True, profile_file(txt_path, queue), None))
+    except Exception as e:
+        queue.put(("LOG", f"[ERROR] Falha ao calcular o perfil de {file_name}: {e}"))
+        result_queue.put((False, None, str(e)))
+
 class DownloadManager:
     DATA_DIR = "data"
     DB_PATH = os.path.join(DATA_DIR, "rais.db")
     NOME_TABELA_FINAL = "vinculos"
+    PARQUET_DIR = os.path.join(DATA_DIR, "parquet")
+    DEFAULT_MAX_CONNECTIONS = 3
+    DEFAULT_SEGMENTS_PER_FILE = 4
+    DEFAULT_DECOMPRESS_WORKERS = 2
+    # Um núcleo fica para o processo escritor da importação em lote
+    DEFAULT_PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+    DEFAULT_CHUNK_SIZE = IMPORT_CHUNK_SIZE
+    # Lotes em trânsito para o escritor; limita a memória quando ele é o gargalo
+    BATCH_QUEUE_SIZE = 4
+    # Itens em espera entre dois estágios do pipeline; um estágio lento segura os anteriores
+    PIPELINE_QUEUE_SIZE = 2
 
-    def __init__(self, queue):
+    def __init__(self, queue, max_connections=DEFAULT_MAX_CONNECTIONS, segments_per_file=DEFAULT_SEGMENTS_PER_FILE,
+                 decompress_workers=DEFAULT_DECOMPRESS_WORKERS, parse_workers=DEFAULT_PARSE_WORKERS,
+                 aggregates=DEFAULT_AGGREGATES, indexes=DEFAULT_INDEXES, covering_indexes=False,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
         self.queue = queue
+        self.ftp_host = FTPService.FTP_HOST
+        self.max_connections = max(1, int(max_connections))
+        self.segments_per_file = max(1, int(segments_per_file))
+        self.decompress_workers = max(1, int(decompress_workers))
+        self.parse_workers = max(1, int(parse_workers))
+        self.chunk_size = max(1, int(chunk_size))
+        # Tabelas de agregados mantidas durante a importação (vazio desativa)
+        self.aggregates = list(aggregates or [])
+        # Índices criados (com ANALYZE) depois de cada importação para o banco;
+        # os de cobertura aceleram as consultas comuns ao custo de espaço
+        self.indexes = list(indexes or []) + (list(COVERING_INDEXES) if covering_indexes else [])
         self.active_processes = []
+        self._processes_lock = threading.Lock()
+        self._catalog_sizes = {}
         self._cancel_requested = multiprocessing.Event()
+        # Opções repassadas aos workers de importação (destino Parquet, filtro de linhas)
+        self._import_options = {}
+        # Alguma importação para o banco terminou nesta execução do pipeline
+        self._db_imported = False
+        # Resultado da última execução de start_processing: .txt extraídos e
+        # arquivos (ou etapas) que falharam
+        self.extracted_files = []
+        self.failures = []
 
     def cancel_active_downloads(self):
         self.queue.put(("LOG", "Cancelamento solicitado..."))
         self._cancel_requested.set()
-        for p in self.active_processes:
+        with self._processes_lock:
+            processes = list(self.active_processes)
+        for p in processes:
             if p.is_alive():
                 p.terminate()
                 p.join(timeout=1)
-        self.active_processes = []
+        with self._processes_lock:
+            self.active_processes = []
         self.queue.put(("LOG", "Processos de download terminados."))
 
-    def start_processing(self, years, files, available_data):
+    def start_processing(self, years, files, available_data, stream_import=False, import_to_db=False,
+                         parquet_output=False, parquet_compression=ParquetDatasetWriter.DEFAULT_COMPRESSION,
+                         row_filter=None, normalized_storage=False, replace=False):
+        """Baixa, descomprime e, opcionalmente, importa os arquivos selecionados.
+
+        As etapas rodam como um pipeline: cada arquivo baixado segue na hora
+        para a descompressão (ou para a importação direta, com
+        `stream_import`), e cada .txt extraído segue para a importação quando
+        `import_to_db` é verdadeiro. Com `parquet_output`, a importação grava
+        no dataset Parquet em PARQUET_DIR em vez do banco. Com `row_filter`
+        (um RowFilter), só as linhas que passam no filtro são importadas. Com
+        `normalized_storage`, o banco guarda as colunas de código em tabelas
+        de dimensão (ver dimension_tables). Com `replace`, a tabela, o
+        manifesto e os agregados de cargas anteriores são descartados antes
+        do primeiro download, o que permite trocar o modo de armazenamento.
+        Depois da última importação para o banco, os índices são criados de
+        uma vez (ver _build_indexes).
+        """
         self._cancel_requested.clear()
+        self._db_imported = False
+        self.extracted_files = []
+        self.failures = []
+        self._import_options = {'parquet_dir': self.PARQUET_DIR, 'compression': parquet_compression} if parquet_output else {}
+        self._import_options['aggregates'] = self.aggregates
+        self._import_options['chunk_size'] = self.chunk_size
+        if normalized_storage:
+            self._import_options['normalized'] = True
+        if row_filter is not None:
+            self._import_options['row_filter'] = row_filter
         try:
             if not os.path.exists(self.DATA_DIR): os.makedirs(self.DATA_DIR)
             
@@ -117,92 +1094,498 @@ class DownloadManager:
                 self.queue.put(("LOG", "Nenhum arquivo válido encontrado."))
                 return
 
-            downloaded_files = self._execute_downloads(tasks)
-            
+            if replace and (import_to_db or stream_import) and not parquet_output:
+                self._reset_storage(normalized_storage)
+
+            if stream_import:
+                stages = [(self._stream_import_stage, 1)]
+            else:
+                stages = [(self._decompress_stage, self.decompress_workers)]
+                if import_to_db:
+                    # Um único escritor: o SQLite não se beneficia de escritas concorrentes
+                    stages.append((self._import_stage, 1))
+            self._run_pipeline(tasks, stages)
+            to_db = (import_to_db or stream_import) and not parquet_output
+
             if self._cancel_requested.is_set():
                 self.queue.put(("LOG", "Processo interrompido."))
+                if to_db:
+                    self._warn_missing_indexes()
                 return
 
-            if downloaded_files:
-                self._process_files_to_db(downloaded_files)
+            # Também completa os índices que uma execução interrompida deixou por criar
+            if self._db_imported or (to_db and self._missing_indexes()):
+                self._build_indexes()
 
         except Exception as e:
+            self.failures.append(str(e))
             self.queue.put(("LOG", f"[ERRO GERAL] {e}"))
         finally:
             if not self._cancel_requested.is_set():
                  self.queue.put(("DONE", None))
 
-    def _execute_downloads(self, tasks):
+    def _run_pipeline(self, tasks, stages):
+        """Liga os downloads aos estágios seguintes por filas limitadas.
+
+        `stages` é uma lista de (função, número de threads); cada função
+        recebe (fila de entrada, fila de saída ou None).
+        """
+        queues = [Queue(maxsize=self.PIPELINE_QUEUE_SIZE) for _ in stages]
+        stage_threads = []
+        for i, (stage, num_workers) in enumerate(stages):
+            out_queue = queues[i + 1] if i + 1 < len(queues) else None
+            threads = [threading.Thread(target=stage, args=(queues[i], out_queue), daemon=True) for _ in range(num_workers)]
+            for t in threads:
+                t.start()
+            stage_threads.append(threads)
+
+        try:
+            self._execute_downloads(tasks, on_downloaded=lambda item: self._pipeline_put(queues[0], item))
+        finally:
+            # Encerra os estágios em ordem: cada um termina de consumir a sua fila
+            # antes de o seguinte receber os sinais de fim.
+            for stage_queue, threads in zip(queues, stage_threads):
+                for _ in threads:
+                    self._pipeline_put(stage_queue, None)
+                for t in threads:
+                    t.join()
+
+    def _pipeline_put(self, stage_queue, item):
+        """Coloca `item` na fila, esperando por espaço; desiste se houver cancelamento."""
+        while not self._cancel_requested.is_set():
+            try:
+                stage_queue.put(item, timeout=0.2)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _pipeline_get(self, stage_queue):
+        """Próximo item da fila, ou None no fim do estágio ou no cancelamento."""
+        while not self._cancel_requested.is_set():
+            try:
+                return stage_queue.get(timeout=0.2)
+            except Empty:
+                continue
+        return None
+
+    def _remove_archive(self, path_7z):
+        try:
+            os.remove(path_7z)
+        except OSError as e:
+            self.queue.put(("LOG", f"Aviso: Não foi possível remover o arquivo baixado {path_7z}: {e}"))
+
+    def _decompress_stage(self, in_queue, out_queue):
+        while True:
+            item = self._pipeline_get(in_queue)
+            if item is None:
+                return
+            path_7z, year = item
+            self.queue.put(("LOG", f"Descompactando: {os.path.basename(path_7z)}"))
+            result = self._run_worker(worker_decompress, (path_7z, self.DATA_DIR, self.queue, year))
+            if result is None or not result[0]:
+                self._record_failure(path_7z)
+                continue
+            self._remove_archive(path_7z)
+            self.extracted_files.extend(result[1])
+            if out_queue is not None:
+                for txt_path in result[1]:
+                    self._pipeline_put(out_queue, (txt_path, year))
+
+    def _import_stage(self, in_queue, out_queue):
+        while True:
+            item = self._pipeline_get(in_queue)
+            if item is None:
+                return
+            txt_path, year = item
+            to_parquet = bool(self._import_options.get('parquet_dir'))
+            options = dict(self._import_options)
+            if not to_parquet:
+                options['source'] = self._changed_source(txt_path, year, self._import_options.get('row_filter'))
+                if options['source'] is None:
+                    continue
+            destination = "o Parquet" if to_parquet else "o banco"
+            self.queue.put(("LOG", f"Importando {os.path.basename(txt_path)} para {destination}..."))
+            result = self._run_worker(worker_process_db, (txt_path, year, self.DB_PATH, self.queue, None),
+                                      {**options, 'parse_workers': self.parse_workers})
+            if result is None or not result[0]:
+                self._record_failure(txt_path)
+                continue
+            self._db_imported = not to_parquet
+            self.queue.put(("LOG", f"OK: {os.path.basename(txt_path)} importado."))
+
+    def _stream_import_stage(self, in_queue, out_queue):
+        """Importa cada .7z baixado direto no banco (ou no Parquet), sem gerar os .txt em `data/`."""
+        while True:
+            item = self._pipeline_get(in_queue)
+            if item is None:
+                return
+            path_7z, year = item
+            to_parquet = bool(self._import_options.get('parquet_dir'))
+            options = dict(self._import_options)
+            if not to_parquet:
+                options['source'] = self._changed_source(path_7z, year, self._import_options.get('row_filter'))
+                if options['source'] is None:
+                    self._remove_archive(path_7z)
+                    continue
+            result = self._run_worker(worker_stream_import, (path_7z, year, self.DB_PATH, self.queue), options)
+            if result is None or not result[0]:
+                self._record_failure(path_7z)
+                continue
+            self._db_imported = not to_parquet
+            self.queue.put(("LOG", f"OK: {os.path.basename(path_7z)} importado."))
+            self._remove_archive(path_7z)
+
+    def _record_failure(self, path):
+        if not self._cancel_requested.is_set():
+            self.failures.append(os.path.basename(path))
+
+    def _reset_storage(self, normalized):
+        """Descarta a tabela (ou view), o manifesto e os agregados das cargas anteriores."""
+        self.queue.put(("LOG", f"Substituindo a tabela '{self.NOME_TABELA_FINAL}' e os agregados existentes..."))
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            prepare_storage(conn, self.NOME_TABELA_FINAL, normalized, True)
+            ImportManifest(conn, self.NOME_TABELA_FINAL).create_table(replace=True)
+            if self.aggregates:
+                SQLiteAggregates(conn, self.aggregates, self.queue).create_tables(replace=True)
+        finally:
+            conn.close()
+
+    def _changed_source(self, path, year, row_filter=None, selected_columns=None):
+        """SourceInfo de `path` se ele precisa ser (re)importado no banco, ou None se o banco já o tem.
+
+        Compara tamanho, hash e opções com o manifesto de importações; o hash
+        só é recalculado quando o tamanho ou o mtime mudaram.
+        """
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            manifest = ImportManifest(conn, self.NOME_TABELA_FINAL)
+            source = manifest.source_info(path, year)
+            if manifest.is_current(source, import_options_key(selected_columns, row_filter)):
+                self.queue.put(("LOG", f"{os.path.basename(path)} ({year}) já está no banco sem alterações; ignorado."))
+                return None
+            return source
+        finally:
+            conn.close()
+
+    def _build_indexes(self):
+        """Cria os índices configurados que faltam e roda o ANALYZE depois da carga, em um processo separado.
+
+        Numa carga em tabela vazia, criar os índices uma vez ao final é bem
+        mais rápido do que mantê-los atualizados a cada INSERT; os que já
+        existem (atualização de um ano) são mantidos. Retorna [(índice, segundos)].
+        """
+        self.queue.put(("LOG", f"Criando os índices que faltam em '{self.NOME_TABELA_FINAL}' e rodando o ANALYZE..."))
+        started = time.perf_counter()
+        result = self._run_worker(worker_build_indexes, (self.DB_PATH, self.NOME_TABELA_FINAL, self.indexes, self.queue))
+        if result is None or not result[0]:
+            self._record_failure("índices")
+            return []
+        self.queue.put(("LOG", f"Índices prontos em {time.perf_counter() - started:.1f}s."))
+        return result[1]
+
+    def _missing_indexes(self):
+        """Índices configurados que faltam na tabela do banco."""
+        if not os.path.exists(self.DB_PATH):
+            return []
+        conn = sqlite3.connect(self.DB_PATH)
+        try:
+            return missing_indexes(conn, self.NOME_TABELA_FINAL, self.indexes)
+        finally:
+            conn.close()
+
+    def _warn_missing_indexes(self):
+        """Avisa, depois de um cancelamento, se as cargas já concluídas deixaram índices por criar."""
+        try:
+            missing = self._missing_indexes()
+        except sqlite3.Error as e:
+            missing = [f"(não verificados: {e})"]
+        if missing:
+            self.queue.put(("LOG", f"Aviso: faltam os índices {', '.join(missing)} em '{self.NOME_TABELA_FINAL}'; "
+                                   "eles serão criados ao fim da próxima importação."))
+
+    def _run_worker(self, target, args, kwargs=None):
+        """Executa `target` em um processo separado e aguarda o seu resultado.
+
+        O processo recebe uma `result_queue` como último argumento. Retorna
+        None se o cancelamento for solicitado ou se o processo terminar sem
+        publicar um resultado.
+        """
+        if self._cancel_requested.is_set():
+            return None
+
+        result_queue = multiprocessing.Queue(maxsize=1)
+        process = self._start_process(target, (*args, result_queue), kwargs)
+        return self._wait_result(process, result_queue)
+
+    def _start_process(self, target, args, kwargs=None):
+        process = multiprocessing.Process(target=target, args=args, kwargs=kwargs or {})
+        with self._processes_lock:
+            self.active_processes.append(process)
+        process.start()
+        return process
+
+    def _wait_result(self, process, result_queue):
+        """Aguarda o resultado de `process`; None no cancelamento ou se ele sair sem publicar."""
+        result = None
+        try:
+            while True:
+                try:
+                    result = result_queue.get(timeout=0.2)
+                    break
+                except Empty:
+                    if self._cancel_requested.is_set():
+                        break
+                    if not process.is_alive():
+                        # O processo pode ter publicado o resultado logo antes de sair
+                        try:
+                            result = result_queue.get(timeout=1)
+                        except Empty:
+                            pass
+                        break
+        finally:
+            if self._cancel_requested.is_set() and process.is_alive():
+                process.terminate()
+            process.join(timeout=5)
+            with self._processes_lock:
+                if process in self.active_processes:
+                    self.active_processes.remove(process)
+        return result
+
+    def _fetch_remote_sizes(self, tasks):
+        """Consulta o tamanho (comando SIZE) de cada arquivo em uma única conexão.
+
+        Tamanhos já conhecidos pelo catálogo do FTP são reaproveitados.
+        """
+        sizes = {t[1]: self._catalog_sizes[t[1]] for t in tasks if self._catalog_sizes.get(t[1]) is not None}
+        tasks = [t for t in tasks if t[1] not in sizes]
+        if not tasks:
+            return sizes
+        ftp = None
+        try:
+            # Mesmo servidor (e `host:porta`) usado pelos processos de download
+            host, _, port = self.ftp_host.partition(':')
+            ftp = ftplib.FTP(timeout=30)
+            ftp.encoding = 'latin-1'
+            ftp.connect(host, int(port or 21))
+            ftp.login()
+            ftp.voidcmd('TYPE I')
+            for task in tasks:
+                ftp_path = task[1]
+                try:
+                    sizes[ftp_path] = ftp.size(ftp_path) or 0
+                except ftplib.all_errors:
+                    sizes[ftp_path] = 0
+            ftp.quit()
+        except ftplib.all_errors as e:
+            self.queue.put(("LOG", f"Aviso: Não foi possível obter o tamanho dos arquivos: {e}"))
+            if ftp:
+                try: ftp.close()
+                except: pass
+        return sizes
+
+    def _execute_downloads(self, tasks, on_downloaded=None):
+        """Baixa as tarefas com até `max_connections` transferências simultâneas.
+
+        `on_downloaded((caminho, ano))` é chamado a cada download concluído;
+        se bloquear, novos downloads só começam quando ele retornar.
+        """
+        sizes = self._fetch_remote_sizes(tasks)
+        # Maiores primeiro: os arquivos longos começam cedo e os pequenos preenchem as lacunas
+        tasks = sorted(tasks, key=lambda t: sizes.get(t[1], 0), reverse=True)
+
+        num_connections = min(self.max_connections, len(tasks))
         self.queue.put(("TOTAL_PROGRESS_MAX", len(tasks)))
-        self.queue.put(("LOG", f"Iniciando download sequencial de {len(tasks)} arquivos..."))
+        self.queue.put(("LOG", f"Iniciando download de {len(tasks)} arquivos com até {num_connections} conexões simultâneas..."))
         
         downloaded_files = []
-        for i, task in enumerate(tasks):
-            if self._cancel_requested.is_set():
-                break
+        completed = 0
+        pending_tasks = iter(tasks)
+        download_options = {"segments": self.segments_per_file}
+        with ThreadPoolExecutor(max_workers=num_connections) as executor:
+            futures = {}
+            def submit_next():
+                task = next(pending_tasks, None)
+                if task is not None and not self._cancel_requested.is_set():
+                    futures[executor.submit(self._run_worker, worker_download, task, download_options)] = task
 
-            self.queue.put(("LOG", f"Iniciando arquivo {i+1}/{len(tasks)}: {os.path.basename(task[1])}"))
-            
-            result_queue = multiprocessing.Queue(maxsize=1)
-            ftp_host, ftp_path, dest, year, queue = task
-            process_args = (ftp_host, ftp_path, dest, year, queue, result_queue)
-
-            process = multiprocessing.Process(target=worker_download, args=process_args)
-            self.active_processes = [process]
-            process.start()
-
-            # Block until result is available or cancel is requested
-            while result_queue.empty():
-                if self._cancel_requested.is_set():
-                    process.terminate()
-                    process.join(timeout=1)
-                    break
-                time.sleep(0.1)
+            for _ in range(num_connections):
+                submit_next()
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures.pop(future)
+                    result = future.result()
 
-            if not self._cancel_requested.is_set():
-                if not result_queue.empty():
-                    success, path, result = result_queue.get()
-                    if success:
-                        self.queue.put(("LOG", f"OK: {os.path.basename(path)}"))
-                        downloaded_files.append((path, result))
+                    if self._cancel_requested.is_set():
+                        continue
+
+                    if result is None:
+                        self._record_failure(task[2])
+                        self.queue.put(("LOG", f"FALHA: {os.path.basename(task[2])} - processo encerrado sem resultado"))
                     else:
-                        self.queue.put(("LOG", f"FALHA: {os.path.basename(path)} - {result}"))
+                        success, path, value = result
+                        if success:
+                            self.queue.put(("LOG", f"OK: {os.path.basename(path)}"))
+                            downloaded_files.append((path, value))
+                            if on_downloaded is not None:
+                                on_downloaded((path, value))
+                        else:
+                            self._record_failure(path)
+                            self.queue.put(("LOG", f"FALHA: {os.path.basename(path)} - {value}"))
 
-            process.join()
-            self.active_processes = []
+                    completed += 1
+                    self.queue.put(("TOTAL_PROGRESS_UPDATE", completed))
+                    submit_next()
 
-            if self._cancel_requested.is_set():
-                break
+        return downloaded_files
 
-            self.queue.put(("TOTAL_PROGRESS_UPDATE", i + 1))
+    def import_files_to_db(self, txt_paths, selected_columns=None, replace=True, row_filter=None, normalized_storage=False):
+        """Importa vários .txt extraídos para o banco de uma só vez.
 
-        return downloaded_files
+        Os arquivos são lidos e convertidos em paralelo por até
+        `parse_workers` processos, que enviam lotes tipados a um único
+        processo escritor, dono da conexão SQLite. Com `replace`, a tabela é
+        recriada no primeiro lote; sem ele, arquivos já importados sem
+        alterações são ignorados e os alterados substituem só as próprias
+        linhas (ver import_manifest). Com `row_filter`, cada processo de leitura
+        descarta as linhas que não passam no filtro; com `normalized_storage`,
+        as colunas de código vão para tabelas de dimensão. Os índices são
+        criados depois da gravação. Roda no thread chamador e publica
+        IMPORT_COMPLETE ao final.
+        """
+        self._cancel_requested.clear()
+        started = time.perf_counter()
+        if not txt_paths:
+            self.queue.put(("IMPORT_COMPLETE", {'ok': True, 'message': "Nenhum arquivo para importar."}))
+            return
 
-    def _process_files_to_db(self, downloaded_files):
-        self.queue.put(("LOG", "\nIniciando descompactação..."))
-        for path_7z, year in sorted(downloaded_files, key=lambda x: (x[1], x[0])):
-            if self._cancel_requested.is_set(): break
-            
-            self.queue.put(("LOG", f"Descompactando: {os.path.basename(path_7z)}"))
-            # A descompressão é rápida, pode ser feita no thread principal
-            worker_decompress(path_7z, self.DATA_DIR, self.queue)
+        def source_info(txt_path):
+            year = _year_from_file_name(os.path.basename(txt_path))
+            if replace:
+                return _source_info(self.DB_PATH, txt_path, year)
+            return self._changed_source(txt_path, year, row_filter, selected_columns)
+
+        # O hash dos arquivos é calculado em paralelo (o hashlib libera o GIL)
+        with ThreadPoolExecutor(max_workers=min(self.parse_workers, len(txt_paths))) as executor:
+            sources = dict(zip(txt_paths, executor.map(source_info, txt_paths)))
+        txt_paths = [p for p in txt_paths if sources[p] is not None]
+        if not txt_paths:
+            self.queue.put(("IMPORT_COMPLETE", {'ok': True, 'message': "Nenhum arquivo alterado desde a última importação."}))
+            return
+
+        self.queue.put(("LOG", f"Importando {len(txt_paths)} arquivos para o banco com até {self.parse_workers} processos de leitura..."))
+        batch_queue = multiprocessing.Queue(maxsize=self.BATCH_QUEUE_SIZE)
+        writer_result = multiprocessing.Queue(maxsize=1)
+        writer_stopped = multiprocessing.Event()
+        writer = self._start_process(worker_db_writer, (self.DB_PATH, self.NOME_TABELA_FINAL, batch_queue, self.queue,
+                                                        selected_columns, replace, writer_result, self.aggregates,
+                                                        normalized_storage,
+                                                        {os.path.basename(p): sources[p] for p in txt_paths},
+                                                        import_options_key(selected_columns, row_filter),
+                                                        writer_stopped))
+
+        def watch_writer():
+            # Também cobre o escritor encerrado sem chegar ao tratamento de erro (ex.: falta de memória)
+            multiprocessing.connection.wait([writer.sentinel])
+            writer_stopped.set()
+
+        threading.Thread(target=watch_writer, daemon=True).start()
+
+        # Com menos arquivos que processos, cada arquivo também é dividido em faixas
+        workers_per_file = max(1, self.parse_workers // len(txt_paths))
+
+        def parse(txt_path):
+            year = _year_from_file_name(os.path.basename(txt_path))
+            return self._run_worker(worker_parse_file, (txt_path, year, selected_columns, batch_queue, self.queue),
+                                    {'parse_workers': workers_per_file, 'row_filter': row_filter,
+                                     'writer_stopped': writer_stopped})
+
+        with ThreadPoolExecutor(max_workers=min(self.parse_workers, len(txt_paths))) as executor:
+            parse_results = list(executor.map(parse, txt_paths))
+
+        # Um escritor que falhou continua consumindo a fila até receber este None
+        while not self._cancel_requested.is_set() and writer.is_alive():
             try:
-                os.remove(path_7z)
-            except OSError as e:
-                self.queue.put(("LOG", f"Aviso: Não foi possível remover o arquivo baixado {path_7z}: {e}"))
-        self.queue.put(("LOG", "Descompactação concluída."))
-
-    def process_single_file_to_db(self, txt_path, year, selected_columns):
-        self.queue.put(("LOG", f"Iniciando importação de {os.path.basename(txt_path)} em processo separado..."))
-        task_args = (txt_path, year, self.DB_PATH, True, self.queue, selected_columns)
-        proc = multiprocessing.Process(target=worker_process_db, args=task_args)
-        self.active_processes = [proc]
-        proc.start()
-        # Não bloqueia, a UI vai receber o DONE da fila
+                batch_queue.put(None, timeout=BATCH_PUT_TIMEOUT)
+                break
+            except Full:
+                pass
+        result = self._wait_result(writer, writer_result)
+        # Com o escritor encerrado, o que restar na fila não será lido
+        batch_queue.cancel_join_thread()
+        if self._cancel_requested.is_set():
+            self.queue.put(("LOG", "Importação interrompida."))
+            self.queue.put(("IMPORT_COMPLETE", {'ok': False, 'message': "Importação cancelada."}))
+            return
+
+        failed = [os.path.basename(p) for p, r in zip(txt_paths, parse_results) if r is None or not r[0]]
+        total_rows = sum(result[1].values()) if result else 0
+        elapsed = time.perf_counter() - started
+        self.queue.put(("LOG", f"Importação concluída: {total_rows} linhas de {len(txt_paths) - len(failed)} arquivos "
+                               f"em {elapsed:.1f}s ({total_rows / elapsed if elapsed > 0 else 0:,.0f} linhas/s)."))
+        if result is not None and result[0]:
+            self._build_indexes()
+        if result is None or not result[0]:
+            error = result[2] if result else "processo escritor encerrado sem resultado"
+            self.queue.put(("IMPORT_COMPLETE", {'ok': False, 'message': f"Ocorreu um erro ao gravar no banco: {error}"}))
+        elif failed:
+            self.queue.put(("IMPORT_COMPLETE", {'ok': False, 'message': f"Falha ao importar: {', '.join(failed)}"}))
+        else:
+            self.queue.put(("IMPORT_COMPLETE", {'ok': True, 'message': f"{total_rows} linhas importadas para {self.DB_PATH}."}))
+
+    def profile_columns(self, txt_path):
+        """Calcula (ou lê do cache) o perfil das colunas de um .txt extraído.
+
+        A leitura roda em um processo separado e o resultado é publicado como
+        PROFILE_READY ({'path', 'profile'}); `profile` é None em caso de erro.
+        """
+        self._cancel_requested.clear()
+        result = self._run_worker(worker_profile_file, (txt_path, self.queue))
+        profile = result[1] if result and result[0] else None
+        self.queue.put(("PROFILE_READY", {'path': txt_path, 'profile': profile}))
+
+    def export_file(self, txt_path, dest, export_format, selected_columns,
+                    compression=ParquetDatasetWriter.DEFAULT_COMPRESSION, row_filter=None):
+        """Exporta um .txt extraído para `dest` no formato escolhido.
+
+        O arquivo é lido em chunks, apenas com as colunas selecionadas (e só
+        com as linhas que passam em `row_filter`, se dado), e cada chunk é
+        gravado no destino antes de o próximo ser lido, então a memória usada
+        não depende do tamanho do arquivo. Roda no thread chamador e publica
+        EXPORT_COMPLETE ao final. No Parquet, `dest` é a pasta do dataset e o
+        ano da partição vem do prefixo do nome do arquivo (ex.:
+        2020_RAIS_...txt).
+        """
+        file_name = os.path.basename(txt_path)
+        self.queue.put(("LOG", f"Exportando {file_name} para {dest} em formato {export_format}..."))
+        try:
+            with StageMeter(self.queue, "export", file_name) as meter:
+                meter.bytes = os.path.getsize(txt_path)
+                if export_format == "PARQUET":
+                    meter.rows = _load_text_into_parquet(txt_path, file_name, _year_from_file_name(file_name), dest,
+                                                         self.queue, selected_columns, compression, row_filter=row_filter,
+                                                         measure_stages=False)
+                    message = f"Dados exportados com sucesso para:\n{dest}"
+                elif export_format == "SQLite":
+                    table, meter.rows = _export_sqlite(txt_path, dest, selected_columns, self.queue, row_filter)
+                    message = f"Dados exportados com sucesso para SQLite:\n{dest}\nTabela: {table}"
+                elif export_format in ("TXT", "CSV", "EXCEL"):
+                    meter.rows = _export_text(txt_path, dest, export_format, selected_columns, self.queue, row_filter)
+                    message = f"Dados exportados com sucesso para:\n{dest}"
+                else:
+                    raise Exception(f"formato de exportação inválido: {export_format}")
+            self.queue.put(("LOG", f"Dados exportados com sucesso para {dest} em formato {export_format}."))
+            self.queue.put(("EXPORT_COMPLETE", {'ok': True, 'message': message}))
+        except Exception as e:
+            self.queue.put(("LOG", f"[ERROR] Erro ao exportar dados para {export_format}: {e}"))
+            self.queue.put(("EXPORT_COMPLETE", {'ok': False, 'message': f"Ocorreu um erro ao exportar os dados: {e}"}))
 
     def _prepare_tasks(self, years, files, available_data):
         self.queue.put(("LOG", f"[Manager] Preparando tarefas para Anos: {years} e {len(files)} arquivos selecionados."))
         tasks = []
+        self._catalog_sizes = {}
         for year in years:
             year_data = available_data.get(year)
             if not year_data: continue
@@ -211,8 +1594,9 @@ class DownloadManager:
             for file_name in files:
                 if file_name in year_data['files']:
                     ftp_path = f"/pdet/microdados/RAIS/{dir_name}/{file_name}"
+                    self._catalog_sizes[ftp_path] = year_data.get('sizes', {}).get(file_name)
                     local_path = os.path.join(self.DATA_DIR, f"{year}_{os.path.basename(file_name)}")
-                    task_tuple = (FTPService.FTP_HOST, ftp_path, local_path, year, self.queue)
+                    task_tuple = (self.ftp_host, ftp_path, local_path, year, self.queue)
                     if task_tuple not in tasks:
                         tasks.append(task_tuple)
         self.queue.put(("LOG", f"[Manager] {len(tasks)} tarefas criadas."))
@@ -1,49 +1,253 @@
 import ftplib
+import json
+import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 class FTPService:
     """Encapsula a lógica de interação com o servidor FTP."""
     FTP_HOST = "ftp.mtps.gov.br"
     FTP_PATH = "/pdet/microdados/RAIS/"
+    CACHE_PATH = os.path.join("data", "ftp_catalog.json")
+    CACHE_VERSION = 1
+    DEFAULT_LISTING_CONNECTIONS = 4
 
-    def __init__(self, queue):
+    def __init__(self, queue, listing_connections=DEFAULT_LISTING_CONNECTIONS):
         self.queue = queue
+        self.listing_connections = max(1, int(listing_connections))
+        # None enquanto não se sabe se o servidor aceita MLSD
+        self._mlsd_supported = None
 
     def fetch_available_data(self):
-        """Busca a lista de anos e arquivos disponíveis no FTP."""
-        try:
-            self.queue.put(("LOG", "Conectando ao servidor FTP..."))
-            ftp = ftplib.FTP(self.FTP_HOST, timeout=30)
-            # Alguns servidores FTP retornam nomes com codificações diferentes
-            # (ex: latin-1 / cp1252). Forçar uma codificação permissiva evita
-            # erros de decodificação como "'utf-8' codec can't decode byte".
-            ftp.encoding = 'latin-1'
+        """Busca a lista de anos e arquivos disponíveis no FTP.
+
+        Se existir um catálogo em cache, ele é publicado imediatamente em
+        FETCH_COMPLETE e o servidor é consultado em seguida apenas para
+        atualizá-lo; diretórios cujo MDTM não mudou não são listados de novo.
+        Arquivos novos encontrados nessa atualização são publicados em
+        CATALOG_UPDATED.
+        """
+        cached = self._load_cache()
+        if cached:
+            self.queue.put(("LOG", "Catálogo carregado do cache local. Atualizando em segundo plano..."))
+            self.queue.put(("FETCH_COMPLETE", self._build_available_data(cached)))
+
+        try:
+            catalog = self._refresh_catalog(cached)
+        except Exception as e:
+            if cached:
+                self.queue.put(("LOG", f"Aviso: Não foi possível atualizar o catálogo do FTP: {e}"))
+            else:
+                self.queue.put(("LOG", f"Erro Crítico ao buscar dados do FTP: {e}"))
+                self.queue.put(("FETCH_COMPLETE", {}))
+            return
+
+        self._save_cache(catalog)
+        if not cached:
+            self.queue.put(("FETCH_COMPLETE", self._build_available_data(catalog)))
+            return
+
+        new_files = self._diff_catalogs(cached, catalog)
+        if new_files:
+            self.queue.put(("CATALOG_UPDATED", {"data": self._build_available_data(catalog), "new_files": new_files}))
+        else:
+            self.queue.put(("LOG", "Catálogo do FTP já está atualizado."))
+
+    def _connect(self):
+        # FTP_HOST aceita uma porta (`host:porta`)
+        host, _, port = self.FTP_HOST.partition(':')
+        ftp = ftplib.FTP(timeout=30)
+        # Alguns servidores FTP retornam nomes com codificações diferentes
+        # (ex: latin-1 / cp1252). Forçar uma codificação permissiva evita
+        # erros de decodificação como "'utf-8' codec can't decode byte".
+        ftp.encoding = 'latin-1'
+        try:
+            ftp.connect(host, int(port or 21))
             ftp.login()
+        except BaseException:
+            ftp.close()
+            raise
+        return ftp
+
+    def _refresh_catalog(self, cached):
+        """Consulta o servidor e retorna o catálogo {dir: {'mdtm', 'files': {nome: {'size', 'mdtm'}}}}."""
+        self.queue.put(("LOG", "Conectando ao servidor FTP..."))
+        ftp = self._connect()
+        try:
             self.queue.put(("LOG", "Obtendo lista de diretórios..."))
-            ftp.cwd(self.FTP_PATH)
-            
-            all_dirs = ftp.nlst()
-            dados_completos = {}
-            
-            for dir_name in all_dirs:
-                match = re.search(r'(\d{4})', dir_name)
-                if match:
-                    ano = match.group(1)
-                    self.queue.put(("LOG", f"Buscando arquivos para o ano {ano}..."))
-                    try:
-                        ftp.cwd(f"{self.FTP_PATH}/{dir_name}/")
-                        arquivos_ano = [f for f in ftp.nlst() if f.lower().endswith('.7z')]
-                        if arquivos_ano:
-                            if ano not in dados_completos:
-                                dados_completos[ano] = {'dir': dir_name, 'files': []}
-                            dados_completos[ano]['files'].extend(arquivos_ano)
-                    except ftplib.error_perm:
-                        self.queue.put(("LOG", f"Aviso: Não foi possível acessar o diretório {dir_name}."))
-                        continue
-            
-            sorted_dados = dict(sorted(dados_completos.items(), reverse=True))
+            root_dirs = self._list_root(ftp)
+
+            cached_dirs = cached.get('dirs', {}) if cached else {}
+            catalog_dirs = {}
+            to_list = []
+            for dir_name, mdtm in root_dirs.items():
+                previous = cached_dirs.get(dir_name)
+                if previous and mdtm and previous.get('mdtm') == mdtm:
+                    catalog_dirs[dir_name] = previous
+                else:
+                    to_list.append(dir_name)
+
+            for dir_name, files in self._list_directories(ftp, to_list).items():
+                catalog_dirs[dir_name] = {'mdtm': root_dirs[dir_name], 'files': files}
             ftp.quit()
-            self.queue.put(("FETCH_COMPLETE", sorted_dados))
-        except Exception as e:
-            self.queue.put(("LOG", f"Erro Crítico ao buscar dados do FTP: {e}"))
-            self.queue.put(("FETCH_COMPLETE", {}))
+        except BaseException:
+            ftp.close()
+            raise
+        return {'version': self.CACHE_VERSION, 'host': self.FTP_HOST, 'dirs': catalog_dirs}
+
+    def _list_root(self, ftp):
+        """Retorna {diretório: MDTM ou None} para os diretórios com ano no nome."""
+        if self._mlsd_supported is not False:
+            try:
+                entries = list(ftp.mlsd(self.FTP_PATH, facts=['type', 'modify']))
+                self._mlsd_supported = True
+                return {name: facts.get('modify') for name, facts in entries
+                        if facts.get('type') == 'dir' and re.search(r'(\d{4})', name)}
+            except ftplib.error_perm as e:
+                if not self._is_unsupported_command(e):
+                    raise
+                self._mlsd_supported = False
+
+        ftp.cwd(self.FTP_PATH)
+        return {name: self._modification_time(ftp, f"{self.FTP_PATH}/{name}/")
+                for name in ftp.nlst() if re.search(r'(\d{4})', name)}
+
+    def _list_directories(self, ftp, dir_names):
+        """Lista os diretórios em paralelo, cada thread com a sua própria conexão.
+
+        Diretórios que não puderem ser listados no pool (por exemplo, porque o
+        servidor recusou conexões extras) são listados na conexão principal.
+        """
+        results = {}
+        pending = list(dir_names)
+        num_connections = min(self.listing_connections, len(pending))
+        if num_connections > 1:
+            local = threading.local()
+            connections = []
+            connections_lock = threading.Lock()
+
+            def list_with_own_connection(dir_name):
+                try:
+                    if not hasattr(local, 'ftp'):
+                        local.ftp = self._connect()
+                        with connections_lock:
+                            connections.append(local.ftp)
+                    return self._list_directory_logged(local.ftp, dir_name)
+                except (OSError, EOFError, ftplib.error_temp, ftplib.error_reply):
+                    return None
+
+            with ThreadPoolExecutor(max_workers=num_connections) as executor:
+                for dir_name, files in zip(pending, executor.map(list_with_own_connection, pending)):
+                    if files is not None:
+                        results[dir_name] = files
+            for conn in connections:
+                try: conn.quit()
+                except ftplib.all_errors: conn.close()
+            pending = [d for d in pending if d not in results]
+
+        for dir_name in pending:
+            files = self._list_directory_logged(ftp, dir_name)
+            if files is not None:
+                results[dir_name] = files
+        # Diretórios inacessíveis ficam de fora, como antes
+        return {d: f for d, f in results.items() if f is not False}
+
+    def _list_directory_logged(self, ftp, dir_name):
+        self.queue.put(("LOG", f"Buscando arquivos em {dir_name}..."))
+        try:
+            return self._list_directory(ftp, dir_name)
+        except ftplib.error_perm:
+            self.queue.put(("LOG", f"Aviso: Não foi possível acessar o diretório {dir_name}."))
+            return False
+
+    def _list_directory(self, ftp, dir_name):
+        """Retorna {arquivo.7z: {'size', 'mdtm'}}, em uma única chamada MLSD quando possível."""
+        dir_path = f"{self.FTP_PATH}/{dir_name}/"
+        if self._mlsd_supported is not False:
+            try:
+                entries = list(ftp.mlsd(dir_path, facts=['type', 'size', 'modify']))
+                self._mlsd_supported = True
+                return {name: {'size': int(facts['size']) if 'size' in facts else None, 'mdtm': facts.get('modify')}
+                        for name, facts in entries
+                        if facts.get('type') == 'file' and name.lower().endswith('.7z')}
+            except ftplib.error_perm as e:
+                if not self._is_unsupported_command(e):
+                    raise
+                self._mlsd_supported = False
+
+        ftp.cwd(dir_path)
+        names = [f for f in ftp.nlst() if f.lower().endswith('.7z')]
+        # NLST muda a sessão para ASCII; SIZE exige modo binário
+        ftp.voidcmd('TYPE I')
+        return {f: {'size': self._file_size(ftp, f), 'mdtm': self._modification_time(ftp, f)} for f in names}
+
+    @staticmethod
+    def _is_unsupported_command(error):
+        """Respostas 500/501/502/504 indicam comando (ou opção) não implementado."""
+        return str(error)[:3] in ('500', '501', '502', '504')
+
+    @staticmethod
+    def _modification_time(ftp, path):
+        """Retorna o MDTM de `path` ou None se o servidor não o informar."""
+        try:
+            return ftp.sendcmd(f"MDTM {path}")[4:].strip()
+        except ftplib.all_errors:
+            return None
+
+    @staticmethod
+    def _file_size(ftp, path):
+        try:
+            return ftp.size(path)
+        except ftplib.all_errors:
+            return None
+
+    @staticmethod
+    def _build_available_data(catalog):
+        """Converte o catálogo no formato usado pela interface: {ano: {'dir', 'files', 'sizes'}}."""
+        dados_completos = {}
+        for dir_name, entry in sorted(catalog.get('dirs', {}).items()):
+            match = re.search(r'(\d{4})', dir_name)
+            arquivos_ano = sorted(entry.get('files', {}))
+            if not match or not arquivos_ano:
+                continue
+            ano = match.group(1)
+            if ano not in dados_completos:
+                dados_completos[ano] = {'dir': dir_name, 'files': [], 'sizes': {}}
+            dados_completos[ano]['files'].extend(arquivos_ano)
+            for name in arquivos_ano:
+                dados_completos[ano]['sizes'][name] = entry['files'][name].get('size')
+        return dict(sorted(dados_completos.items(), reverse=True))
+
+    @staticmethod
+    def _diff_catalogs(old, new):
+        """Lista (diretório, arquivo) presentes em `new` e ausentes ou alterados em `old`."""
+        old_dirs = old.get('dirs', {})
+        changed = []
+        for dir_name, entry in new.get('dirs', {}).items():
+            old_files = old_dirs.get(dir_name, {}).get('files', {})
+            for name, info in entry.get('files', {}).items():
+                if old_files.get(name) != info:
+                    changed.append((dir_name, name))
+        return sorted(changed)
+
+    def _load_cache(self):
+        try:
+            with open(self.CACHE_PATH, encoding='utf-8') as f:
+                catalog = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # O catálogo de outro servidor (ex: um espelho via --ftp-host) não serve
+        if catalog.get('version') != self.CACHE_VERSION or catalog.get('host') != self.FTP_HOST:
+            return None
+        return catalog
+
+    def _save_cache(self, catalog):
+        try:
+            os.makedirs(os.path.dirname(self.CACHE_PATH), exist_ok=True)
+            tmp_path = self.CACHE_PATH + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(catalog, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.CACHE_PATH)
+        except OSError as e:
+            self.queue.put(("LOG", f"Aviso: Não foi possível salvar o cache do catálogo: {e}"))
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from src.controllers.dimension_tables import fact_table_name
+from src.controllers.sqlite_loader import _quote, transaction
+
+MANIFEST_TABLE = "importacoes"
+# Coluna das linhas importadas com o id da origem no manifesto
+SOURCE_COLUMN = "origem_id"
+# Aumentar quando a conversão das linhas mudar (layout, tipos, nomes de
+# coluna): as origens gravadas com a versão anterior são reimportadas
+SCHEMA_VERSION = 1
+HASH_BLOCK_BYTES = 8 * 1024 * 1024
+
+STATUS_LOADING = 'carregando'
+STATUS_OK = 'ok'
+
+# Extensões dos arquivos de origem: o .txt extraído ou o .7z na importação direta
+SOURCE_EXTENSIONS = ('.txt', '.7z')
+
+# Um arquivo de origem (.txt, ou .7z na importação direta); no manifesto, vale
+# o conjunto de dados (ver source_key) e o ano
+SourceInfo = namedtuple('SourceInfo', 'name year path size mtime_ns hash')
+
+def source_index_name(table):
+    """Nome do índice de `origem_id` (o mesmo de DEFAULT_INDEXES para `vinculos`)."""
+    return f"idx_{table}_{SOURCE_COLUMN}"
+
+def source_key(name, year=None):
+    """Conjunto de dados de um arquivo de origem: o nome sem a extensão e sem o prefixo do ano.
+
+    `2020_RAIS_VINC_PUB_NI.txt` (extraído) e `2020_RAIS_VINC_PUB_NI.7z`
+    (importado direto) trazem as mesmas linhas e dão a mesma chave.
+    """
+    base, extension = os.path.splitext(name)
+    if extension.lower() not in SOURCE_EXTENSIONS:
+        base = name
+    if year is not None and base.startswith(f"{_year(year)}_"):
+        base = base[len(str(_year(year))) + 1:]
+    return base.casefold()
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_BYTES)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def import_options_key(selected_columns=None, row_filter=None):
+    """Texto que identifica as opções que mudam as linhas gravadas (colunas e filtro)."""
+    columns = sorted(selected_columns) if selected_columns and not callable(selected_columns) else None
+    return json.dumps({'colunas': columns, 'filtro': row_filter.text if row_filter is not None else None},
+                      ensure_ascii=False, sort_keys=True)
+
+class ImportManifest:
+    """Registro, no próprio banco, das origens importadas para `table`.
+
+    Cada origem (conjunto de dados + ano, ver source_key) tem uma entrada com o
+    nome do último arquivo importado, caminho, tamanho,
+    mtime, hash do conteúdo, número de linhas, versão do esquema e opções da
+    importação, e as suas linhas levam o id da entrada em `origem_id`
+    (indexada, ver source_index_name). Uma origem inalterada é ignorada; uma
+    alterada tem as linhas anteriores (e a sua contribuição aos agregados)
+    removidas antes da nova carga. Dentro de `single_transaction`, a remoção,
+    a carga e `finish` são confirmadas juntas: se a carga falhar, o ano fica
+    como estava. Importar o mesmo ano pelo .txt extraído e depois pelo .7z (ou
+    o contrário) substitui as linhas em vez de duplicá-las.
+
+    Uso:
+        manifest = ImportManifest(conn, "vinculos")
+        manifest.create_table()
+        info = manifest.source_info(path, year)
+        if not manifest.is_current(info, options):
+            with SQLiteBulkLoader(conn, "vinculos") as loader, single_transaction(conn):
+                source_id = manifest.begin(info, options, aggregates)
+                ...  # grava as linhas com origem_id = source_id
+                manifest.finish(source_id, rows)
+    """
+
+    def __init__(self, conn, table):
+        self.conn = conn
+        self.table = table
+
+    def create_table(self, replace=False):
+        with transaction(self.conn):
+            if replace:
+                self.conn.execute(f"DROP TABLE IF EXISTS {MANIFEST_TABLE}")
+            self.conn.execute(f"""CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                id INTEGER PRIMARY KEY, arquivo TEXT NOT NULL, ano INTEGER, caminho TEXT,
+                tamanho INTEGER, mtime_ns INTEGER, hash TEXT, linhas INTEGER,
+                versao_esquema INTEGER, opcoes TEXT, status TEXT, importado_em TEXT)""")
+
+    def entries(self, name, year):
+        """As entradas (dicts, da mais antiga à mais nova) do conjunto de dados de `name` no ano.
+
+        Normalmente há no máximo uma; bancos importados antes da chave por
+        conjunto de dados podem ter uma por arquivo (.txt e .7z).
+        """
+        if not self._exists(MANIFEST_TABLE):
+            return []
+        key = source_key(name, year)
+        cursor = self.conn.execute(f"SELECT * FROM {MANIFEST_TABLE} WHERE ano IS ? ORDER BY id", (_year(year),))
+        columns = [d[0] for d in cursor.description]
+        entries = [dict(zip(columns, row)) for row in cursor]
+        return [e for e in entries if source_key(e['arquivo'], e['ano']) == key]
+
+    def entry(self, name, year):
+        """A entrada da origem como dict, ou None."""
+        entries = self.entries(name, year)
+        return entries[0] if entries else None
+
+    def source_info(self, path, year, name=None):
+        """SourceInfo de `path`; o hash só é recalculado se o tamanho ou o mtime mudaram."""
+        name = name or os.path.basename(path)
+        stat = os.stat(path)
+        entry = self.entry(name, year)
+        if (entry and entry['arquivo'] == name and entry['tamanho'] == stat.st_size
+                and entry['mtime_ns'] == stat.st_mtime_ns and entry['hash']):
+            content_hash = entry['hash']
+        else:
+            content_hash = file_hash(path)
+        return SourceInfo(name, _year(year), path, stat.st_size, stat.st_mtime_ns, content_hash)
+
+    def is_current(self, info, options=""):
+        """Verdadeiro se a origem já foi importada por completo com o mesmo conteúdo e as mesmas opções.
+
+        Um arquivo apenas regravado (mtime novo, mesmo hash) continua
+        atual; a entrada passa a guardar o novo caminho e mtime. O mesmo ano
+        importado de outro arquivo (o .7z em vez do .txt) não é comparável e
+        é reimportado.
+        """
+        entries = self.entries(info.name, info.year)
+        if len(entries) != 1:
+            return False
+        entry = entries[0]
+        if (entry['arquivo'] != info.name or entry['status'] != STATUS_OK or entry['versao_esquema'] != SCHEMA_VERSION
+                or entry['opcoes'] != options or entry['tamanho'] != info.size or entry['hash'] != info.hash):
+            return False
+        if entry['mtime_ns'] != info.mtime_ns or entry['caminho'] != info.path:
+            with transaction(self.conn):
+                self.conn.execute(f"UPDATE {MANIFEST_TABLE} SET mtime_ns = ?, caminho = ? WHERE id = ?",
+                                  (info.mtime_ns, info.path, entry['id']))
+        return True
+
+    def begin(self, info, options="", aggregates=None):
+        """Remove as linhas anteriores da origem e registra a nova carga; retorna o id da origem.
+
+        São removidas as linhas de todas as entradas do mesmo conjunto de
+        dados e ano, qualquer que seja o arquivo que as gravou, e só a mais
+        antiga é mantida no manifesto. Linhas, agregados (um SQLiteAggregates)
+        e entradas mudam em uma transação; dentro de `single_transaction`, na
+        do chamador, que também inclui a nova carga.
+        """
+        entries = self.entries(info.name, info.year)
+        data_table = self._data_table()
+        has_rows = self._exists(data_table) and self.conn.execute(f"SELECT 1 FROM {_quote(data_table)} LIMIT 1").fetchone()
+        if has_rows and SOURCE_COLUMN not in self._columns(data_table):
+            raise Exception(f"'{self.table}' foi importada sem o registro de importações; "
+                            "importe substituindo a tabela uma vez para ativá-lo")
+        values = (info.name, info.year, info.path, info.size, info.mtime_ns, info.hash, 0, SCHEMA_VERSION, options,
+                  STATUS_LOADING)
+        with transaction(self.conn):
+            if has_rows and entries:
+                # Sem o índice, apagar e descontar uma origem percorreria a tabela inteira
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {_quote(source_index_name(self.table))} "
+                                  f"ON {_quote(data_table)} ({SOURCE_COLUMN})")
+            for entry in entries:
+                if has_rows:
+                    if aggregates is not None:
+                        aggregates.subtract_rows(self.table, SOURCE_COLUMN, entry['id'])
+                    self.conn.execute(f"DELETE FROM {_quote(data_table)} WHERE {SOURCE_COLUMN} = ?", (entry['id'],))
+            for entry in entries[1:]:
+                self.conn.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE id = ?", (entry['id'],))
+            if entries:
+                source_id = entries[0]['id']
+                self.conn.execute(f"UPDATE {MANIFEST_TABLE} SET arquivo = ?, ano = ?, caminho = ?, tamanho = ?, "
+                                  "mtime_ns = ?, hash = ?, linhas = ?, versao_esquema = ?, opcoes = ?, status = ?, "
+                                  "importado_em = NULL WHERE id = ?", (*values, source_id))
+                return source_id
+            cursor = self.conn.execute(f"INSERT INTO {MANIFEST_TABLE} (arquivo, ano, caminho, tamanho, mtime_ns, hash, "
+                                       "linhas, versao_esquema, opcoes, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       values)
+            return cursor.lastrowid
+
+    def finish(self, source_id, rows):
+        with transaction(self.conn):
+            self.conn.execute(f"UPDATE {MANIFEST_TABLE} SET linhas = ?, status = ?, importado_em = datetime('now') "
+                              "WHERE id = ?", (int(rows), STATUS_OK, source_id))
+
+    def _data_table(self):
+        row = self.conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (self.table,)).fetchone()
+        if row is None and self._exists(fact_table_name(self.table)):
+            # Carga normalizada interrompida antes de criar a view
+            return fact_table_name(self.table)
+        return fact_table_name(self.table) if row and row[0] == 'view' else self.table
+
+    def _exists(self, name):
+        return self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+    def _columns(self, table):
+        return [row[1] for row in self.conn.execute(f"PRAGMA table_info({_quote(table)})")]
+
+def _year(year):
+    return int(year) if year is not None else None
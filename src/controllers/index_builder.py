@@ -0,0 +1,132 @@
+import os
+import time
+from collections import namedtuple
+
+from src.controllers.dimension_tables import ID_SUFFIX, fact_table_name
+from src.controllers.import_manifest import SOURCE_COLUMN, source_index_name
+from src.controllers.rais_schema import normalize_column_name
+from src.controllers.sqlite_loader import _quote, transaction
+
+# `columns` usa os nomes do cabeçalho da RAIS (ou 'ano')
+IndexSpec = namedtuple('IndexSpec', 'name columns')
+
+# Filtros mais comuns nas consultas sobre `vinculos`, e a origem de cada linha,
+# pela qual a reimportação de um ano apaga e desconta dos agregados as linhas antigas
+DEFAULT_INDEXES = (
+    IndexSpec('idx_vinculos_ano_municipio', ('ano', 'Município')),
+    IndexSpec('idx_vinculos_ano_cbo', ('ano', 'CBO Ocupação 2002')),
+    IndexSpec('idx_vinculos_ano_cnae', ('ano', 'CNAE 2.0 Classe')),
+    IndexSpec(source_index_name('vinculos'), (SOURCE_COLUMN,)),
+)
+
+# Índices que também contêm as colunas lidas pelas consultas de emprego e
+# remuneração, que então não precisam visitar a tabela. Ocupam bem mais espaço.
+COVERING_INDEXES = (
+    IndexSpec('idx_vinculos_cobertura_municipio',
+              ('ano', 'Município', 'CBO Ocupação 2002', 'Vínculo Ativo 31/12', 'Vl Remun Média Nom')),
+    IndexSpec('idx_vinculos_cobertura_cnae',
+              ('ano', 'CNAE 2.0 Classe', 'Município', 'Vínculo Ativo 31/12', 'Vl Remun Média Nom')),
+)
+
+# Linhas amostradas por índice no ANALYZE; estatísticas aproximadas bastam ao
+# planejador e o ANALYZE completo levaria minutos em tabelas grandes
+ANALYSIS_LIMIT = 1000
+# Cache de páginas durante a ordenação dos índices (KiB, 256 MB)
+INDEX_CACHE_SIZE = -262144
+
+def _data_table(conn, table):
+    """A tabela que guarda as linhas: `table` ou, no modo normalizado, `<table>_fato`."""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    return fact_table_name(table) if row and row[0] == 'view' else table
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+
+def _index_columns(conn, name):
+    return [row[2] for row in conn.execute(f"PRAGMA index_info({_quote(name)})")]
+
+def drop_indexes(conn, table):
+    """Remove os índices criados sobre a tabela de `table` antes de uma carga em massa.
+
+    Só quando a tabela está vazia (primeira carga ou substituição): com linhas
+    de outros anos, manter os índices atualizados durante a importação de um
+    ano sai bem mais barato que recriá-los sobre a tabela inteira. Roda na
+    transação do chamador, se houver, e volta atrás junto com ela. Retorna os
+    nomes removidos.
+    """
+    data_table = _data_table(conn, table)
+    if not _table_columns(conn, data_table) or conn.execute(f"SELECT 1 FROM {_quote(data_table)} LIMIT 1").fetchone():
+        return []
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (data_table,))]
+    with transaction(conn):
+        for name in names:
+            conn.execute(f"DROP INDEX {_quote(name)}")
+    return names
+
+def _spec_columns(spec, columns):
+    """Colunas do índice na tabela: o id no lugar das colunas de código do modo normalizado."""
+    index_columns = []
+    for name in spec.columns:
+        name = normalize_column_name(name)
+        if name not in columns and name + ID_SUFFIX in columns:
+            name += ID_SUFFIX
+        index_columns.append(name)
+    return index_columns
+
+def missing_indexes(conn, table, specs=DEFAULT_INDEXES):
+    """Nomes dos índices de `specs` que poderiam existir na tabela (colunas presentes) e não existem."""
+    data_table = _data_table(conn, table)
+    columns = set(_table_columns(conn, data_table))
+    missing = []
+    for spec in specs:
+        index_columns = _spec_columns(spec, columns)
+        if columns.issuperset(index_columns) and _index_columns(conn, spec.name) != index_columns:
+            missing.append(spec.name)
+    return missing
+
+def build_indexes(conn, table, specs=DEFAULT_INDEXES, queue=None, analyze=True):
+    """Cria os índices de `specs` que faltam na tabela já carregada e roda o ANALYZE.
+
+    Índices que já existem com as mesmas colunas são mantidos; com o mesmo
+    nome e outras colunas, são recriados. Colunas de código gravadas como
+    ids (modo normalizado) são indexadas pelo id; índices com colunas
+    ausentes na tabela são ignorados. Retorna [(nome, segundos)] dos criados.
+    """
+    data_table = _data_table(conn, table)
+    columns = set(_table_columns(conn, data_table))
+    if not columns:
+        return []
+    conn.execute(f"PRAGMA cache_size = {INDEX_CACHE_SIZE}")
+    # Threads auxiliares na ordenação, se o SQLite foi compilado com elas
+    conn.execute(f"PRAGMA threads = {os.cpu_count() or 1}")
+
+    timings = []
+    for spec in specs:
+        index_columns = _spec_columns(spec, columns)
+        missing = [c for c in index_columns if c not in columns]
+        if missing:
+            if queue is not None:
+                queue.put(("LOG", f"  - Índice {spec.name} ignorado: colunas ausentes ({', '.join(missing)})."))
+            continue
+        if _index_columns(conn, spec.name) == index_columns:
+            continue
+        started = time.perf_counter()
+        with conn:
+            conn.execute(f"DROP INDEX IF EXISTS {_quote(spec.name)}")
+            conn.execute(f"CREATE INDEX {_quote(spec.name)} ON {_quote(data_table)} ({', '.join(_quote(c) for c in index_columns)})")
+        elapsed = time.perf_counter() - started
+        timings.append((spec.name, elapsed))
+        if queue is not None:
+            queue.put(("LOG", f"  - Índice {spec.name} criado em {elapsed:.1f}s."))
+
+    if analyze:
+        started = time.perf_counter()
+        conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        conn.execute("ANALYZE")
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        timings.append(('ANALYZE', elapsed))
+        if queue is not None:
+            queue.put(("LOG", f"  - ANALYZE concluído em {elapsed:.1f}s."))
+    return timings
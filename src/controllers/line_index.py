@@ -0,0 +1,162 @@
+import io
+import mmap
+import os
+
+import numpy as np
+import pandas as pd
+
+INDEX_SUFFIX = ".idx"
+
+class LineIndex:
+    """Índice de deslocamentos de linha de um .txt, salvo em um arquivo ao lado dele.
+
+    Guarda o deslocamento em bytes do início de uma a cada STRIDE linhas de
+    dados, o total de linhas e o fim do cabeçalho. Isso dá a contagem exata
+    de linhas sem reler o arquivo e o posicionamento em qualquer linha com
+    uma consulta ao vetor e a leitura de no máximo STRIDE - 1 linhas. O
+    índice é reaproveitado enquanto o tamanho e o mtime do arquivo não mudam.
+
+    Uso:
+        index = LineIndex.load_or_build("data/2020_RAIS_VINC_PUB_SUL.txt")
+        index.row_count
+        index.read_rows(1000, 50)
+    """
+    VERSION = 1
+    STRIDE = 1024
+    SCAN_BLOCK_BYTES = 64 * 1024 * 1024
+    # Posições do cabeçalho do arquivo .idx (vetor uint64)
+    _META_FIELDS = 6
+
+    def __init__(self, path, offsets, row_count, header_end, size, mtime_ns, stride=STRIDE):
+        self.path = path
+        self.offsets = offsets
+        self.row_count = row_count
+        self.header_end = header_end
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.stride = stride
+
+    @classmethod
+    def index_path(cls, path):
+        return path + INDEX_SUFFIX
+
+    @classmethod
+    def load_or_build(cls, path):
+        """Carrega o índice salvo se ainda corresponder ao arquivo; senão o reconstrói e salva."""
+        index = cls.load(path)
+        if index is None:
+            index = cls.build(path)
+            index.save()
+        return index
+
+    @classmethod
+    def load(cls, path):
+        stat = os.stat(path)
+        try:
+            data = np.load(cls.index_path(path), allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        if len(data) < cls._META_FIELDS:
+            return None
+        version, size, mtime_ns, row_count, header_end, stride = (int(v) for v in data[:cls._META_FIELDS])
+        if version != cls.VERSION or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+            return None
+        return cls(path, data[cls._META_FIELDS:], row_count, header_end, size, mtime_ns, stride)
+
+    @classmethod
+    def build(cls, path, stride=STRIDE):
+        """Varre o arquivo mapeado em memória, bloco a bloco, contando as quebras de linha."""
+        stat = os.stat(path)
+        size = stat.st_size
+        if size == 0:
+            return cls(path, np.zeros(0, dtype=np.uint64), 0, 0, 0, stat.st_mtime_ns, stride)
+
+        offsets = []
+        # Linhas (cabeçalho incluído) cujo início já foi visto
+        lines_started = 1
+        header_end = None
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for base in range(0, size, cls.SCAN_BLOCK_BYTES):
+                block = np.frombuffer(mm, dtype=np.uint8, count=min(cls.SCAN_BLOCK_BYTES, size - base), offset=base)
+                # Cada quebra de linha inicia a linha seguinte; a linha k (k >= 1) é a linha de dados k - 1
+                starts = np.flatnonzero(block == 10).astype(np.uint64) + np.uint64(base + 1)
+                del block
+                if header_end is None and len(starts):
+                    header_end = int(starts[0])
+                rows = np.arange(lines_started, lines_started + len(starts), dtype=np.int64) - 1
+                offsets.append(starts[rows % stride == 0])
+                lines_started += len(starts)
+
+        offsets = np.concatenate(offsets) if offsets else np.zeros(0, dtype=np.uint64)
+        # Um início de linha no fim do arquivo não é uma linha
+        row_count = lines_started - 1
+        if header_end is None:
+            header_end, row_count = size, 0
+        elif row_count and _last_line_empty(path, size):
+            row_count -= 1
+            if len(offsets) and int(offsets[-1]) >= size:
+                offsets = offsets[:-1]
+        return cls(path, offsets, row_count, header_end, size, stat.st_mtime_ns, stride)
+
+    def save(self):
+        meta = np.array([self.VERSION, self.size, self.mtime_ns, self.row_count, self.header_end, self.stride], dtype=np.uint64)
+        tmp_path = self.index_path(self.path) + ".tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.concatenate([meta, self.offsets.astype(np.uint64)]))
+            os.replace(tmp_path, self.index_path(self.path))
+        except OSError:
+            # Sem permissão de escrita o índice só vale para esta sessão
+            pass
+
+    def seek_row(self, f, row):
+        """Posiciona o arquivo binário `f` no início da linha de dados `row` (0 = primeira após o cabeçalho)."""
+        row = max(0, min(row, self.row_count))
+        block = row // self.stride
+        if block >= len(self.offsets):
+            f.seek(self.size)
+            return
+        f.seek(int(self.offsets[block]))
+        for _ in range(row - block * self.stride):
+            f.readline()
+
+    def row_offset(self, row):
+        with open(self.path, 'rb') as f:
+            self.seek_row(f, row)
+            return f.tell()
+
+    def byte_range(self, first_row, end_row):
+        """Faixa de bytes (início, fim) das linhas de dados [first_row, end_row)."""
+        return self.row_offset(first_row), self.row_offset(end_row)
+
+    def byte_ranges(self, range_bytes):
+        """Divide as linhas de dados em faixas de cerca de `range_bytes`, sem ler o arquivo."""
+        bounds = [self.header_end]
+        for offset in self.offsets:
+            offset = int(offset)
+            if offset - bounds[-1] >= range_bytes:
+                bounds.append(offset)
+        if self.size > bounds[-1]:
+            bounds.append(self.size)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def header_names(self, encoding='latin-1', sep=';'):
+        return list(pd.read_csv(self.path, sep=sep, encoding=encoding, nrows=0).columns)
+
+    def read_rows(self, first_row, count, encoding='latin-1', sep=';', **read_csv_args):
+        """Lê `count` linhas a partir de `first_row` como DataFrame (texto, sem conversão por padrão)."""
+        names = self.header_names(encoding, sep)
+        count = max(0, min(count, self.row_count - first_row))
+        if count == 0:
+            return pd.DataFrame(columns=names)
+        with open(self.path, 'rb') as f:
+            self.seek_row(f, first_row)
+            data = b"".join(f.readline() for _ in range(count))
+        options = {'dtype': str, 'keep_default_na': False, **read_csv_args}
+        return pd.read_csv(io.BytesIO(data), sep=sep, encoding=encoding, header=None, names=names, **options)
+
+def _last_line_empty(path, size):
+    """Verdadeiro se o arquivo termina em quebra de linha (não há linha parcial depois dela)."""
+    with open(path, 'rb') as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
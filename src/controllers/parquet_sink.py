@@ -0,0 +1,130 @@
+import glob
+import os
+import time
+
+from src.controllers.sqlite_loader import sqlite_type_for
+
+# Nome de partição que o pyarrow lê de volta como nulo
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+class ParquetDatasetWriter:
+    """Grava DataFrames em um dataset Parquet particionado por `ano` e `uf`.
+
+    Cada partição é um diretório no estilo Hive (`ano=2021/uf=35/`) com um
+    arquivo por origem. Cada chunk vira um row group em cada partição em que
+    tem linhas, então a memória usada é a de um chunk, qualquer que seja o
+    tamanho do arquivo de origem. A UF vem dos dois primeiros dígitos do código
+    IBGE do município; colunas de partição ausentes no chunk são ignoradas.
+
+    Uso:
+        with ParquetDatasetWriter("data/parquet", "2021_RAIS_VINC_PUB_SUL", queue) as writer:
+            for chunk in chunks:
+                writer.write_chunk(chunk)
+    """
+    COMPRESSIONS = ('zstd', 'snappy', 'gzip', 'none')
+    DEFAULT_COMPRESSION = 'zstd'
+    PARTITION_COLUMNS = ('ano', 'uf')
+    UF_SOURCE_COLUMN = 'Município'
+
+    def __init__(self, root_dir, file_name, queue=None, compression=DEFAULT_COMPRESSION, column_types=None):
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"compressão não suportada: {compression}")
+        self.root_dir = root_dir
+        self.file_name = file_name if file_name.endswith('.parquet') else file_name + '.parquet'
+        self.queue = queue
+        self.compression = compression
+        # {coluna: tipo SQLite}; as demais seguem o dtype do primeiro chunk
+        self.column_types = dict(column_types or {})
+        self.rows_written = 0
+        self._schema = None
+        self._writers = {}
+        self._started = time.perf_counter()
+        self._remove_previous_files()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _remove_previous_files(self):
+        """Remove os arquivos de uma carga anterior da mesma origem, em qualquer partição."""
+        pattern = os.path.join(glob.escape(self.root_dir), '**', glob.escape(self.file_name))
+        for path in glob.glob(pattern, recursive=True):
+            os.remove(path)
+
+    def write_chunk(self, df):
+        import pyarrow as pa
+
+        df = self._with_uf(df)
+        partition_cols = [c for c in self.PARTITION_COLUMNS if c in df.columns]
+        data_cols = [c for c in df.columns if c not in partition_cols]
+        if self._schema is None:
+            self._schema = pa.schema([(c, _arrow_type(self.column_types.get(c) or sqlite_type_for(df[c].dtype))) for c in data_cols])
+        df = self._conform(df)
+
+        if partition_cols:
+            groups = df.groupby(partition_cols, dropna=False, sort=False)
+        else:
+            groups = [((), df)]
+        for key, part in groups:
+            if not isinstance(key, tuple):
+                key = (key,)
+            table = pa.Table.from_pandas(part[self._schema.names], schema=self._schema, preserve_index=False)
+            self._writer_for(tuple(zip(partition_cols, key))).write_table(table)
+        self.rows_written += len(df)
+        return len(df)
+
+    def _with_uf(self, df):
+        import pandas as pd
+
+        if 'uf' in df.columns or self.UF_SOURCE_COLUMN not in df.columns:
+            return df
+        municipio = pd.to_numeric(df[self.UF_SOURCE_COLUMN], errors='coerce')
+        return df.assign(uf=(municipio // 10000).astype('Int64'))
+
+    def _conform(self, df):
+        """Ajusta colunas cujo dtype no chunk diverge do esquema fixado no primeiro chunk."""
+        import pandas as pd
+        import pyarrow as pa
+
+        for field in self._schema:
+            column = df[field.name]
+            if pa.types.is_string(field.type):
+                if column.dtype != object:
+                    df[field.name] = column.astype(object).where(column.notna(), None).map(lambda v: v if v is None else str(v))
+            elif column.dtype == object:
+                df[field.name] = pd.to_numeric(column, errors='coerce')
+        return df
+
+    def _writer_for(self, partition):
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        writer = self._writers.get(partition)
+        if writer is None:
+            parts = [f"{name}={NULL_PARTITION if pd.isna(value) else value}" for name, value in partition]
+            directory = os.path.join(self.root_dir, *parts)
+            os.makedirs(directory, exist_ok=True)
+            writer = pq.ParquetWriter(os.path.join(directory, self.file_name), self._schema, compression=self.compression)
+            self._writers[partition] = writer
+        return writer
+
+    def close(self):
+        for writer in self._writers.values():
+            writer.close()
+        if self._writers and self.queue is not None:
+            elapsed = time.perf_counter() - self._started
+            rate = self.rows_written / elapsed if elapsed > 0 else 0.0
+            self.queue.put(("LOG", f"  - {self.rows_written} linhas gravadas em Parquet ({len(self._writers)} partições, {rate:,.0f} linhas/s)."))
+        self._writers = {}
+
+def _arrow_type(sql_type):
+    import pyarrow as pa
+
+    if sql_type == 'INTEGER':
+        return pa.int64()
+    if sql_type == 'REAL':
+        return pa.float64()
+    return pa.string()
@@ -0,0 +1,199 @@
+import re
+from collections import namedtuple
+
+INTEGER = 'INTEGER'
+REAL = 'REAL'
+TEXT = 'TEXT'
+
+# Marcadores de valor ausente usados nos arquivos da RAIS ("{ñ" é o
+# "{ñ class}" truncado pela largura do campo)
+NULL_TOKENS = ['', 'n/d', '{ñ class}', '{ñ cl', '{ñ']
+
+# `sentinels`: códigos que significam "ignorado"/"não se aplica" e viram NULL.
+# `width`: largura fixa de um código TEXT numérico, cujos zeros à esquerda
+# fazem parte do código.
+ColumnSpec = namedtuple('ColumnSpec', 'type sentinels width')
+
+def _col(sql_type, *sentinels, width=None):
+    return ColumnSpec(sql_type, frozenset(sentinels), width)
+
+# Códigos de "não se aplica" (9997) e "ignorado" (9999) dos campos geográficos
+_GEO_CODE = _col(INTEGER, 9997, 9999)
+
+VINCULOS_LAYOUT = {
+    'Bairros SP': _GEO_CODE,
+    'Bairros Fortaleza': _GEO_CODE,
+    'Bairros RJ': _GEO_CODE,
+    'Causa Afastamento 1': _col(INTEGER, 99),
+    'Causa Afastamento 2': _col(INTEGER, 99),
+    'Causa Afastamento 3': _col(INTEGER, 99),
+    'Motivo Desligamento': _col(INTEGER),
+    # Códigos de classificação: zeros à esquerda fazem parte do código
+    'CBO Ocupação 2002': _col(TEXT, width=6),
+    'CNAE 2.0 Classe': _col(TEXT, width=5),
+    'CNAE 95 Classe': _col(TEXT, width=5),
+    'Distritos SP': _GEO_CODE,
+    'Vínculo Ativo 31/12': _col(INTEGER),
+    'Faixa Etária': _col(INTEGER),
+    'Faixa Hora Contrat': _col(INTEGER, 99),
+    'Faixa Remun Dezem (SM)': _col(INTEGER, 99),
+    'Faixa Remun Média (SM)': _col(INTEGER, 99),
+    'Faixa Tempo Emprego': _col(INTEGER, 99),
+    'Escolaridade após 2005': _col(INTEGER),
+    'Qtd Hora Contr': _col(INTEGER),
+    'Idade': _col(INTEGER),
+    'Ind CEI Vinculado': _col(INTEGER),
+    'Ind Simples': _col(INTEGER),
+    'Mês Admissão': _col(INTEGER),
+    'Mês Desligamento': _col(INTEGER),
+    'Mun Trab': _col(INTEGER, 999999),
+    'Município': _col(INTEGER, 999999),
+    'Nacionalidade': _col(INTEGER),
+    'Natureza Jurídica': _col(INTEGER, 9999),
+    'Ind Portador Defic': _col(INTEGER),
+    'Qtd Dias Afastamento': _col(INTEGER),
+    'Raça Cor': _col(INTEGER, 99),
+    'Regiões Adm DF': _GEO_CODE,
+    'Vl Remun Dezembro Nom': _col(REAL),
+    'Vl Remun Dezembro (SM)': _col(REAL),
+    'Vl Remun Média Nom': _col(REAL),
+    'Vl Remun Média (SM)': _col(REAL),
+    'CNAE 2.0 Subclasse': _col(TEXT, width=7),
+    'Sexo Trabalhador': _col(INTEGER),
+    'Tamanho Estabelecimento': _col(INTEGER),
+    'Tempo Emprego': _col(REAL),
+    'Tipo Admissão': _col(INTEGER),
+    'Tipo Estab': _col(INTEGER),
+    # O cabeçalho "Tipo Estab" aparece duas vezes; o pandas renomeia a segunda
+    'Tipo Estab.1': _col(TEXT),
+    'Tipo Defic': _col(INTEGER),
+    'Tipo Vínculo': _col(INTEGER),
+    'IBGE Subsetor': _col(INTEGER),
+    'Vl Rem Janeiro SC': _col(REAL),
+    'Vl Rem Fevereiro SC': _col(REAL),
+    'Vl Rem Março SC': _col(REAL),
+    'Vl Rem Abril SC': _col(REAL),
+    'Vl Rem Maio SC': _col(REAL),
+    'Vl Rem Junho SC': _col(REAL),
+    'Vl Rem Julho SC': _col(REAL),
+    'Vl Rem Agosto SC': _col(REAL),
+    'Vl Rem Setembro SC': _col(REAL),
+    'Vl Rem Outubro SC': _col(REAL),
+    'Vl Rem Novembro SC': _col(REAL),
+    'Ano Chegada Brasil': _col(INTEGER),
+    'Ind Trab Intermitente': _col(INTEGER),
+    'Ind Trab Parcial': _col(INTEGER),
+}
+
+ESTABELECIMENTOS_LAYOUT = {
+    'Bairros SP': _GEO_CODE,
+    'Bairros Fortaleza': _GEO_CODE,
+    'Bairros RJ': _GEO_CODE,
+    'CNAE 2.0 Classe': _col(TEXT, width=5),
+    'CNAE 95 Classe': _col(TEXT, width=5),
+    'Distritos SP': _GEO_CODE,
+    'Qtd Vínculos CLT': _col(INTEGER),
+    'Qtd Vínculos Ativos': _col(INTEGER),
+    'Qtd Vínculos Estatutários': _col(INTEGER),
+    'Ind Atividade Ano': _col(INTEGER),
+    'Ind CEI Vinculado': _col(INTEGER),
+    'Ind Estab Participa PAT': _col(INTEGER),
+    'Ind Rais Negativa': _col(INTEGER),
+    'Ind Simples': _col(INTEGER),
+    'Município': _col(INTEGER, 999999),
+    'Natureza Jurídica': _col(INTEGER, 9999),
+    'Regiões Adm DF': _GEO_CODE,
+    'CNAE 2.0 Subclasse': _col(TEXT, width=7),
+    'Tamanho Estabelecimento': _col(INTEGER),
+    'Tipo Estab': _col(INTEGER),
+    'Tipo Estab.1': _col(TEXT),
+    'UF': _col(INTEGER),
+    'IBGE Subsetor': _col(INTEGER),
+    'CEP Estab': _col(TEXT, width=8),
+}
+
+LAYOUTS = {'vinculos': VINCULOS_LAYOUT, 'estabelecimentos': ESTABELECIMENTOS_LAYOUT}
+
+# Os dois layouts concordam nas colunas em comum, então um arquivo pode ser
+# convertido sem saber de antemão qual é o seu layout
+RAIS_COLUMNS = {**ESTABELECIMENTOS_LAYOUT, **VINCULOS_LAYOUT}
+
+def normalize_column_name(name):
+    """Nome da coluna no banco: espaços viram '_' e demais símbolos são removidos."""
+    return re.sub(r'[^\w]', '', name.strip().replace(' ', '_'))
+
+def detect_layout(columns):
+    """Retorna o layout que reconhece mais colunas do cabeçalho (ou {} se nenhum)."""
+    columns = [c.strip() for c in columns]
+    best = max(LAYOUTS.values(), key=lambda layout: sum(c in layout for c in columns))
+    return best if any(c in best for c in columns) else {}
+
+def read_csv_options():
+    """Opções do `pd.read_csv` que deixam o parser em C fazer a maior parte da conversão.
+
+    Os espaços de preenchimento à esquerda são descartados, a vírgula decimal
+    é reconhecida e os marcadores de valor ausente viram NaN. Nenhum dtype é
+    forçado: códigos TEXT numéricos são lidos como números (bem mais rápido
+    que criar uma string por linha) e voltam a ser texto, com os zeros à
+    esquerda, em `coerce_chunk`.
+    """
+    return {
+        'decimal': ',',
+        'skipinitialspace': True,
+        'keep_default_na': False,
+        'na_values': NULL_TOKENS,
+    }
+
+def coerce_chunk(chunk, layout=RAIS_COLUMNS):
+    """Converte as colunas de `chunk` (in-place) para os tipos do layout.
+
+    Trata o que o parser não resolve sozinho: espaços à direita nos textos,
+    códigos sentinela que significam "ignorado"/"não se aplica" e colunas
+    numéricas que chegaram como texto por conterem algum valor inesperado
+    (esses valores viram NULL). Colunas INTEGER com nulos ficam como float
+    com NaN; a afinidade INTEGER da coluna no SQLite grava inteiros.
+    """
+    import pandas as pd
+
+    for name in chunk.columns:
+        spec = layout.get(name)
+        if spec is None:
+            continue
+        column = chunk[name]
+        if spec.type == TEXT:
+            chunk[name] = _text_codes(column, spec.width)
+            continue
+
+        if column.dtype == object:
+            column = pd.to_numeric(column.str.strip().str.replace(',', '.', regex=False), errors='coerce')
+        if spec.sentinels:
+            column = column.mask(column.isin(spec.sentinels))
+        chunk[name] = column
+    return chunk
+
+def _text_codes(column, width):
+    """Códigos como texto, sem espaços e com os zeros à esquerda de `width`.
+
+    Os códigos se repetem muito, então a conversão é feita só nos valores
+    distintos e o resultado é remontado pelos índices do factorize.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(column)
+    if column.dtype == object:
+        text = [u.strip() if isinstance(u, str) else u for u in uniques]
+    else:
+        text = [str(int(u)) if float(u).is_integer() else str(u) for u in uniques]
+    if width:
+        text = [t.zfill(width) if isinstance(t, str) and t.isdigit() else t for t in text]
+    text = np.array(text, dtype=object)
+    text[np.isin(text, NULL_TOKENS)] = None
+    values = np.full(len(column), None, dtype=object)
+    valid = codes >= 0
+    values[valid] = text[codes[valid]]
+    return pd.Series(values, index=column.index, name=column.name)
+
+def column_types(columns, layout=RAIS_COLUMNS):
+    """{nome normalizado: tipo SQLite} para as colunas do layout presentes em `columns`."""
+    return {normalize_column_name(c): layout[c].type for c in columns if c in layout}
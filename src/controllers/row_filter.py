@@ -0,0 +1,147 @@
+import re
+
+from src.controllers.rais_schema import RAIS_COLUMNS, INTEGER, REAL, coerce_chunk
+
+_IN_RE = re.compile(r'^(?P<column>.+?)\s+in\s*\((?P<values>.*)\)$', re.IGNORECASE)
+_RANGE_RE = re.compile(r'^(?P<column>.+?)\s+entre\s+(?P<low>.+?)\s+e\s+(?P<high>.+)$', re.IGNORECASE)
+_COMPARE_RE = re.compile(r'^(?P<column>.+?)\s*(?P<op>>=|<=|!=|=|>|<)\s*(?P<value>.+)$')
+
+class RowFilter:
+    """Filtro de linhas aplicado a cada chunk, antes da conversão completa e da gravação.
+
+    A expressão é uma lista de condições separadas por ';', todas obrigatórias:
+
+        Município in (355030, 330455); Vínculo Ativo 31/12 = 1; Idade entre 18 e 65
+
+    Operadores: =, !=, >, >=, <, <=, `in (...)` e `entre A e B` (intervalo
+    fechado). Os nomes de coluna são os do cabeçalho do arquivo. Os valores
+    seguem o tipo da coluna no layout da RAIS: números aceitam vírgula decimal
+    e códigos TEXT (CBO, CNAE, CEP) recebem os zeros à esquerda. Linhas com a
+    coluna nula não satisfazem nenhuma condição.
+
+    Uso:
+        row_filter = RowFilter.parse("Município = 355030; Idade entre 18 e 29")
+        chunk = row_filter.apply(chunk)
+        row_filter.rows_scanned, row_filter.rows_kept
+    """
+
+    def __init__(self, conditions, text=""):
+        # [(coluna, operador, [valores])]
+        self.conditions = conditions
+        self.text = text
+        self.rows_scanned = 0
+        self.rows_kept = 0
+
+    @classmethod
+    def parse(cls, text, layout=RAIS_COLUMNS):
+        """Interpreta a expressão; ValueError indica a condição inválida. Texto vazio dá None."""
+        conditions = []
+        for part in text.replace('\n', ';').split(';'):
+            part = part.strip()
+            if not part:
+                continue
+            match = _IN_RE.match(part)
+            if match:
+                column, op = match['column'].strip(), 'in'
+                raw_values = [v for v in (v.strip() for v in match['values'].split(',')) if v]
+            elif _RANGE_RE.match(part):
+                match = _RANGE_RE.match(part)
+                column, op = match['column'].strip(), 'entre'
+                raw_values = [match['low'].strip(), match['high'].strip()]
+            elif _COMPARE_RE.match(part):
+                match = _COMPARE_RE.match(part)
+                column, op = match['column'].strip(), match['op']
+                raw_values = [match['value'].strip()]
+            else:
+                raise ValueError(f"condição inválida: '{part}'")
+            if not raw_values:
+                raise ValueError(f"lista de valores vazia: '{part}'")
+            spec = layout.get(column)
+            conditions.append((column, op, [_convert(_unquote(v), column, spec) for v in raw_values]))
+        return cls(conditions, text.strip()) if conditions else None
+
+    @property
+    def columns(self):
+        """Colunas usadas pelo filtro, sem repetição."""
+        return list(dict.fromkeys(column for column, _, _ in self.conditions))
+
+    def mask(self, typed):
+        """Vetor booleano das linhas de `typed` (colunas já convertidas) que passam no filtro."""
+        import numpy as np
+
+        keep = np.ones(len(typed), dtype=bool)
+        for column, op, values in self.conditions:
+            series = typed[column]
+            if series.dtype.kind in 'iuf':
+                values = [_number(v, column) if isinstance(v, str) else v for v in values]
+            else:
+                values = [v if isinstance(v, str) else _format_number(v) for v in values]
+            if op == 'in':
+                result = series.isin(values)
+            elif op == 'entre':
+                result = series.between(values[0], values[1])
+            elif op == '=':
+                result = series.eq(values[0])
+            elif op == '!=':
+                result = series.ne(values[0]) & series.notna()
+            elif op == '>':
+                result = series.gt(values[0])
+            elif op == '>=':
+                result = series.ge(values[0])
+            elif op == '<':
+                result = series.lt(values[0])
+            else:
+                result = series.le(values[0])
+            keep &= result.to_numpy(dtype=bool, na_value=False)
+        return keep
+
+    def apply(self, chunk, drop_columns=()):
+        """Retorna as linhas de `chunk` que passam no filtro, sem as colunas `drop_columns`.
+
+        Só as colunas do filtro são convertidas aqui; as demais continuam como
+        o parser as entregou.
+        """
+        missing = [c for c in self.columns if c not in chunk.columns]
+        if missing:
+            raise ValueError(f"coluna do filtro não encontrada no arquivo: {', '.join(missing)}")
+        typed = coerce_chunk(chunk[self.columns].copy())
+        kept = chunk.take(self.mask(typed).nonzero()[0])
+        if drop_columns:
+            kept = kept.drop(columns=list(drop_columns))
+        return kept
+
+    def record(self, scanned, kept):
+        self.rows_scanned += scanned
+        self.rows_kept += kept
+
+    def summary(self):
+        share = self.rows_kept / self.rows_scanned if self.rows_scanned else 0.0
+        return f"Filtro de linhas: {self.rows_scanned} linhas lidas, {self.rows_kept} mantidas ({share:.2%})."
+
+    def reset_counts(self):
+        self.rows_scanned = 0
+        self.rows_kept = 0
+
+def _unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+def _convert(value, column, spec):
+    """Converte o valor da expressão para o tipo da coluna no layout (texto se desconhecida)."""
+    if spec is None:
+        return value
+    if spec.type in (INTEGER, REAL):
+        return _number(value, column)
+    if spec.width and value.isdigit():
+        return value.zfill(spec.width)
+    return value
+
+def _number(value, column):
+    try:
+        return float(value.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"valor numérico inválido para '{column}': {value}") from None
+
+def _format_number(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
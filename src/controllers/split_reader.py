@@ -0,0 +1,92 @@
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.controllers.line_index import LineIndex
+
+# Tamanho aproximado de cada faixa de bytes lida por um processo (~130 mil
+# linhas de vínculos da RAIS)
+SPLIT_RANGE_BYTES = 64 * 1024 * 1024
+
+def read_header(path, encoding='latin-1', sep=';'):
+    """Retorna (nomes das colunas como o pandas os entrega, posição do fim do cabeçalho)."""
+    names = list(pd.read_csv(path, sep=sep, encoding=encoding, nrows=0).columns)
+    with open(path, 'rb') as f:
+        f.readline()
+        return names, f.tell()
+
+def byte_ranges(path, start, range_bytes=SPLIT_RANGE_BYTES):
+    """Divide o arquivo a partir de `start` em faixas (início, fim) terminadas em quebra de linha.
+
+    Os arquivos da RAIS não têm campos com quebra de linha entre aspas, então
+    cada faixa contém apenas linhas completas.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(min(start + range_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _watch_parent(parent_pid):
+    """Encerra o processo do pool se o processo que o criou deixar de existir.
+
+    Sem isso, os processos ficariam órfãos quando a importação é cancelada
+    com terminate().
+    """
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(1)
+    threading.Thread(target=watch, daemon=True).start()
+
+def _parse_range(path, start, end, names, read_csv_args, transform, transform_args):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    chunk = pd.read_csv(io.BytesIO(data), header=None, names=names, **read_csv_args)
+    if transform is not None:
+        chunk = transform(chunk, *transform_args)
+    return chunk
+
+def iter_split_chunks(path, read_csv_args, workers, transform=None, transform_args=(), range_bytes=SPLIT_RANGE_BYTES):
+    """Lê `path` em paralelo, uma faixa de bytes por tarefa, e entrega os chunks em ordem.
+
+    O cabeçalho é lido uma única vez; cada processo recebe os nomes das
+    colunas, os mesmos argumentos do `pd.read_csv` (inclusive `usecols`) e
+    aplica `transform(chunk, *transform_args)` antes de devolver o chunk.
+    No máximo 2 * `workers` faixas ficam em andamento, o que limita a memória
+    quando quem consome os chunks é mais lento que a leitura.
+    """
+    read_csv_args = dict(read_csv_args)
+    encoding = read_csv_args.get('encoding', 'latin-1')
+    names, header_end = read_header(path, encoding, read_csv_args.get('sep', ';'))
+    usecols = read_csv_args.get('usecols')
+    if callable(usecols):
+        # Funções locais não podem ser enviadas aos processos do pool
+        read_csv_args['usecols'] = [n for n in names if usecols(n)]
+
+    # Um índice de linhas atualizado dá as faixas sem sondar o arquivo
+    index = LineIndex.load(path)
+    ranges = deque(index.byte_ranges(range_bytes) if index else byte_ranges(path, header_end, range_bytes))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_watch_parent, initargs=(os.getpid(),)) as executor:
+        pending = deque()
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < 2 * workers:
+                    start, end = ranges.popleft()
+                    pending.append(executor.submit(_parse_range, path, start, end, names, read_csv_args,
+                                                   transform, transform_args))
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
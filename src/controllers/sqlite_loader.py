@@ -0,0 +1,170 @@
+import time
+from contextlib import contextmanager
+
+class SQLiteBulkLoader:
+    """Carga em massa de DataFrames em uma tabela SQLite.
+
+    A tabela é criada uma única vez com esquema explícito e as linhas são
+    inseridas com `executemany` preparado, em uma transação por chunk ou, dentro
+    de `single_transaction`, na transação de quem chamou. Durante a carga são
+    aplicados PRAGMAs que trocam durabilidade por velocidade; os valores
+    anteriores são restaurados ao final. Os PRAGMAs não podem mudar dentro de
+    uma transação, então o loader entra antes dela.
+
+    Uso:
+        with SQLiteBulkLoader(conn, "vinculos", queue) as loader, single_transaction(conn):
+            loader.create_table(columns, replace=True)
+            for chunk in chunks:
+                loader.write_chunk(chunk)
+    """
+    # O journal continua em disco: uma carga inteira pode ser uma só transação
+    # e, se o processo for encerrado no meio dela (cancelamento), o SQLite a
+    # desfaz ao abrir o banco de novo. Com o journal em memória o banco ficaria
+    # corrompido.
+    LOAD_PRAGMAS = {
+        'synchronous': 'OFF',
+        'cache_size': -262144,  # KiB (256 MB)
+        'temp_store': 'MEMORY',
+    }
+    # Só tem efeito em um banco ainda vazio
+    PAGE_SIZE = 65536
+    BATCH_ROWS = 50000
+
+    def __init__(self, conn, table, queue=None, column_types=None):
+        self.conn = conn
+        self.table = table
+        self.queue = queue
+        # {coluna: tipo SQLite}; colunas ausentes são TEXT
+        self.column_types = column_types or {}
+        self.columns = None
+        self.rows_written = 0
+        self._saved_pragmas = {}
+        self._started = None
+        self._insert_sql = None
+
+    def __enter__(self):
+        self.apply_load_pragmas()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def apply_load_pragmas(self):
+        if self.conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+            self.conn.execute(f"PRAGMA page_size = {self.PAGE_SIZE}")
+        for name, value in self.LOAD_PRAGMAS.items():
+            self._saved_pragmas[name] = self.conn.execute(f"PRAGMA {name}").fetchone()[0]
+            self.conn.execute(f"PRAGMA {name} = {value}")
+        self._started = time.perf_counter()
+
+    def restore_pragmas(self):
+        for name, value in self._saved_pragmas.items():
+            self.conn.execute(f"PRAGMA {name} = {value}")
+        self._saved_pragmas = {}
+
+    def create_table(self, columns, replace=False, sample=None):
+        """Cria a tabela (substituindo-a com `replace`) e prepara o INSERT.
+
+        Colunas sem tipo em `column_types` recebem o tipo correspondente ao
+        dtype em `sample` (um DataFrame), ou TEXT. Se a tabela já existir,
+        colunas ainda inexistentes são adicionadas.
+        """
+        self.columns = list(columns)
+        if sample is not None:
+            for c in self.columns:
+                if c not in self.column_types and c in sample:
+                    self.column_types[c] = sqlite_type_for(sample[c].dtype)
+        table = _quote(self.table)
+        with transaction(self.conn):
+            if replace:
+                self.conn.execute(f"DROP TABLE IF EXISTS {table}")
+            existing = [row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")]
+            if not existing:
+                definitions = ", ".join(f"{_quote(c)} {self.column_types.get(c, 'TEXT')}" for c in self.columns)
+                self.conn.execute(f"CREATE TABLE {table} ({definitions})")
+            else:
+                for c in self.columns:
+                    if c not in existing:
+                        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {_quote(c)} {self.column_types.get(c, 'TEXT')}")
+        placeholders = ", ".join("?" for _ in self.columns)
+        self._insert_sql = f"INSERT INTO {table} ({', '.join(_quote(c) for c in self.columns)}) VALUES ({placeholders})"
+
+    def write_chunk(self, df):
+        """Insere o DataFrame em lotes de BATCH_ROWS dentro de uma única transação.
+
+        As tuplas são geradas lote a lote, então só um lote de objetos Python
+        existe na memória a cada vez.
+        """
+        if self._insert_sql is None:
+            self.create_table(df.columns, sample=df)
+        df = df[self.columns]
+        with transaction(self.conn):
+            for start in range(0, len(df), self.BATCH_ROWS):
+                self.conn.executemany(self._insert_sql, _to_rows(df.iloc[start:start + self.BATCH_ROWS]))
+        self.rows_written += len(df)
+        return len(df)
+
+    @property
+    def rows_per_second(self):
+        if not self._started:
+            return 0.0
+        elapsed = time.perf_counter() - self._started
+        return self.rows_written / elapsed if elapsed > 0 else 0.0
+
+    def close(self):
+        if self._saved_pragmas:
+            self.restore_pragmas()
+            if self.queue is not None:
+                self.queue.put(("LOG", f"  - {self.rows_written} linhas gravadas em '{self.table}' ({self.rows_per_second:,.0f} linhas/s)."))
+
+@contextmanager
+def single_transaction(conn):
+    """Reúne tudo o que for gravado no bloco em uma única transação, desfeita se o bloco falhar.
+
+    Dentro dela, `transaction` não confirma nada: o que o loader, os
+    agregados, as dimensões e o manifesto gravam só vale junto, no fim do bloco.
+    """
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+@contextmanager
+def transaction(conn):
+    """Como `with conn`, mas dentro de uma transação já aberta (ver single_transaction) apenas participa dela."""
+    if conn.in_transaction:
+        yield conn
+        return
+    with conn:
+        yield conn
+
+def sqlite_type_for(dtype):
+    """Tipo SQLite correspondente a um dtype do pandas."""
+    if dtype.kind in 'iub':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+def _to_rows(df):
+    """Converte o DataFrame em tuplas de tipos nativos do Python.
+
+    NaN é gravado pelo SQLite como NULL, então só o NA dos tipos anuláveis
+    do pandas precisa ser trocado por None.
+    """
+    import numpy as np
+
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if column.hasnans and not isinstance(column.dtype, np.dtype):
+            column = column.astype(object).where(column.notna(), None)
+        columns.append(column.tolist())
+    return list(zip(*columns))
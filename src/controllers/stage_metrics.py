@@ -0,0 +1,206 @@
+"""Métricas de cada etapa do pipeline: bytes, linhas, tempo, CPU e pico de memória.
+
+Cada etapa de cada arquivo é medida por um StageMeter no processo que a
+executa, que ao final publica na fila de mensagens:
+
+    ("METRIC", {'stage': 'download', 'file': '2021_RAIS_VINC_PUB_SUL.7z', 'bytes': 52428800, 'rows': None,
+                'elapsed': 12.5, 'cpu_time': 3.1, 'peak_rss': 81264640, 'ok': True})
+
+`cpu_time` inclui os processos filhos (ex.: os de leitura por faixas de
+bytes) e `peak_rss` é o maior RSS somado do processo e dos filhos durante a
+etapa. Quem consome a fila grava os eventos de cada execução com MetricsLog
+e os resume por etapa com StageTotals.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psutil
+
+METRIC = "METRIC"
+# Ordem de exibição; os rótulos são os da interface
+STAGES = ("download", "decompress", "parse", "write", "indexes", "export")
+STAGE_LABELS = {
+    'download': "Download",
+    'decompress': "Descompressão",
+    'parse': "Leitura",
+    'write': "Gravação",
+    'indexes': "Índices",
+    'export': "Exportação",
+}
+RSS_SAMPLE_INTERVAL = 0.2  # segundos
+METRICS_DIR = os.path.join("data", "metricas")
+
+def _process_tree(process):
+    try:
+        return [process] + process.children(recursive=True)
+    except psutil.Error:
+        return [process]
+
+def _cpu_seconds(process):
+    """CPU (usuário + sistema) do processo, dos filhos vivos e dos já encerrados."""
+    total = 0.0
+    for p in _process_tree(process):
+        try:
+            times = p.cpu_times()
+        except psutil.Error:
+            continue
+        total += times.user + times.system
+        if p is process:
+            # Só existem no Linux; no Windows os filhos encerrados não são contados
+            total += getattr(times, 'children_user', 0.0) + getattr(times, 'children_system', 0.0)
+    return total
+
+def _tree_rss(process):
+    total = 0
+    for p in _process_tree(process):
+        try:
+            total += p.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+class StageMeter:
+    """Mede uma etapa de um arquivo e publica um evento METRIC ao final.
+
+    Uso:
+        with StageMeter(queue, "decompress", file_name) as meter:
+            ...
+            meter.bytes += extracted_size
+
+    Com `sections=True`, o tempo e a CPU contam só dentro de `section()` (ou
+    de cada passo de `iterate()`), o que separa etapas intercaladas em um
+    mesmo laço, como a leitura e a gravação dos chunks. O pico de memória
+    vale para toda a duração da medição.
+    """
+
+    def __init__(self, queue, stage, file_name, sections=False):
+        self.queue = queue
+        self.stage = stage
+        self.file_name = file_name
+        self.sections = sections
+        self.bytes = None
+        self.rows = None
+        self.ok = True
+        self.elapsed = 0.0
+        self.cpu_time = 0.0
+        self.peak_rss = 0
+        self._process = psutil.Process()
+        self._started = None
+        self._cpu_started = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.ok = False
+        self.finish()
+        return False
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._cpu_started = _cpu_seconds(self._process)
+        self.peak_rss = _tree_rss(self._process)
+        self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+        self._sampler.start()
+        return self
+
+    def add(self, nbytes=0, rows=0):
+        if nbytes:
+            self.bytes = (self.bytes or 0) + nbytes
+        if rows:
+            self.rows = (self.rows or 0) + rows
+
+    @contextmanager
+    def section(self):
+        started, cpu_started = time.perf_counter(), _cpu_seconds(self._process)
+        try:
+            yield self
+        finally:
+            self.elapsed += time.perf_counter() - started
+            self.cpu_time += _cpu_seconds(self._process) - cpu_started
+
+    def iterate(self, items):
+        """Repassa os itens de `items`, medindo a produção de cada um e somando len() em `rows`."""
+        iterator = iter(items)
+        while True:
+            with self.section():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            self.add(rows=len(item))
+            yield item
+
+    def finish(self):
+        """Encerra a medição e publica o evento (uma única vez)."""
+        if self._sampler is None:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self._sampler = None
+        self.peak_rss = max(self.peak_rss, _tree_rss(self._process))
+        if not self.sections:
+            self.elapsed = time.perf_counter() - self._started
+            self.cpu_time = _cpu_seconds(self._process) - self._cpu_started
+        self.queue.put((METRIC, self.as_dict()))
+
+    def as_dict(self):
+        return {'stage': self.stage, 'file': self.file_name, 'bytes': self.bytes, 'rows': self.rows,
+                'elapsed': round(self.elapsed, 3), 'cpu_time': round(self.cpu_time, 3), 'peak_rss': self.peak_rss,
+                'ok': self.ok}
+
+    def _sample_rss(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak_rss = max(self.peak_rss, _tree_rss(self._process))
+
+class StageTotals:
+    """Soma dos eventos METRIC por etapa (o pico de memória é o maior entre os arquivos)."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, metric):
+        totals = self.stages.setdefault(metric['stage'], {'files': 0, 'failures': 0, 'bytes': 0, 'rows': 0,
+                                                          'elapsed': 0.0, 'cpu_time': 0.0, 'peak_rss': 0})
+        totals['files'] += 1
+        totals['failures'] += not metric['ok']
+        totals['bytes'] += metric['bytes'] or 0
+        totals['rows'] += metric['rows'] or 0
+        totals['elapsed'] = round(totals['elapsed'] + metric['elapsed'], 3)
+        totals['cpu_time'] = round(totals['cpu_time'] + metric['cpu_time'], 3)
+        totals['peak_rss'] = max(totals['peak_rss'], metric['peak_rss'])
+        return totals
+
+    def ordered(self):
+        """[(etapa, totais)] na ordem de STAGES, seguida das etapas desconhecidas."""
+        known = [(stage, self.stages[stage]) for stage in STAGES if stage in self.stages]
+        return known + [(stage, totals) for stage, totals in self.stages.items() if stage not in STAGES]
+
+class MetricsLog:
+    """Grava os eventos METRIC de uma execução em um arquivo JSON Lines.
+
+    O arquivo (por padrão `data/metricas/<data>_<pid>.jsonl`) só é criado no
+    primeiro evento, então execuções sem métricas não deixam arquivos vazios.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(METRICS_DIR, f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}.jsonl")
+        self._file = None
+
+    def write(self, metric):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({'ts': round(time.time(), 3), **metric}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
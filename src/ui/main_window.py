@@ -1,16 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
+import importlib
 import multiprocessing
 from queue import Empty
 import threading
 import time
 import os
-import pandas as pd
 import re
-from PIL import Image, ImageTk
 
 from src.controllers.ftp_service import FTPService
 from src.controllers.download_manager import DownloadManager
+from src.controllers.parquet_sink import ParquetDatasetWriter
+from src.controllers.row_filter import RowFilter
+from src.controllers.stage_metrics import METRIC, STAGE_LABELS, MetricsLog, StageTotals
 
 class ScrollableFrame(ttk.Frame):
     """Um frame com uma barra de rolagem vertical."""
@@ -36,6 +38,13 @@ class ScrollableFrame(ttk.Frame):
 
 class MainApplicationWindow:
     """A classe principal da UI, focada em widgets e eventos."""
+    QUEUE_DRAIN_BUDGET = 0.05  # segundos de processamento da fila por ciclo
+    PREVIEW_PAGE_ROWS = 50
+    # Importados em segundo plano depois que a janela aparece, para que a
+    # primeira seleção de arquivo não congele a interface
+    PRELOAD_MODULES = ("pandas", "src.controllers.line_index", "src.controllers.column_profile")
+    PRELOAD_DELAY_MS = 500
+
     def __init__(self, root, queue, fetched_data=None):
         self.root = root
         self.queue = queue
@@ -46,14 +55,23 @@ class MainApplicationWindow:
         self.file_vars = {}
         self._years_last_width = 0
 
-        self.current_file_total_size = 0
-        self.current_file_bytes_downloaded = 0
-        self.current_file_start_time = 0
+        # Progresso por arquivo: {arquivo: {'total_size': int, 'bytes_downloaded': int}}
+        self.active_files = {}
+        self.session_bytes_downloaded = 0
         self.last_update_time = 0
         self.last_update_bytes = 0
+        self.current_speed_bps = 0
 
         self.selected_processing_file = None
         self.column_vars = {}
+        # Rótulos com o perfil de cada coluna, ao lado das caixas de seleção
+        self.column_profile_labels = {}
+        # Índice de linhas do arquivo em pré-visualização e primeira linha da página
+        self.preview_index = None
+        self.preview_start = 0
+        # Métricas por etapa da execução atual (download, importação ou exportação)
+        self.metrics_log = None
+        self.stage_totals = StageTotals()
 
         self.ftp_service = FTPService(self.queue)
         self.download_manager = DownloadManager(self.queue)
@@ -64,6 +82,17 @@ class MainApplicationWindow:
             self.populate_initial_data(fetched_data)
         
         self.process_queue()
+        self.root.after(self.PRELOAD_DELAY_MS, self._preload_modules)
+
+    def _preload_modules(self):
+        def preload():
+            for name in self.PRELOAD_MODULES:
+                try:
+                    importlib.import_module(name)
+                except ImportError as e:
+                    self.queue.put(("LOG", f"[AVISO] Não foi possível pré-carregar {name}: {e}"))
+
+        threading.Thread(target=preload, daemon=True).start()
 
     def populate_initial_data(self, data):
         # self.loading_label.pack_forget() # This label is not used anymore
@@ -74,6 +103,23 @@ class MainApplicationWindow:
         self._redraw_year_checkboxes()
         self.log("Dados do servidor carregados. Por favor, faça suas seleções.")
 
+    def update_available_data(self, data, new_files):
+        """Aplica um catálogo atualizado em segundo plano, preservando as seleções do usuário."""
+        selected_years = {year for year, var in self.year_vars.items() if var.get()}
+        previous_files = set(self.file_vars)
+        selected_files = {fname for fname, var in self.file_vars.items() if var.get()}
+        self.available_data = data
+        self.year_vars = {year: tk.BooleanVar(value=year in selected_years) for year in sorted(self.available_data.keys(), reverse=True)}
+        self._update_file_list()
+        for fname, var in self.file_vars.items():
+            var.set(fname in selected_files or fname not in previous_files)
+        self._redraw_year_checkboxes()
+        if str(self.start_button['state']) == 'disabled':
+            self._toggle_selection_widgets('disabled')
+        self.log(f"Catálogo do FTP atualizado: {len(new_files)} arquivo(s) novo(s) ou alterado(s).")
+        for dir_name, file_name in new_files:
+            self.log(f"  - {dir_name}/{file_name}")
+
     def _center_window(self, width, height):
         screen_width = self.root.winfo_screenwidth()
         screen_height = self.root.winfo_screenheight()
@@ -103,10 +149,67 @@ class MainApplicationWindow:
         self._create_download_tab_widgets(self.download_tab)
         self._create_processing_tab_widgets(self.processing_tab)
         self._create_support_tab_widgets(self.support_tab)
+        self._create_metrics_panel(self.main_frame)
 
         # self.loading_label = ttk.Label(self.main_frame, text="Buscando dados no servidor FTP, por favor aguarde...")
         # self.loading_label.pack(pady=20)
 
+    def _create_metrics_panel(self, parent_frame):
+        """Painel com os totais de cada etapa da execução atual, visível em todas as abas."""
+        metrics_frame = ttk.LabelFrame(parent_frame, text="Métricas por Etapa")
+        metrics_frame.pack(fill=tk.X, pady=(5, 0))
+        metrics_frame.columnconfigure(0, weight=1)
+
+        columns = {"stage": "Etapa", "files": "Arquivos", "bytes": "Dados", "rows": "Linhas", "elapsed": "Tempo",
+                   "cpu": "CPU", "rate": "Vazão", "rss": "Pico de Memória"}
+        self.metrics_tree = ttk.Treeview(metrics_frame, columns=list(columns), show="headings", height=4)
+        for column, heading in columns.items():
+            self.metrics_tree.heading(column, text=heading)
+            self.metrics_tree.column(column, width=110, anchor="w" if column == "stage" else "e")
+        self.metrics_tree.grid(row=0, column=0, sticky="ew", padx=5, pady=(5, 2))
+
+        self.metrics_file_label = ttk.Label(metrics_frame, text="", foreground="gray")
+        self.metrics_file_label.grid(row=1, column=0, sticky="w", padx=5, pady=(0, 5))
+
+    def _begin_metrics_run(self):
+        """Zera o painel de métricas; os eventos seguintes vão para um novo arquivo de métricas."""
+        if self.metrics_log is not None:
+            self.metrics_log.close()
+        self.metrics_log = MetricsLog()
+        self.stage_totals = StageTotals()
+        self.metrics_tree.delete(*self.metrics_tree.get_children())
+        self.metrics_file_label.config(text="")
+
+    def _record_metric(self, metric):
+        if self.metrics_log is None:
+            self._begin_metrics_run()
+        self.metrics_log.write(metric)
+        self.metrics_file_label.config(text=f"Métricas gravadas em {self.metrics_log.path}")
+        totals = self.stage_totals.add(metric)
+        values = self._format_stage_totals(metric['stage'], totals)
+        if self.metrics_tree.exists(metric['stage']):
+            self.metrics_tree.item(metric['stage'], values=values)
+        else:
+            # Mantém as linhas na ordem das etapas do pipeline
+            order = [stage for stage, _ in self.stage_totals.ordered()]
+            self.metrics_tree.insert("", order.index(metric['stage']), iid=metric['stage'], values=values)
+
+    def _format_stage_totals(self, stage, totals):
+        files = str(totals['files'])
+        if totals['failures']:
+            files += f" ({totals['failures']} com erro)"
+        elapsed = totals['elapsed']
+        if totals['bytes'] and elapsed > 0:
+            rate = f"{self._format_bytes(totals['bytes'] / elapsed)}/s"
+        elif totals['rows'] and elapsed > 0:
+            rate = f"{totals['rows'] / elapsed:,.0f} linhas/s"
+        else:
+            rate = "-"
+        return (STAGE_LABELS.get(stage, stage), files,
+                self._format_bytes(totals['bytes']) if totals['bytes'] else "-",
+                f"{totals['rows']:,}" if totals['rows'] else "-",
+                f"{elapsed:.1f} s", f"{totals['cpu_time']:.1f} s", rate, self._format_bytes(totals['peak_rss']))
+
     def _refresh_extracted_files_list(self):
         self.extracted_files_listbox.delete(0, tk.END)
         data_dir = DownloadManager.DATA_DIR
@@ -117,70 +220,183 @@ class MainApplicationWindow:
             self.extracted_files_listbox.insert(tk.END, f)
 
     def _on_file_selected(self, event):
+        selected_indices = self.extracted_files_listbox.curselection()
+        if selected_indices:
+            selected_filename = self.extracted_files_listbox.get(selected_indices[0])
+            # Acrescentar arquivos à seleção não reinicia as colunas escolhidas
+            if os.path.join(DownloadManager.DATA_DIR, selected_filename) == self.selected_processing_file and self.column_vars:
+                return
+
         for widget in self.columns_checkbox_frame.scrollable_frame.winfo_children():
             widget.destroy()
         self.column_vars.clear()
+        self.column_profile_labels.clear()
 
-        selected_indices = self.extracted_files_listbox.curselection()
         if not selected_indices: return
 
-        selected_filename = self.extracted_files_listbox.get(selected_indices[0])
         self.selected_processing_file = os.path.join(DownloadManager.DATA_DIR, selected_filename)
 
         try:
+            import pandas as pd
+            from src.controllers.column_profile import load_cached_profile
+
             df = pd.read_csv(self.selected_processing_file, sep=';', encoding='latin-1', nrows=0)
             columns = df.columns.tolist()
 
             for col in columns:
                 var = tk.BooleanVar(value=True)
                 self.column_vars[col] = var
-                cb = ttk.Checkbutton(self.columns_checkbox_frame.scrollable_frame, text=col, variable=var)
-                cb.pack(anchor="w", padx=5)
+                row_frame = ttk.Frame(self.columns_checkbox_frame.scrollable_frame)
+                row_frame.pack(anchor="w", fill=tk.X, padx=5)
+                cb = ttk.Checkbutton(row_frame, text=col, variable=var, width=32)
+                cb.pack(side=tk.LEFT)
+                profile_label = ttk.Label(row_frame, text="", foreground="gray")
+                profile_label.pack(side=tk.LEFT, padx=5)
+                self.column_profile_labels[col] = profile_label
+            self._show_column_profile(load_cached_profile(self.selected_processing_file))
         except Exception as e:
             self.log(f"[ERROR] Erro ao ler colunas do arquivo {selected_filename}: {e}")
             messagebox.showerror("Erro", f"Não foi possível ler as colunas do arquivo {selected_filename}. Erro: {e}")
+            return
 
-    def _export_to_sqlite(self, selected_columns):
+        self._load_preview(self.selected_processing_file)
+
+    def _start_column_profile(self):
         if not self.selected_processing_file:
-            messagebox.showwarning("Aviso", "Selecione um arquivo para exportar.")
+            messagebox.showwarning("Aviso", "Selecione um arquivo para analisar.")
             return
+        self.profile_button.config(state="disabled")
+        threading.Thread(
+            target=self.download_manager.profile_columns,
+            args=(self.selected_processing_file,),
+            daemon=True
+        ).start()
 
-        if not selected_columns:
-            messagebox.showwarning("Aviso", "Selecione pelo menos uma coluna para exportar.")
+    def _show_column_profile(self, profile):
+        if not profile:
+            return
+        for col, label in self.column_profile_labels.items():
+            stats = profile['columns'].get(col)
+            label.config(text=self._format_column_profile(stats) if stats else "")
+
+    def _format_column_profile(self, stats):
+        rows = stats['rows'] or 1
+        empty = (stats['nulls'] + stats['sentinels']) / rows
+        parts = [f"nulos/ignorados {empty:.1%}", f"~{stats['distinct']:,} distintos".replace(",", ".")]
+        if stats['min'] is not None:
+            parts.append(f"mín {stats['min']} máx {stats['max']}")
+        if stats['top']:
+            parts.append("frequentes: " + ", ".join(f"{value} ({count / rows:.0%})" for value, count in stats['top'][:3]))
+        return " | ".join(parts)
+
+    def _load_preview(self, path):
+        """Carrega (ou constrói, em segundo plano) o índice de linhas e mostra a primeira página."""
+        self.preview_index = None
+        self.preview_start = 0
+        self.preview_tree.delete(*self.preview_tree.get_children())
+        self._update_preview_controls()
+        from src.controllers.line_index import LineIndex
+
+        index = LineIndex.load(path)
+        if index is not None:
+            self._show_preview_index(index)
             return
 
-        try:
-            # Read the selected file into a pandas DataFrame, selecting only the chosen columns
-            df = pd.read_csv(self.selected_processing_file, sep=';', encoding='latin-1', usecols=selected_columns)
+        self.preview_rows_label.config(text="Indexando linhas do arquivo...")
 
-            file_basename = os.path.basename(self.selected_processing_file)
-            default_filename = os.path.splitext(file_basename)[0] + ".db"
+        def build():
+            try:
+                index = LineIndex.load_or_build(path)
+                self.queue.put(("INDEX_READY", {'path': path, 'index': index}))
+            except Exception as e:
+                self.queue.put(("LOG", f"[ERROR] Falha ao indexar {os.path.basename(path)}: {e}"))
 
-            filepath = filedialog.asksaveasfilename(
-                defaultextension=".db",
-                filetypes=[("SQLite database files", "*.db"), ("All files", "*.* ")],
-                initialfile=default_filename
-            )
+        threading.Thread(target=build, daemon=True).start()
 
-            if not filepath: # User cancelled the dialog
-                self.log("Exportação para SQLite cancelada pelo usuário.")
-                return
+    def _show_preview_index(self, index):
+        if index.path != self.selected_processing_file:
+            # A seleção mudou enquanto o índice era construído
+            return
+        self.preview_index = index
+        columns = index.header_names()
+        self.preview_tree.config(columns=columns)
+        for col in columns:
+            self.preview_tree.heading(col, text=col)
+            self.preview_tree.column(col, width=110, stretch=False)
+        self._show_preview_page(0)
+
+    def _show_preview_page(self, start):
+        index = self.preview_index
+        if index is None:
+            return
+        start = max(0, min(start, max(index.row_count - 1, 0)))
+        try:
+            page = index.read_rows(start, self.PREVIEW_PAGE_ROWS)
+        except Exception as e:
+            self.log(f"[ERROR] Erro ao ler as linhas do arquivo: {e}")
+            return
+        self.preview_start = start
+        self.preview_tree.delete(*self.preview_tree.get_children())
+        for row in page.itertuples(index=False):
+            self.preview_tree.insert("", tk.END, values=list(row))
+        self._update_preview_controls()
+
+    def _update_preview_controls(self):
+        index = self.preview_index
+        if index is None:
+            self.preview_rows_label.config(text="")
+            self.preview_range_label.config(text="")
+            self.preview_prev_button.config(state="disabled")
+            self.preview_next_button.config(state="disabled")
+            return
+        end = min(self.preview_start + self.PREVIEW_PAGE_ROWS, index.row_count)
+        self.preview_rows_label.config(text=f"Total de linhas: {index.row_count:,}".replace(",", "."))
+        self.preview_range_label.config(text=f"Linhas {self.preview_start + 1 if end else 0} a {end}")
+        self.preview_prev_button.config(state="normal" if self.preview_start > 0 else "disabled")
+        self.preview_next_button.config(state="normal" if end < index.row_count else "disabled")
+
+    def _parse_row_filter(self, text):
+        """RowFilter da expressão digitada (None se vazia); False se inválida, após avisar o usuário."""
+        try:
+            return RowFilter.parse(text)
+        except ValueError as e:
+            messagebox.showerror("Filtro de Linhas", f"Filtro inválido: {e}")
+            return False
 
-            # Save DataFrame to SQLite
-            # You might need to install sqlalchemy and sqlite3 if not already installed
-            # pip install sqlalchemy
-            # import sqlite3 # sqlite3 is usually built-in with Python
-            from sqlalchemy import create_engine
-            engine = create_engine(f'sqlite:///{filepath}')
-            table_name = os.path.splitext(file_basename)[0] # Use filename as table name
-            df.to_sql(table_name, engine, if_exists='replace', index=False)
+    def _start_batch_import(self):
+        selected_indices = self.extracted_files_listbox.curselection()
+        if not selected_indices:
+            messagebox.showwarning("Aviso", "Selecione pelo menos um arquivo para importar.")
+            return
+        row_filter = self._parse_row_filter(self.row_filter_var.get())
+        if row_filter is False:
+            return
 
-            self.log(f"Dados exportados com sucesso para {filepath} na tabela {table_name}.")
-            messagebox.showinfo("Sucesso", f"Dados exportados com sucesso para SQLite:\n{filepath}\nTabela: {table_name}")
+        txt_paths = [os.path.join(DownloadManager.DATA_DIR, self.extracted_files_listbox.get(i)) for i in selected_indices]
+        # As colunas listadas são as do primeiro arquivo; a seleção vale para todos
+        selected_columns = [col for col, var in self.column_vars.items() if var.get()]
+        if self.column_vars and not selected_columns:
+            messagebox.showwarning("Aviso", "Selecione pelo menos uma coluna para importar.")
+            return
+        if len(selected_columns) == len(self.column_vars):
+            selected_columns = None
+
+        replace = self.batch_replace_var.get()
+        if replace:
+            detail = "A tabela existente será substituída."
+        else:
+            detail = "Arquivos já importados sem alterações serão ignorados; os alterados substituem só as próprias linhas."
+        if not messagebox.askyesno("Importar para o Banco", f"Importar {len(txt_paths)} arquivo(s) para {DownloadManager.DB_PATH}?\n"
+                                   f"{detail}"):
+            return
 
-        except Exception as e:
-            self.log(f"[ERROR] Erro ao exportar dados para SQLite: {e}")
-            messagebox.showerror("Erro de Exportação", f"Ocorreu um erro ao exportar os dados para SQLite: {e}")
+        self.batch_import_button.config(state="disabled")
+        self._begin_metrics_run()
+        threading.Thread(
+            target=self.download_manager.import_files_to_db,
+            args=(txt_paths, selected_columns, replace, row_filter, self.batch_normalized_var.get()),
+            daemon=True
+        ).start()
 
     def _show_export_options_dialog(self):
         if not self.selected_processing_file:
@@ -200,7 +416,7 @@ class MainApplicationWindow:
 
         # Center the dialog
         dialog_width = 300
-        dialog_height = 200
+        dialog_height = 280
         self.root.update_idletasks()
         x = self.root.winfo_x() + (self.root.winfo_width() // 2) - (dialog_width // 2)
         y = self.root.winfo_y() + (self.root.winfo_height() // 2) - (dialog_height // 2)
@@ -210,33 +426,40 @@ class MainApplicationWindow:
 
         ttk.Label(dialog, text="Selecione o formato de exportação:").pack(pady=10)
 
-        formats = ["SQLite", "TXT", "CSV", "EXCEL"]
+        formats = ["SQLite", "TXT", "CSV", "EXCEL", "PARQUET"]
         for fmt in formats:
             ttk.Radiobutton(dialog, text=fmt, variable=format_var, value=fmt).pack(anchor="w", padx=20)
 
+        compression_frame = ttk.Frame(dialog)
+        compression_frame.pack(anchor="w", padx=20, pady=(5, 0))
+        ttk.Label(compression_frame, text="Compressão (Parquet):").pack(side=tk.LEFT)
+        compression_var = tk.StringVar(value=ParquetDatasetWriter.DEFAULT_COMPRESSION)
+        ttk.Combobox(compression_frame, textvariable=compression_var, values=ParquetDatasetWriter.COMPRESSIONS,
+                     state="readonly", width=8).pack(side=tk.LEFT, padx=5)
+
         def on_export():
             selected_format = format_var.get()
             dialog.destroy()
-            self._perform_export(selected_format, selected_columns)
+            self._perform_export(selected_format, selected_columns, compression_var.get())
 
         ttk.Button(dialog, text="Exportar", command=on_export).pack(pady=10)
 
-    def _perform_export(self, export_format, selected_columns):
+    def _perform_export(self, export_format, selected_columns, compression=ParquetDatasetWriter.DEFAULT_COMPRESSION):
         if not self.selected_processing_file:
             messagebox.showwarning("Aviso", "Nenhum arquivo selecionado para exportar.")
             return
+        row_filter = self._parse_row_filter(self.row_filter_var.get())
+        if row_filter is False:
+            return
 
-        try:
-            # Read the selected file into a pandas DataFrame, selecting only the chosen columns
-            df = pd.read_csv(self.selected_processing_file, sep=';', encoding='latin-1', usecols=selected_columns)
-
-            file_basename = os.path.basename(self.selected_processing_file)
-            default_filename = os.path.splitext(file_basename)[0] + "_exported"
-
-            filetypes = []
+        file_basename = os.path.basename(self.selected_processing_file)
+        if export_format == "PARQUET":
+            filepath = filedialog.askdirectory(title="Pasta do dataset Parquet", initialdir=DownloadManager.DATA_DIR)
+        else:
             if export_format == "SQLite":
-                self._export_to_sqlite(selected_columns) # Pass selected_columns
-                return
+                filetypes = [("SQLite database files", "*.db"), ("All files", "*.* ")]
+                default_extension = ".db"
+                default_filename = os.path.splitext(file_basename)[0] + ".db"
             elif export_format == "TXT":
                 filetypes = [("Text files", "*.txt"), ("All files", "*.* ")]
                 default_extension = ".txt"
@@ -249,32 +472,28 @@ class MainApplicationWindow:
             else:
                 messagebox.showerror("Erro", "Formato de exportação inválido.")
                 return
+            if export_format != "SQLite":
+                default_filename = os.path.splitext(file_basename)[0] + "_exported"
 
-            # Open save file dialog
+            # O destino é escolhido antes de qualquer leitura do arquivo
             filepath = filedialog.asksaveasfilename(
                 defaultextension=default_extension,
                 filetypes=filetypes,
                 initialfile=default_filename
             )
 
-            if not filepath: # User cancelled the dialog
-                self.log("Exportação cancelada pelo usuário.")
-                return
-
-            # Perform the export
-            if export_format == "TXT":
-                df.to_csv(filepath, sep='\t', index=False)
-            elif export_format == "CSV":
-                df.to_csv(filepath, index=False)
-            elif export_format == "EXCEL":
-                df.to_excel(filepath, index=False)
-
-            self.log(f"Dados exportados com sucesso para {filepath} em formato {export_format}.")
-            messagebox.showinfo("Sucesso", f"Dados exportados com sucesso para:\n{filepath}")
+        if not filepath: # User cancelled the dialog
+            self.log("Exportação cancelada pelo usuário.")
+            return
 
-        except Exception as e:
-            self.log(f"[ERROR] Erro ao exportar dados para {export_format}: {e}")
-            messagebox.showerror("Erro de Exportação", f"Ocorreu um erro ao exportar os dados: {e}")
+        # A leitura e a gravação são feitas em chunks fora do thread da interface;
+        # o resultado chega em EXPORT_COMPLETE
+        self._begin_metrics_run()
+        threading.Thread(
+            target=self.download_manager.export_file,
+            args=(self.selected_processing_file, filepath, export_format, selected_columns, compression, row_filter),
+            daemon=True
+        ).start()
 
     def _format_bytes(self, bytes_val):
         if bytes_val < 1024: return f"{bytes_val:.0f} B"
@@ -312,6 +531,32 @@ class MainApplicationWindow:
         controls_frame.grid(row=2, column=0, sticky="ew")
         controls_frame.columnconfigure(0, weight=1)
 
+        self.stream_import_var = tk.BooleanVar(value=False)
+        stream_import_check = ttk.Checkbutton(controls_frame, text="Importar direto para o banco (sem extrair os .txt)", variable=self.stream_import_var)
+        stream_import_check.pack(side=tk.LEFT, padx=5, pady=10)
+
+        self.import_to_db_var = tk.BooleanVar(value=False)
+        import_to_db_check = ttk.Checkbutton(controls_frame, text="Importar para o banco após extrair", variable=self.import_to_db_var)
+        import_to_db_check.pack(side=tk.LEFT, padx=5, pady=10)
+
+        self.parquet_output_var = tk.BooleanVar(value=False)
+        parquet_output_check = ttk.Checkbutton(controls_frame, text="Gravar em Parquet (data/parquet)", variable=self.parquet_output_var)
+        parquet_output_check.pack(side=tk.LEFT, padx=5, pady=10)
+
+        self.parquet_compression_var = tk.StringVar(value=ParquetDatasetWriter.DEFAULT_COMPRESSION)
+        parquet_compression_combo = ttk.Combobox(controls_frame, textvariable=self.parquet_compression_var,
+                                                 values=ParquetDatasetWriter.COMPRESSIONS, state="readonly", width=8)
+        parquet_compression_combo.pack(side=tk.LEFT, padx=5, pady=10)
+
+        self.normalized_storage_var = tk.BooleanVar(value=False)
+        normalized_storage_check = ttk.Checkbutton(controls_frame, text="Tabelas de dimensão", variable=self.normalized_storage_var)
+        normalized_storage_check.pack(side=tk.LEFT, padx=5, pady=10)
+
+        ttk.Label(controls_frame, text="Filtro de linhas:").pack(side=tk.LEFT, padx=(10, 0), pady=10)
+        self.download_row_filter_var = tk.StringVar()
+        download_row_filter_entry = ttk.Entry(controls_frame, textvariable=self.download_row_filter_var, width=40)
+        download_row_filter_entry.pack(side=tk.LEFT, padx=5, pady=10)
+
         button_container = ttk.Frame(controls_frame)
         button_container.pack(side=tk.RIGHT, padx=5, pady=10)
 
@@ -349,7 +594,8 @@ class MainApplicationWindow:
         parent_frame.columnconfigure(0, weight=1)
         parent_frame.rowconfigure(1, weight=1) # Manter weight=1 para a lista de arquivos
         parent_frame.rowconfigure(2, weight=1) # Manter weight=1 para as colunas
-        parent_frame.rowconfigure(3, weight=0) # Nova row para o botão Exportar Dados
+        parent_frame.rowconfigure(3, weight=1) # Pré-visualização do arquivo selecionado
+        parent_frame.rowconfigure(4, weight=0) # Nova row para o botão Exportar Dados
 
         # Frame para o botão de atualização (agora na row 0)
         refresh_button_frame = ttk.Frame(parent_frame)
@@ -364,7 +610,7 @@ class MainApplicationWindow:
         extracted_files_frame.columnconfigure(0, weight=1)
         extracted_files_frame.rowconfigure(0, weight=1)
 
-        self.extracted_files_listbox = tk.Listbox(extracted_files_frame, selectmode=tk.SINGLE)
+        self.extracted_files_listbox = tk.Listbox(extracted_files_frame, selectmode=tk.EXTENDED, exportselection=False)
         self.extracted_files_listbox.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
         self.extracted_files_listbox.bind("<<ListboxSelect>>", self._on_file_selected)
 
@@ -380,9 +626,57 @@ class MainApplicationWindow:
         self.columns_checkbox_frame = ScrollableFrame(columns_frame)
         self.columns_checkbox_frame.grid(row=0, column=0, sticky="nsew")
 
-        # Botão Exportar Dados (agora na row 3)
-        import_button = ttk.Button(parent_frame, text="Exportar Dados", command=self._show_export_options_dialog)
-        import_button.grid(row=3, column=0, pady=10) # Alterado para row=3
+        self.profile_button = ttk.Button(columns_frame, text="Analisar Colunas", command=self._start_column_profile)
+        self.profile_button.grid(row=1, column=0, pady=(2, 5))
+
+        preview_frame = ttk.LabelFrame(parent_frame, text="Pré-visualização")
+        preview_frame.grid(row=3, column=0, sticky="nsew", padx=5, pady=5)
+        preview_frame.columnconfigure(0, weight=1)
+        preview_frame.rowconfigure(1, weight=1)
+
+        self.preview_rows_label = ttk.Label(preview_frame, text="")
+        self.preview_rows_label.grid(row=0, column=0, columnspan=2, sticky="w", padx=5, pady=2)
+
+        self.preview_tree = ttk.Treeview(preview_frame, show="headings", height=8)
+        self.preview_tree.grid(row=1, column=0, sticky="nsew", padx=(5, 0))
+        preview_yscroll = ttk.Scrollbar(preview_frame, orient="vertical", command=self.preview_tree.yview)
+        preview_yscroll.grid(row=1, column=1, sticky="ns")
+        preview_xscroll = ttk.Scrollbar(preview_frame, orient="horizontal", command=self.preview_tree.xview)
+        preview_xscroll.grid(row=2, column=0, sticky="ew", padx=(5, 0))
+        self.preview_tree.config(yscrollcommand=preview_yscroll.set, xscrollcommand=preview_xscroll.set)
+
+        preview_nav_frame = ttk.Frame(preview_frame)
+        preview_nav_frame.grid(row=3, column=0, columnspan=2, pady=2)
+        self.preview_prev_button = ttk.Button(preview_nav_frame, text="< Anterior", state="disabled",
+                                              command=lambda: self._show_preview_page(self.preview_start - self.PREVIEW_PAGE_ROWS))
+        self.preview_prev_button.pack(side=tk.LEFT, padx=5)
+        self.preview_range_label = ttk.Label(preview_nav_frame, text="")
+        self.preview_range_label.pack(side=tk.LEFT, padx=5)
+        self.preview_next_button = ttk.Button(preview_nav_frame, text="Próxima >", state="disabled",
+                                              command=lambda: self._show_preview_page(self.preview_start + self.PREVIEW_PAGE_ROWS))
+        self.preview_next_button.pack(side=tk.LEFT, padx=5)
+
+        # Botões Importar/Exportar Dados (agora na row 4)
+        actions_frame = ttk.Frame(parent_frame)
+        actions_frame.grid(row=4, column=0, pady=10)
+
+        ttk.Label(actions_frame, text="Filtro de linhas:").pack(side=tk.LEFT, padx=(5, 0))
+        self.row_filter_var = tk.StringVar()
+        row_filter_entry = ttk.Entry(actions_frame, textvariable=self.row_filter_var, width=60)
+        row_filter_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Label(actions_frame, text="ex.: Município in (355030, 330455); Idade entre 18 e 29",
+                  foreground="gray").pack(side=tk.LEFT, padx=(0, 10))
+
+        self.batch_normalized_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(actions_frame, text="Tabelas de dimensão", variable=self.batch_normalized_var).pack(side=tk.LEFT, padx=5)
+        self.batch_replace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(actions_frame, text="Recriar tabela", variable=self.batch_replace_var).pack(side=tk.LEFT, padx=5)
+
+        self.batch_import_button = ttk.Button(actions_frame, text="Importar Selecionados para o Banco", command=self._start_batch_import)
+        self.batch_import_button.pack(side=tk.LEFT, padx=5)
+
+        export_button = ttk.Button(actions_frame, text="Exportar Dados", command=self._show_export_options_dialog)
+        export_button.pack(side=tk.LEFT, padx=5)
 
         self._refresh_extracted_files_list()
 
@@ -399,6 +693,8 @@ class MainApplicationWindow:
         content_frame.rowconfigure(3, weight=1)
 
         try:
+            from PIL import Image, ImageTk
+
             # Carrega a imagem usando PIL
             original_image = Image.open('img/Raislogo.png')
             # Redimensiona a imagem (exemplo: 200x100 pixels)
@@ -489,6 +785,10 @@ class MainApplicationWindow:
         self.size_label.config(text="Tamanho: N/A")
         self.speed_label.config(text="Velocidade: N/A")
         self.overall_progress_label.config(text="Progresso Total: N/A")
+        self.active_files.clear()
+        self.session_bytes_downloaded = 0
+        self.last_update_bytes = 0
+        self.current_speed_bps = 0
 
     def _on_tab_change(self, event):
         selected_tab_id = self.notebook.select()
@@ -498,58 +798,137 @@ class MainApplicationWindow:
             self._refresh_extracted_files_list()
 
     def process_queue(self):
+        """Esvazia a fila a cada ciclo.
+
+        Do progresso de cada arquivo só a última posição recebida é aplicada,
+        e as linhas de log são inseridas na área de status de uma só vez.
+        """
+        pending_progress = {}
+        pending_logs = []
+        deadline = time.time() + self.QUEUE_DRAIN_BUDGET
         try:
-            message = self.queue.get_nowait()
-            msg_type, value = message
-            
-            if msg_type == "TOTAL_PROGRESS_MAX":
-                self.overall_progress['maximum'] = value
-                self.overall_progress_label.config(text=f"Progresso Total: 0 / {value}")
-            elif msg_type == "TOTAL_PROGRESS_UPDATE":
-                self.overall_progress['value'] = value
-                self.overall_progress_label.config(text=f"Progresso Total: {value} / {self.overall_progress['maximum']}")
-            elif msg_type == "FILE_PROGRESS_START":
-                self.current_file_label.config(text=f"Arquivo: {value['file']}")
-                self.file_progress['maximum'] = value['total_size']
-                self.file_progress['value'] = 0
-                self.size_label.config(text=f"Tamanho: 0 KB / {self._format_bytes(value['total_size'])}")
-                self.speed_label.config(text="Velocidade: N/A")
-                self.current_file_total_size = value['total_size']
-                self.current_file_bytes_downloaded = 0
-                self.current_file_start_time = time.time()
+            while time.time() < deadline:
+                try:
+                    msg_type, value = self.queue.get_nowait()
+                except Empty:
+                    break
+
+                if msg_type == "FILE_PROGRESS_UPDATE":
+                    pending_progress[value['file']] = value['bytes_downloaded']
+                    continue
+                if msg_type == "LOG":
+                    pending_logs.append(value)
+                    if value != "Processo interrompido.":
+                        continue
+
+                # Mensagens de controle dependem da ordem: aplica o que está pendente antes
+                self._apply_progress(pending_progress)
+                pending_progress = {}
+                self._append_logs(pending_logs)
+                pending_logs = []
+                self._handle_message(msg_type, value)
+        except Exception as e:
+            pending_logs.append(f"[ERROR] Exceção em process_queue: {e}")
+        finally:
+            try:
+                self._apply_progress(pending_progress)
+                self._append_logs(pending_logs)
+            finally:
+                self.root.after(100, self.process_queue)
+
+    def _handle_message(self, msg_type, value):
+        if msg_type == "TOTAL_PROGRESS_MAX":
+            self.overall_progress['maximum'] = value
+            self.overall_progress_label.config(text=f"Progresso Total: 0 / {value}")
+        elif msg_type == "TOTAL_PROGRESS_UPDATE":
+            self.overall_progress['value'] = value
+            self._update_overall_label()
+        elif msg_type == "FILE_PROGRESS_START":
+            if not self.active_files and self.session_bytes_downloaded == 0:
                 self.last_update_time = time.time()
                 self.last_update_bytes = 0
-            elif msg_type == "FILE_PROGRESS_UPDATE":
-                file_name = value['file']
-                bytes_downloaded = value['bytes_downloaded']
-                
-                self.file_progress['value'] = bytes_downloaded
-                
-                current_time = time.time()
-                time_diff = current_time - self.last_update_time
-                bytes_diff = bytes_downloaded - self.last_update_bytes
-
-                if time_diff > 0: 
-                    speed_bps = bytes_diff / time_diff
-                    self.speed_label.config(text=f"Velocidade: {self._format_bytes(speed_bps)}/s")
-                
-                self.size_label.config(text=f"Tamanho: {self._format_bytes(bytes_downloaded)} / {self._format_bytes(self.current_file_total_size)}")
-                
-                self.last_update_time = current_time
-                self.last_update_bytes = bytes_downloaded
-
-            elif msg_type == "LOG":
-                self.log(value)
-                if value == "Processo interrompido.":
-                    self._reset_ui_on_finish()
-            elif msg_type == "DONE":
-                self.log("Processo finalizado!")
+            self.active_files[value['file']] = {'total_size': value['total_size'] or 0, 'bytes_downloaded': 0}
+            self._update_file_progress_widgets()
+        elif msg_type == "FILE_PROGRESS_END":
+            self.active_files.pop(value['file'], None)
+            self._update_file_progress_widgets()
+        elif msg_type == "LOG":
+            # O texto já foi inserido em lote por process_queue
+            if value == "Processo interrompido.":
                 self._reset_ui_on_finish()
-        except Empty:
-            pass
-        except Exception as e:
-            self.log(f"[ERROR] Exceção em process_queue: {e}")
-        self.root.after(100, self.process_queue)
+        elif msg_type in ("EXPORT_COMPLETE", "IMPORT_COMPLETE"):
+            if msg_type == "IMPORT_COMPLETE":
+                self.batch_import_button.config(state="normal")
+            if value['ok']:
+                messagebox.showinfo("Sucesso", value['message'])
+            else:
+                title = "Erro de Importação" if msg_type == "IMPORT_COMPLETE" else "Erro de Exportação"
+                messagebox.showerror(title, value['message'])
+        elif msg_type == METRIC:
+            self._record_metric(value)
+        elif msg_type == "CATALOG_UPDATED":
+            self.update_available_data(value['data'], value['new_files'])
+        elif msg_type == "INDEX_READY":
+            self._show_preview_index(value['index'])
+        elif msg_type == "PROFILE_READY":
+            self.profile_button.config(state="normal")
+            if value['profile'] is None:
+                messagebox.showerror("Erro", "Não foi possível calcular o perfil das colunas. Veja o log para detalhes.")
+            elif value['path'] == self.selected_processing_file:
+                self._show_column_profile(value['profile'])
+        elif msg_type == "DONE":
+            self.log("Processo finalizado!")
+            self._reset_ui_on_finish()
+
+    def _apply_progress(self, progress):
+        """Aplica a última posição conhecida de cada arquivo e redesenha o progresso uma vez."""
+        if not progress:
+            return
+        for file_name, bytes_downloaded in progress.items():
+            state = self.active_files.get(file_name)
+            if state is not None:
+                delta = bytes_downloaded - state['bytes_downloaded']
+                state['bytes_downloaded'] = bytes_downloaded
+                self.session_bytes_downloaded += max(delta, 0)
+        self._update_speed()
+        self._update_file_progress_widgets()
+
+    def _append_logs(self, lines):
+        if lines:
+            self.log("\n".join(lines))
+
+    def _update_speed(self):
+        """Atualiza a vazão agregada de todas as conexões ativas (janela mínima de 0,5 s)."""
+        current_time = time.time()
+        time_diff = current_time - self.last_update_time
+        if time_diff < 0.5:
+            return
+        bytes_diff = self.session_bytes_downloaded - self.last_update_bytes
+        self.current_speed_bps = bytes_diff / time_diff
+        self.last_update_time = current_time
+        self.last_update_bytes = self.session_bytes_downloaded
+        self.speed_label.config(text=f"Velocidade: {self._format_bytes(self.current_speed_bps)}/s ({len(self.active_files)} conexões)")
+        self._update_overall_label()
+
+    def _update_overall_label(self):
+        text = f"Progresso Total: {int(self.overall_progress['value'])} / {int(self.overall_progress['maximum'])}"
+        if self.current_speed_bps > 0:
+            text += f" - {self._format_bytes(self.current_speed_bps)}/s"
+        self.overall_progress_label.config(text=text)
+
+    def _update_file_progress_widgets(self):
+        """Mostra o progresso combinado dos arquivos em download simultâneo."""
+        if not self.active_files:
+            self.current_file_label.config(text="Arquivo: N/A")
+            self.file_progress['value'] = 0
+            return
+        names = sorted(self.active_files)
+        self.current_file_label.config(text=f"Arquivos ({len(names)}): {', '.join(names)}")
+        total_size = sum(f['total_size'] for f in self.active_files.values())
+        downloaded = sum(f['bytes_downloaded'] for f in self.active_files.values())
+        self.file_progress['maximum'] = max(total_size, 1)
+        self.file_progress['value'] = downloaded
+        self.size_label.config(text=f"Tamanho: {self._format_bytes(downloaded)} / {self._format_bytes(total_size)}")
 
     def _request_cancel(self):
         if messagebox.askyesno("Cancelar Processo", "Tem certeza que deseja cancelar o processo atual? "): 
@@ -563,6 +942,9 @@ class MainApplicationWindow:
         
         if not selected_years or not selected_files:
             self.log("Erro: Selecione pelo menos um ano e um arquivo."); return
+        row_filter = self._parse_row_filter(self.download_row_filter_var.get())
+        if row_filter is False:
+            return
 
         self.start_button.config(state="disabled")
         self.cancel_button.config(state="normal")
@@ -570,11 +952,14 @@ class MainApplicationWindow:
         self.overall_progress['value'] = 0
         self.file_progress['value'] = 0
         self.status_area.configure(state="normal"); self.status_area.delete(1.0, tk.END); self.status_area.configure(state="disabled")
+        self._begin_metrics_run()
         self.log("Iniciando processo...")
         
         worker_thread = threading.Thread(
             target=self.download_manager.start_processing,
-            args=(selected_years, selected_files, self.available_data),
+            args=(selected_years, selected_files, self.available_data, self.stream_import_var.get(), self.import_to_db_var.get(),
+                  self.parquet_output_var.get(), self.parquet_compression_var.get(), row_filter,
+                  self.normalized_storage_var.get()),
             daemon=True
         )
         worker_thread.start()
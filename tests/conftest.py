@@ -0,0 +1,33 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Os módulos são importados como `src.controllers...`, a partir da raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.controllers.aggregates import DEFAULT_AGGREGATES, _key_columns, _measure_columns
+from src.controllers.sqlite_loader import _quote
+
+def _comparable(rows):
+    """Linhas em ordem fixa (chaves nulas primeiro) e com as somas arredondadas."""
+    rows = [tuple(round(v, 4) if isinstance(v, float) else v for v in row) for row in rows]
+    return sorted(rows, key=lambda row: [(v is not None, v if v is not None else 0) for v in row])
+
+@pytest.fixture
+def assert_aggregates_match():
+    """Confere cada tabela de agregados com um GROUP BY sobre a tabela de vínculos."""
+    def check(db_path, table="vinculos", specs=DEFAULT_AGGREGATES):
+        with sqlite3.connect(db_path) as conn:
+            for spec in specs:
+                keys = ", ".join(_quote(k) for k in _key_columns(spec))
+                measures = _measure_columns(spec)
+                stored = ", ".join(_quote(f"{prefix}_{m}") for m in measures for prefix in ("soma", "n"))
+                computed = ", ".join(f"{func}({_quote(m)})" for m in measures for func in ("total", "count"))
+                aggregated = conn.execute(f"SELECT {keys}, linhas, {stored} FROM {_quote(spec.name)}").fetchall()
+                expected = conn.execute(f"SELECT {keys}, count(*), {computed} FROM {_quote(table)} "
+                                        f"GROUP BY {keys}").fetchall()
+                assert expected, spec.name
+                assert _comparable(aggregated) == _comparable(expected), spec.name
+    return check
@@ -0,0 +1,45 @@
+"""Tabelas de agregados mantidas por UPSERT durante a importação para o banco."""
+import os
+import sqlite3
+from queue import Queue
+
+import pytest
+
+from src.controllers.aggregates import DEFAULT_AGGREGATES
+from src.controllers.download_manager import worker_process_db
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "RAIS_VINC_PUB_NI.txt")
+
+def _write_sample(path, rows):
+    with open(SAMPLE, 'rb') as f:
+        lines = f.readlines()
+    path.write_bytes(b"".join(lines[:rows + 1]))
+
+def _import(txt, year, db_path, normalized):
+    result_queue = Queue()
+    worker_process_db(str(txt), year, str(db_path), Queue(), result_queue=result_queue, aggregates=DEFAULT_AGGREGATES,
+                      normalized=normalized, chunk_size=700)
+    ok, _, error = result_queue.get_nowait()
+    assert ok, error
+
+@pytest.mark.parametrize("normalized", [False, True])
+def test_aggregates_match_group_by_after_reimport(tmp_path, normalized, assert_aggregates_match):
+    db_path = tmp_path / "rais.db"
+    txt_2020 = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    txt_2021 = tmp_path / "2021_RAIS_VINC_PUB_NI.txt"
+    _write_sample(txt_2020, 4000)
+    _write_sample(txt_2021, 1500)
+    _import(txt_2020, "2020", db_path, normalized)
+    _import(txt_2021, "2021", db_path, normalized)
+    assert_aggregates_match(db_path)
+
+    # O arquivo de 2020 muda: as linhas e a contribuição anteriores aos agregados são substituídas
+    _write_sample(txt_2020, 2500)
+    _import(txt_2020, "2020", db_path, normalized)
+
+    with sqlite3.connect(db_path) as conn:
+        counts = dict(conn.execute("SELECT ano, COUNT(*) FROM vinculos GROUP BY ano"))
+        groups = conn.execute("SELECT SUM(linhas) FROM agg_vinculos_municipio_sexo").fetchone()[0]
+    assert counts == {2020: 2500, 2021: 1500}
+    assert groups == 4000
+    assert_aggregates_match(db_path)
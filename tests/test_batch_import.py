@@ -0,0 +1,145 @@
+"""Importação em lote (DownloadManager.import_files_to_db)."""
+import os
+import shutil
+import sqlite3
+import threading
+from queue import Queue
+
+import pytest
+
+from src.controllers import download_manager
+from src.controllers.download_manager import DownloadManager
+from src.controllers.index_builder import DEFAULT_INDEXES
+from src.controllers.row_filter import RowFilter
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "RAIS_VINC_PUB_NI.txt")
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(DownloadManager, "DB_PATH", str(tmp_path / "rais.db"))
+    return DownloadManager(Queue(), parse_workers=2)
+
+def _messages(queue, msg_type):
+    found = []
+    while not queue.empty():
+        kind, value = queue.get()
+        if kind == msg_type:
+            found.append(value)
+    return found
+
+def _run_with_timeout(target, *args, timeout=60):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "a importação não terminou"
+
+def test_empty_file_list(manager):
+    manager.import_files_to_db([])
+    assert _messages(manager.queue, "IMPORT_COMPLETE") == [{'ok': True, 'message': "Nenhum arquivo para importar."}]
+
+def test_batch_import(manager, tmp_path):
+    txt = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    shutil.copy(SAMPLE, txt)
+    _run_with_timeout(manager.import_files_to_db, [str(txt)])
+    assert _messages(manager.queue, "IMPORT_COMPLETE")[0]['ok']
+    with sqlite3.connect(manager.DB_PATH) as conn:
+        assert conn.execute("SELECT COUNT(*), MIN(ano), MAX(ano) FROM vinculos").fetchone() == (4731, 2020, 2020)
+
+def _dying_writer(*args, **kwargs):
+    os._exit(1)
+
+# Com um processo de leitura, os lotes de 100 linhas enchem a fila; com dois,
+# o arquivo inteiro cabe em uma faixa e fica no buffer da fila
+@pytest.mark.parametrize("parse_workers", [1, 2])
+def test_parsers_stop_when_writer_dies(manager, tmp_path, monkeypatch, parse_workers):
+    manager.parse_workers = parse_workers
+    # Lotes pequenos e fila curta: sem o aviso do escritor, a leitura ficaria presa na fila cheia
+    monkeypatch.setattr(download_manager, "worker_db_writer", _dying_writer)
+    monkeypatch.setattr(download_manager, "BATCH_IMPORT_CHUNK_SIZE", 100)
+    monkeypatch.setattr(download_manager, "BATCH_PUT_TIMEOUT", 0.1)
+    monkeypatch.setattr(DownloadManager, "BATCH_QUEUE_SIZE", 2)
+    txt = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    shutil.copy(SAMPLE, txt)
+
+    _run_with_timeout(manager.import_files_to_db, [str(txt)])
+
+    complete = _messages(manager.queue, "IMPORT_COMPLETE")
+    assert len(complete) == 1 and not complete[0]['ok']
+    assert "escritor" in complete[0]['message']
+
+@pytest.mark.parametrize("parse_workers", [1, 2])
+def test_parsers_stop_when_writer_fails(manager, tmp_path, monkeypatch, parse_workers):
+    manager.parse_workers = parse_workers
+
+    def fail(self, chunk):
+        raise sqlite3.OperationalError("database or disk is full")
+
+    monkeypatch.setattr(download_manager.SQLiteBulkLoader, "write_chunk", fail)
+    monkeypatch.setattr(download_manager, "BATCH_IMPORT_CHUNK_SIZE", 100)
+    monkeypatch.setattr(download_manager, "BATCH_PUT_TIMEOUT", 0.1)
+    monkeypatch.setattr(DownloadManager, "BATCH_QUEUE_SIZE", 2)
+    txt = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    shutil.copy(SAMPLE, txt)
+
+    _run_with_timeout(manager.import_files_to_db, [str(txt)])
+
+    complete = _messages(manager.queue, "IMPORT_COMPLETE")
+    assert complete == [{'ok': False, 'message': "Ocorreu um erro ao gravar no banco: database or disk is full"}]
+
+def test_reset_storage_allows_switching_to_normalized(manager, tmp_path):
+    txt = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    shutil.copy(SAMPLE, txt)
+    _run_with_timeout(manager.import_files_to_db, [str(txt)], None, False)
+    manager._reset_storage(normalized=True)
+    with sqlite3.connect(manager.DB_PATH) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM importacoes").fetchone() == (0,)
+        assert conn.execute("SELECT COUNT(*) FROM agg_vinculos_municipio_sexo").fetchone() == (0,)
+    _run_with_timeout(manager.import_files_to_db, [str(txt)], None, False, None, True)
+    assert _messages(manager.queue, "IMPORT_COMPLETE")[-1]['ok']
+    with sqlite3.connect(manager.DB_PATH) as conn:
+        assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'vinculos'").fetchone() == ('view',)
+        assert conn.execute("SELECT COUNT(*) FROM vinculos").fetchone() == (4731,)
+        assert conn.execute("SELECT SUM(linhas) FROM agg_vinculos_municipio_sexo").fetchone() == (4731,)
+
+def _index_names(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'vinculos' AND sql IS NOT NULL")}
+
+def test_filter_without_rows_still_builds_indexes(manager, tmp_path):
+    txt = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    shutil.copy(SAMPLE, txt)
+    _run_with_timeout(manager.import_files_to_db, [str(txt)], None, True, RowFilter.parse("Idade > 200"))
+    assert _messages(manager.queue, "IMPORT_COMPLETE")[0]['ok']
+    with sqlite3.connect(manager.DB_PATH) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM vinculos").fetchone() == (0,)
+    assert _index_names(manager.DB_PATH) == {spec.name for spec in DEFAULT_INDEXES}
+
+def test_failed_replace_keeps_indexes(manager, tmp_path, monkeypatch):
+    txt = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    shutil.copy(SAMPLE, txt)
+    _run_with_timeout(manager.import_files_to_db, [str(txt)])
+    indexes = _index_names(manager.DB_PATH)
+
+    def fail(self, chunk):
+        raise sqlite3.OperationalError("database or disk is full")
+
+    monkeypatch.setattr(download_manager.SQLiteBulkLoader, "write_chunk", fail)
+    _run_with_timeout(manager.import_files_to_db, [str(txt)])
+    assert not _messages(manager.queue, "IMPORT_COMPLETE")[-1]['ok']
+    assert indexes == {spec.name for spec in DEFAULT_INDEXES} == _index_names(manager.DB_PATH)
+
+def test_missing_indexes_are_reported_and_built(manager, tmp_path):
+    # Carga concluída sem a etapa dos índices, como depois de um cancelamento
+    txt = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    shutil.copy(SAMPLE, txt)
+    with sqlite3.connect(manager.DB_PATH) as conn:
+        conn.execute("CREATE TABLE vinculos (ano INTEGER, \"Município\" INTEGER)")
+    assert manager._missing_indexes() == ['idx_vinculos_ano_municipio']
+    manager._warn_missing_indexes()
+    assert any("idx_vinculos_ano_municipio" in log for log in _messages(manager.queue, "LOG"))
+
+    _run_with_timeout(manager.import_files_to_db, [str(txt)])
+    assert manager._missing_indexes() == []
+    manager._warn_missing_indexes()
+    assert not any("Aviso" in log for log in _messages(manager.queue, "LOG"))
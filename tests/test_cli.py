@@ -0,0 +1,40 @@
+"""Leitura dos argumentos e do arquivo de tarefa da execução sem interface (cli.parse_args)."""
+import json
+
+import pytest
+
+import cli
+
+def _parse(tmp_path, job, *argv):
+    path = tmp_path / "tarefa.json"
+    path.write_text(json.dumps(job), encoding='utf-8')
+    return cli.parse_args(["--job", str(path), *argv])[1]
+
+def test_job_values_become_defaults(tmp_path):
+    args = _parse(tmp_path, {"years": [2021], "output": "parquet", "compression": "zstd", "parse-workers": "3",
+                             "export": None, "normalized": True}, "--output", "db")
+    assert args.years == ["2021"]
+    assert args.output == "db"
+    assert args.compression == "zstd"
+    assert args.parse_workers == 3
+    assert args.export is None
+    assert args.normalized is True
+
+@pytest.mark.parametrize("job", [
+    {"compression": "bogus"},
+    {"output": "csv"},
+    {"export": "JSON"},
+    {"chunk_size": "muitas"},
+    {"normalized": "sim"},
+    {"files": "RAIS_VINC_PUB_*"},
+    {"inexistente": 1},
+])
+def test_invalid_job_values_are_rejected(tmp_path, capsys, job):
+    with pytest.raises(SystemExit) as exit_info:
+        _parse(tmp_path, job)
+    assert exit_info.value.code == cli.EXIT_USAGE
+    assert "error:" in capsys.readouterr().err
+
+def test_command_line_overrides_invalid_job_value(tmp_path):
+    # O valor da linha de comando prevalece e é o único usado
+    assert _parse(tmp_path, {"compression": "bogus"}, "--compression", "snappy").compression == "snappy"
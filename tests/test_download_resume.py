@@ -0,0 +1,176 @@
+"""Retomada de downloads interrompidos (worker_download contra um FTP local).
+
+Depende do pyftpdlib (benchmarks/requirements.txt).
+"""
+import multiprocessing
+import os
+from queue import Queue
+
+import pytest
+
+pytest.importorskip("pyftpdlib")
+
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import DTPHandler, FTPHandler
+from pyftpdlib.servers import FTPServer
+
+from src.controllers import download_manager
+from src.controllers.download_manager import worker_download
+
+FILE_SIZE = 3 * 1024 * 1024 + 123
+DROP_AFTER = 1024 * 1024
+
+def _serve(root, drops, address_queue):
+    """Servidor que derruba as conexões (dados e controle) nas primeiras `drops` transferências."""
+    authorizer = DummyAuthorizer()
+    authorizer.add_anonymous(root)
+    remaining = [drops]
+
+    class DroppingDTPHandler(DTPHandler):
+        def send(self, data):
+            if remaining[0] and self.tot_bytes_sent >= DROP_AFTER:
+                remaining[0] -= 1
+                self.cmd_channel.close()
+                return 0
+            return super().send(data)
+
+    class Handler(FTPHandler):
+        dtp_handler = DroppingDTPHandler
+        use_sendfile = False
+
+    Handler.authorizer = authorizer
+    server = FTPServer(("127.0.0.1", 0), Handler)
+    address_queue.put(server.address[1])
+    server.serve_forever(handle_exit=False)
+
+@pytest.fixture
+def ftp_root(tmp_path):
+    root = tmp_path / "ftp" / "2020"
+    root.mkdir(parents=True)
+    (root / "RAIS.7z").write_bytes(os.urandom(FILE_SIZE))
+    return tmp_path / "ftp"
+
+def _start_server(root, drops):
+    address_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(str(root), drops, address_queue), daemon=True)
+    process.start()
+    return process, f"127.0.0.1:{address_queue.get(timeout=10)}"
+
+def _drain(queue):
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get())
+    return messages
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(download_manager, "DOWNLOAD_RETRY_BACKOFF", 0)
+
+def test_download_resumes_after_dropped_connection(ftp_root, tmp_path):
+    process, host = _start_server(ftp_root, drops=2)
+    dest = tmp_path / "2020_RAIS.7z"
+    queue, result_queue = Queue(), Queue()
+    try:
+        worker_download(host, "/2020/RAIS.7z", str(dest), "2020", queue, result_queue)
+    finally:
+        process.terminate()
+        process.join()
+
+    assert result_queue.get_nowait() == (True, str(dest), "2020")
+    assert dest.read_bytes() == (ftp_root / "2020" / "RAIS.7z").read_bytes()
+    assert not os.path.exists(str(dest) + download_manager.PART_SUFFIX)
+    logs = [value for msg_type, value in _drain(queue) if msg_type == "LOG"]
+    assert sum(log.startswith("Retomando") for log in logs) == 2
+
+@pytest.fixture
+def small_segments(monkeypatch):
+    monkeypatch.setattr(download_manager, "SEGMENT_MIN_SIZE", 1024 * 1024)
+
+def _download(ftp_root, dest, drops, segments):
+    process, host = _start_server(ftp_root, drops)
+    queue, result_queue = Queue(), Queue()
+    try:
+        worker_download(host, "/2020/RAIS.7z", str(dest), "2020", queue, result_queue, segments)
+    finally:
+        process.terminate()
+        process.join()
+    logs = [value for msg_type, value in _drain(queue) if msg_type == "LOG"]
+    return result_queue.get_nowait(), logs
+
+def test_segmented_download_survives_dropped_connections(ftp_root, tmp_path, small_segments):
+    dest = tmp_path / "2020_RAIS.7z"
+    # Duas faixas de ~1,5 MB: as duas conexões caem depois de 1 MB
+    result, logs = _download(ftp_root, dest, drops=2, segments=2)
+
+    assert result == (True, str(dest), "2020")
+    assert any("download segmentado em 2 conexões" in log for log in logs)
+    assert sum(log.startswith("Conexão interrompida") for log in logs) == 2
+    assert dest.read_bytes() == (ftp_root / "2020" / "RAIS.7z").read_bytes()
+    assert not os.path.exists(str(dest) + download_manager.SEGMENTED_SUFFIX)
+    assert not os.path.exists(str(dest) + download_manager.SEGMENT_STATE_SUFFIX)
+
+@pytest.mark.parametrize("resume_segments", [1, 2])
+def test_failed_segmented_download_keeps_partial_data(ftp_root, tmp_path, small_segments, monkeypatch,
+                                                      resume_segments):
+    source = (ftp_root / "2020" / "RAIS.7z").read_bytes()
+    dest = tmp_path / "2020_RAIS.7z"
+    seg_path = str(dest) + download_manager.SEGMENTED_SUFFIX
+    state_path = str(dest) + download_manager.SEGMENT_STATE_SUFFIX
+    monkeypatch.setattr(download_manager, "DOWNLOAD_MAX_RETRIES", 0)
+    (ok, _, _), _ = _download(ftp_root, dest, drops=1, segments=2)
+
+    assert not ok
+    state = download_manager.SegmentState.load(state_path, seg_path, FILE_SIZE)
+    assert state is not None and 0 < state.done_bytes() < FILE_SIZE
+    with open(seg_path, 'rb') as f:
+        data = f.read()
+    for start, position, _ in state.ranges:
+        assert data[start:position] == source[start:position]
+
+    # Mesmo em fluxo único, a retomada continua as faixas em vez de recomeçar
+    monkeypatch.setattr(download_manager, "DOWNLOAD_MAX_RETRIES", 5)
+    result, logs = _download(ftp_root, dest, drops=0, segments=resume_segments)
+    assert result == (True, str(dest), "2020")
+    assert any(log.startswith(f"Retomando 2020_RAIS.7z: {state.done_bytes()} bytes") for log in logs)
+    assert dest.read_bytes() == source
+    assert not os.path.exists(seg_path) and not os.path.exists(state_path)
+
+def test_segment_state_from_another_file_size_is_discarded(ftp_root, tmp_path, small_segments):
+    dest = tmp_path / "2020_RAIS.7z"
+    seg_path = str(dest) + download_manager.SEGMENTED_SUFFIX
+    state_path = str(dest) + download_manager.SEGMENT_STATE_SUFFIX
+    download_manager.SegmentState.create(state_path, seg_path, FILE_SIZE + 10, 2).advance(0, 100)
+
+    result, logs = _download(ftp_root, dest, drops=0, segments=2)
+    assert result == (True, str(dest), "2020")
+    assert not any(log.startswith("Retomando") for log in logs)
+    assert dest.read_bytes() == (ftp_root / "2020" / "RAIS.7z").read_bytes()
+
+def test_local_io_error_is_not_retried(ftp_root, tmp_path):
+    process, host = _start_server(ftp_root, drops=0)
+    dest = tmp_path / "inexistente" / "2020_RAIS.7z"
+    queue, result_queue = Queue(), Queue()
+    try:
+        worker_download(host, "/2020/RAIS.7z", str(dest), "2020", queue, result_queue)
+    finally:
+        process.terminate()
+        process.join()
+
+    ok, path, error = result_queue.get_nowait()
+    assert not ok and "No such file or directory" in error
+    logs = [value for msg_type, value in _drain(queue) if msg_type == "LOG"]
+    assert not any("Nova tentativa" in log for log in logs)
+
+def test_remote_sizes_use_manager_host(ftp_root):
+    process, host = _start_server(ftp_root, drops=0)
+    queue = Queue()
+    manager = download_manager.DownloadManager(queue)
+    manager.ftp_host = host
+    try:
+        sizes = manager._fetch_remote_sizes([(host, "/2020/RAIS.7z", "2020_RAIS.7z", "2020", queue)])
+    finally:
+        process.terminate()
+        process.join()
+
+    assert sizes == {"/2020/RAIS.7z": FILE_SIZE}
+    assert not _drain(queue)
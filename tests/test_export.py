@@ -0,0 +1,63 @@
+import csv
+import os
+from queue import Queue
+
+import pytest
+
+from src.controllers.download_manager import _export_text
+from src.controllers.row_filter import RowFilter
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "RAIS_VINC_PUB_NI.txt")
+
+@pytest.fixture
+def sample_txt(tmp_path):
+    """As 300 primeiras linhas do arquivo de exemplo."""
+    with open(SAMPLE, 'rb') as f:
+        lines = [f.readline() for _ in range(301)]
+    path = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    path.write_bytes(b"".join(lines))
+    return path
+
+def _source_rows(path):
+    with open(path, encoding='latin-1') as f:
+        return [line.rstrip('\r\n').split(';') for line in f]
+
+def test_csv_export_keeps_source_text(sample_txt, tmp_path):
+    dest = tmp_path / "saida.csv"
+    assert _export_text(str(sample_txt), str(dest), "CSV", None, Queue()) == 300
+    with open(dest, encoding='utf-8', newline='') as f:
+        exported = list(csv.reader(f))
+    source = _source_rows(sample_txt)
+    # O pandas renomeia o segundo "Tipo Estab" do cabeçalho
+    assert exported[0] == [name if i != source[0].index('Tipo Estab', source[0].index('Tipo Estab') + 1)
+                           else 'Tipo Estab.1' for i, name in enumerate(source[0])]
+    assert exported[1:] == source[1:]
+
+def test_txt_export_with_filter_and_columns(sample_txt, tmp_path):
+    dest = tmp_path / "saida.txt"
+    source = _source_rows(sample_txt)
+    header = source[0]
+    age, pay = header.index('Idade'), header.index('Vl Remun Dezembro Nom')
+    expected = [[row[age], row[pay]] for row in source[1:] if 18 <= int(row[age]) <= 29]
+
+    rows = _export_text(str(sample_txt), str(dest), "TXT", ['Idade', 'Vl Remun Dezembro Nom'], Queue(),
+                        RowFilter.parse("Idade entre 18 e 29"))
+
+    with open(dest, encoding='utf-8') as f:
+        exported = [line.rstrip('\n').split('\t') for line in f]
+    assert rows == len(expected)
+    assert exported == [['Idade', 'Vl Remun Dezembro Nom']] + expected
+
+def test_excel_export_writes_typed_cells(sample_txt, tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    dest = tmp_path / "saida.xlsx"
+    assert _export_text(str(sample_txt), str(dest), "EXCEL", ['Idade', 'Município'], Queue()) == 300
+    sheet = openpyxl.load_workbook(dest).active
+    cells = list(sheet.iter_rows(values_only=True))
+    assert cells[0] == ('Idade', 'Município')
+    assert len(cells) == 301
+    source = _source_rows(sample_txt)
+    age = source[0].index('Idade')
+    assert [row[0] for row in cells[1:]] == [int(row[age]) for row in source[1:]]
+    # 999999 é o código de município ignorado
+    assert all(row[1] is None for row in cells[1:])
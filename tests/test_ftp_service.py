@@ -0,0 +1,31 @@
+"""Cache do catálogo do FTP (FTPService._load_cache / _save_cache)."""
+from queue import Queue
+
+import pytest
+
+from src.controllers.ftp_service import FTPService
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(FTPService, "CACHE_PATH", str(tmp_path / "data" / "ftp_catalog.json"))
+    return FTPService(Queue())
+
+def _catalog(host):
+    files = {'RAIS_NI.7z': {'size': 10, 'mdtm': "20210101000000"}}
+    return {'version': FTPService.CACHE_VERSION, 'host': host, 'dirs': {'2020': {'mdtm': None, 'files': files}}}
+
+def test_cache_is_reused_for_the_same_host(service):
+    service._save_cache(_catalog(service.FTP_HOST))
+    assert service._load_cache() == _catalog(service.FTP_HOST)
+
+def test_cache_from_another_host_is_ignored(service):
+    service._save_cache(_catalog("127.0.0.1:2121"))
+    assert service._load_cache() is None
+    service.FTP_HOST = "127.0.0.1:2121"
+    assert service._load_cache() == _catalog("127.0.0.1:2121")
+
+def test_cache_without_host_is_ignored(service):
+    catalog = _catalog(service.FTP_HOST)
+    del catalog['host']
+    service._save_cache(catalog)
+    assert service._load_cache() is None
@@ -0,0 +1,179 @@
+"""Manifesto de importações: reimportação idempotente, com substituição por conjunto de dados e ano."""
+import os
+import sqlite3
+from queue import Queue
+
+import py7zr
+import pytest
+
+from src.controllers import download_manager
+from src.controllers.aggregates import DEFAULT_AGGREGATES
+from src.controllers.download_manager import worker_process_db, worker_stream_import
+from src.controllers.import_manifest import (MANIFEST_TABLE, SOURCE_COLUMN, ImportManifest, import_options_key,
+                                             source_index_name, source_key)
+from src.controllers.index_builder import build_indexes
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "RAIS_VINC_PUB_NI.txt")
+ROWS = 4731
+
+@pytest.fixture
+def sources(tmp_path):
+    """O mesmo arquivo de 2020 extraído (.txt) e compactado (.7z), como ficam em data/."""
+    txt = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    txt.write_bytes(open(SAMPLE, 'rb').read())
+    archive = tmp_path / "2020_RAIS_VINC_PUB_NI.7z"
+    with py7zr.SevenZipFile(archive, 'w') as z:
+        z.write(SAMPLE, "RAIS_VINC_PUB_NI.txt")
+    return txt, archive
+
+def _import_txt(txt, db_path):
+    result_queue = Queue()
+    worker_process_db(str(txt), "2020", str(db_path), Queue(), result_queue=result_queue, aggregates=DEFAULT_AGGREGATES)
+    assert result_queue.get_nowait()[0]
+
+def _import_7z(archive, db_path):
+    result_queue = Queue()
+    worker_stream_import(str(archive), "2020", str(db_path), Queue(), result_queue, aggregates=DEFAULT_AGGREGATES)
+    assert result_queue.get_nowait()[0]
+
+def _counts(db_path):
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute("SELECT COUNT(*) FROM vinculos WHERE ano = 2020").fetchone()[0]
+        entries = conn.execute(f"SELECT arquivo FROM {MANIFEST_TABLE}").fetchall()
+    return rows, entries
+
+@pytest.mark.parametrize("first, second", [("txt", "7z"), ("7z", "txt"), ("txt", "txt")])
+def test_same_year_through_both_paths_is_replaced(sources, tmp_path, first, second, assert_aggregates_match):
+    txt, archive = sources
+    db_path = tmp_path / "rais.db"
+    importers = {'txt': lambda: _import_txt(txt, db_path), '7z': lambda: _import_7z(archive, db_path)}
+
+    importers[first]()
+    importers[second]()
+
+    rows, entries = _counts(db_path)
+    assert rows == ROWS
+    assert entries == [(f"2020_RAIS_VINC_PUB_NI.{second}",)]
+    assert_aggregates_match(db_path)
+
+def test_begin_removes_earlier_duplicate_sources(sources, tmp_path, assert_aggregates_match):
+    # Bancos gravados antes da correção podem ter o .txt e o .7z do mesmo ano como origens separadas
+    txt, archive = sources
+    db_path = tmp_path / "rais.db"
+    _import_txt(txt, db_path)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(f"UPDATE {MANIFEST_TABLE} SET arquivo = 'RAIS_VINC_PUB_NI.txt'")
+    _import_7z(archive, db_path)
+    with sqlite3.connect(db_path) as conn:
+        with conn:
+            conn.execute(f"INSERT INTO {MANIFEST_TABLE} (arquivo, ano, status) VALUES ('2020_RAIS_VINC_PUB_NI.txt', 2020, 'ok')")
+
+    _import_txt(txt, db_path)
+
+    rows, entries = _counts(db_path)
+    assert rows == ROWS
+    assert entries == [("2020_RAIS_VINC_PUB_NI.txt",)]
+    assert_aggregates_match(db_path)
+
+def test_unchanged_source_is_current(sources, tmp_path):
+    txt, archive = sources
+    db_path = tmp_path / "rais.db"
+    _import_7z(archive, db_path)
+    with sqlite3.connect(db_path) as conn:
+        manifest = ImportManifest(conn, "vinculos")
+        options = import_options_key()
+        assert manifest.is_current(manifest.source_info(str(archive), "2020"), options)
+        # Mesmo conteúdo em outro formato: não dá para comparar, então é reimportado
+        assert not manifest.is_current(manifest.source_info(str(txt), "2020"), options)
+
+@pytest.mark.parametrize("name, year, key", [
+    ("2020_RAIS_VINC_PUB_NI.txt", 2020, "rais_vinc_pub_ni"),
+    ("2020_RAIS_VINC_PUB_NI.7z", "2020", "rais_vinc_pub_ni"),
+    ("RAIS_VINC_PUB_NI.TXT", 2020, "rais_vinc_pub_ni"),
+    ("2019_RAIS_VINC_PUB_NI.txt", 2020, "2019_rais_vinc_pub_ni"),
+    ("RAIS_ESTAB_PUB.txt", None, "rais_estab_pub"),
+])
+def test_source_key(name, year, key):
+    assert source_key(name, year) == key
+
+def _snapshot(db_path):
+    with sqlite3.connect(db_path) as conn:
+        tables = ["vinculos", MANIFEST_TABLE] + [spec.name for spec in DEFAULT_AGGREGATES]
+        state = {t: sorted(conn.execute(f"SELECT * FROM {t}").fetchall(), key=repr) for t in tables}
+        state['indices'] = sorted(conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall())
+    return state
+
+def _fail_on_second_chunk(monkeypatch):
+    original = download_manager.SQLiteBulkLoader.write_chunk
+    calls = []
+
+    def write_chunk(self, chunk):
+        calls.append(len(chunk))
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("database or disk is full")
+        return original(self, chunk)
+
+    monkeypatch.setattr(download_manager.SQLiteBulkLoader, "write_chunk", write_chunk)
+
+def _reimport_batch(txt, db_path):
+    manager = download_manager.DownloadManager(Queue(), parse_workers=1)
+    manager.DB_PATH = str(db_path)
+    manager.import_files_to_db([str(txt)], replace=False)
+    messages = []
+    while not manager.queue.empty():
+        messages.append(manager.queue.get())
+    return [value for kind, value in messages if kind == "IMPORT_COMPLETE"][0]['ok']
+
+def _reimport_worker(txt, db_path):
+    result_queue = Queue()
+    worker_process_db(str(txt), "2020", str(db_path), Queue(), result_queue=result_queue,
+                      aggregates=DEFAULT_AGGREGATES, chunk_size=1000)
+    return result_queue.get_nowait()[0]
+
+@pytest.mark.parametrize("reimport", [_reimport_worker, _reimport_batch])
+def test_failed_reimport_leaves_year_unchanged(sources, tmp_path, monkeypatch, reimport, assert_aggregates_match):
+    txt, _ = sources
+    db_path = tmp_path / "rais.db"
+    _import_txt(txt, db_path)
+    with sqlite3.connect(db_path) as conn:
+        build_indexes(conn, "vinculos")
+    before = _snapshot(db_path)
+
+    # Conteúdo novo: a reimportação apaga as linhas antigas e falha no meio da nova carga
+    with open(txt, 'ab') as f:
+        f.write(open(SAMPLE, 'rb').read().split(b"\n", 2)[1] + b"\n")
+    monkeypatch.setattr(download_manager, "BATCH_IMPORT_CHUNK_SIZE", 1000)
+    _fail_on_second_chunk(monkeypatch)
+    assert not reimport(txt, db_path)
+
+    assert _snapshot(db_path) == before
+    assert_aggregates_match(db_path)
+    monkeypatch.undo()
+    assert reimport(txt, db_path)
+    assert _counts(db_path)[0] == ROWS + 1
+    assert_aggregates_match(db_path)
+
+def test_refresh_keeps_indexes_and_uses_source_index(sources, tmp_path):
+    txt, _ = sources
+    db_path = tmp_path / "rais.db"
+    _import_txt(txt, db_path)
+    with sqlite3.connect(db_path) as conn:
+        build_indexes(conn, "vinculos")
+        # Banco de uma versão anterior, sem o índice da origem, e um índice criado pelo usuário
+        conn.execute(f"DROP INDEX {source_index_name('vinculos')}")
+        conn.execute('CREATE INDEX idx_usuario ON vinculos ("Idade")')
+        indexes = {name: root for name, root in conn.execute(
+            "SELECT name, rootpage FROM sqlite_master WHERE type = 'index' AND tbl_name = 'vinculos'")}
+
+    with open(txt, 'ab') as f:
+        f.write(open(SAMPLE, 'rb').read().split(b"\n", 2)[1] + b"\n")
+    _import_txt(txt, db_path)
+
+    with sqlite3.connect(db_path) as conn:
+        after = {name: root for name, root in conn.execute(
+            "SELECT name, rootpage FROM sqlite_master WHERE type = 'index' AND tbl_name = 'vinculos'")}
+        plan = conn.execute(f"EXPLAIN QUERY PLAN DELETE FROM vinculos WHERE {SOURCE_COLUMN} = 1").fetchall()
+    # Os índices existentes não foram removidos nem recriados
+    assert {name: after[name] for name in indexes} == indexes
+    assert source_index_name('vinculos') in after
+    assert any(source_index_name('vinculos') in row[-1] for row in plan)
@@ -0,0 +1,84 @@
+"""Índice de linhas dos .txt extraídos (line_index.LineIndex)."""
+import os
+
+import pandas as pd
+import pytest
+
+from src.controllers.line_index import LineIndex
+
+HEADER = "Município;CBO Ocupação 2002;Vl Remun Média Nom"
+
+def _rows(count):
+    return [f"{350000 + i % 7};{212405 + i};{i},{i % 100:02d}" for i in range(count)]
+
+def _write(path, lines, newline="\n", trailing=True):
+    text = newline.join(lines) + (newline if trailing else "")
+    path.write_bytes(text.encode('latin-1'))
+    return str(path)
+
+def _expected(path):
+    return pd.read_csv(path, sep=';', encoding='latin-1', dtype=str, keep_default_na=False)
+
+CASES = {
+    'lf': {},
+    'sem_quebra_final': {'trailing': False},
+    'crlf': {'newline': "\r\n"},
+    'crlf_sem_quebra_final': {'newline': "\r\n", 'trailing': False},
+}
+
+@pytest.mark.parametrize("case", list(CASES))
+@pytest.mark.parametrize("count", [1, 9, 10, 11, 25])
+def test_rows_match_full_read(tmp_path, case, count):
+    path = _write(tmp_path / "2020_RAIS.txt", [HEADER] + _rows(count), **CASES[case])
+    # Passo pequeno: vários blocos e o fim caindo dentro e na borda de um bloco
+    index = LineIndex.build(path, stride=5)
+    expected = _expected(path)
+
+    assert index.row_count == count == len(expected)
+    assert index.header_end == len(HEADER) + len(CASES[case].get('newline', "\n"))
+    for first in range(count + 1):
+        for size in (1, 4, count):
+            rows = index.read_rows(first, size)
+            pd.testing.assert_frame_equal(rows, expected.iloc[first:first + size].reset_index(drop=True))
+
+@pytest.mark.parametrize("case", list(CASES))
+def test_byte_ranges_cover_whole_lines(tmp_path, case):
+    path = _write(tmp_path / "2020_RAIS.txt", [HEADER] + _rows(23), **CASES[case])
+    index = LineIndex.build(path, stride=4)
+    ranges = index.byte_ranges(40)
+    data = open(path, 'rb').read()
+
+    assert ranges[0][0] == index.header_end and ranges[-1][1] == len(data)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    lines = [line for start, end in ranges for line in data[start:end].splitlines()]
+    assert [line.decode('latin-1') for line in lines] == _rows(23)
+    assert index.byte_range(3, 5) == (data.index(_rows(23)[3].encode()), data.index(_rows(23)[5].encode()))
+
+@pytest.mark.parametrize("content, rows, header_end", [
+    (b"", 0, 0),
+    (HEADER.encode('latin-1'), 0, None),
+    (HEADER.encode('latin-1') + b"\n", 0, None),
+    (HEADER.encode('latin-1') + b"\r\n", 0, None),
+])
+def test_empty_and_header_only(tmp_path, content, rows, header_end):
+    path = tmp_path / "2020_RAIS.txt"
+    path.write_bytes(content)
+    index = LineIndex.build(str(path))
+    assert index.row_count == rows
+    assert index.header_end == (len(content) if header_end is None else header_end)
+    assert index.byte_ranges(40) == []
+    if content:
+        assert index.read_rows(0, 10).empty
+
+def test_saved_index_is_reused_until_the_file_changes(tmp_path):
+    path = _write(tmp_path / "2020_RAIS.txt", [HEADER] + _rows(12))
+    built = LineIndex.load_or_build(path)
+    loaded = LineIndex.load(path)
+    assert loaded is not None and loaded.row_count == built.row_count == 12
+    assert list(loaded.offsets) == list(built.offsets)
+
+    _write(tmp_path / "2020_RAIS.txt", [HEADER] + _rows(13))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert LineIndex.load(path) is None
+    assert LineIndex.load_or_build(path).row_count == 13
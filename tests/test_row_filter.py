@@ -0,0 +1,105 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from src.controllers.rais_schema import read_csv_options
+from src.controllers.row_filter import RowFilter
+
+# Como o parser entrega os chunks: espaços de preenchimento, vírgula decimal e marcadores de nulo
+SAMPLE = """Idade;Município;CBO Ocupação 2002;Vl Remun Dezembro Nom;Sexo Trabalhador;Observação
+  25;355030;  412205;0000001955,13;1;a
+  17;330455;  411010;0000000000,00;2;b
+  65;999999;  012345;0000003200,50;1;c
+  66;355030;  {ñ class};0000000800,00;2;d
+  30;330455;  412205;n/d;1;e
+"""
+
+@pytest.fixture
+def chunk():
+    return pd.read_csv(io.StringIO(SAMPLE), sep=';', **read_csv_options())
+
+def _kept(text, chunk):
+    return list(RowFilter.parse(text).apply(chunk)['Observação'])
+
+def test_parse_operators():
+    row_filter = RowFilter.parse("Idade entre 18 e 65; Município in (355030, 330455) ; Sexo Trabalhador != 2;"
+                                 "Vl Remun Dezembro Nom >= 1000,5")
+    assert row_filter.conditions == [
+        ('Idade', 'entre', [18.0, 65.0]),
+        ('Município', 'in', [355030.0, 330455.0]),
+        ('Sexo Trabalhador', '!=', [2.0]),
+        ('Vl Remun Dezembro Nom', '>=', [1000.5]),
+    ]
+    assert row_filter.columns == ['Idade', 'Município', 'Sexo Trabalhador', 'Vl Remun Dezembro Nom']
+
+def test_parse_text_codes_and_quotes():
+    row_filter = RowFilter.parse("CBO Ocupação 2002 = 12345\nObservação in ('a b', \"c\")")
+    # Códigos TEXT recebem os zeros à esquerda; a quebra de linha também separa condições
+    assert row_filter.conditions == [('CBO Ocupação 2002', '=', ['012345']), ('Observação', 'in', ['a b', 'c'])]
+
+def test_parse_empty_text():
+    assert RowFilter.parse("") is None
+    assert RowFilter.parse(" ; \n ") is None
+
+@pytest.mark.parametrize("text, message", [
+    ("Idade", "condição inválida: 'Idade'"),
+    ("Idade >", "condição inválida: 'Idade >'"),
+    ("Município in ()", "lista de valores vazia: 'Município in ()'"),
+    ("Idade = vinte", "valor numérico inválido para 'Idade': vinte"),
+    ("Idade entre 18 e x", "valor numérico inválido para 'Idade': x"),
+    ("UF = 35; Idade ~ 3", "condição inválida: 'Idade ~ 3'"),
+])
+def test_parse_errors(text, message):
+    with pytest.raises(ValueError) as error:
+        RowFilter.parse(text)
+    assert str(error.value) == message
+
+def test_equality_and_range(chunk):
+    assert _kept("Idade = 25", chunk) == ['a']
+    assert _kept("Idade entre 17 e 65", chunk) == ['a', 'b', 'c', 'e']
+    assert _kept("Idade > 25; Idade <= 65", chunk) == ['c', 'e']
+
+def test_conjunction(chunk):
+    assert _kept("Município in (355030, 330455); Sexo Trabalhador = 1", chunk) == ['a', 'e']
+
+def test_sentinels_and_nulls_never_match(chunk):
+    # 999999 é o código de município ignorado; n/d e {ñ class} são nulos
+    assert _kept("Município != 355030", chunk) == ['b', 'e']
+    assert _kept("Vl Remun Dezembro Nom < 1000", chunk) == ['b', 'd']
+    assert _kept("CBO Ocupação 2002 != 412205", chunk) == ['b', 'c']
+
+def test_text_codes_with_leading_zeros(chunk):
+    assert _kept("CBO Ocupação 2002 = 12345", chunk) == ['c']
+    assert _kept("CBO Ocupação 2002 in (412205, 411010)", chunk) == ['a', 'b', 'e']
+
+def test_column_outside_layout_compares_text(chunk):
+    assert _kept("Observação in (b, d)", chunk) == ['b', 'd']
+
+def test_missing_column(chunk):
+    with pytest.raises(ValueError, match="coluna do filtro não encontrada no arquivo: UF, Raça Cor"):
+        RowFilter.parse("UF = 35; Raça Cor = 1").apply(chunk)
+
+def test_apply_keeps_raw_values_and_drops_filter_columns(chunk):
+    kept = RowFilter.parse("Idade = 25").apply(chunk, drop_columns=['Idade'])
+    assert 'Idade' not in kept.columns
+    # As colunas fora do filtro continuam como o parser as entregou
+    assert kept['CBO Ocupação 2002'].tolist() == [412205]
+
+def test_counts(chunk):
+    row_filter = RowFilter.parse("Sexo Trabalhador = 2")
+    row_filter.record(len(chunk), len(row_filter.apply(chunk)))
+    assert row_filter.summary() == "Filtro de linhas: 5 linhas lidas, 2 mantidas (40.00%)."
+    row_filter.reset_counts()
+    assert (row_filter.rows_scanned, row_filter.rows_kept) == (0, 0)
+
+# Exemplos da documentação (docstring, --filter, interface e README)
+@pytest.mark.parametrize("text", [
+    "Município = 355030; Idade entre 18 e 29",
+    "Município in (355030, 330455); Vínculo Ativo 31/12 = 1; Idade entre 18 e 65",
+])
+def test_documented_examples_match_vinculos_layout(text):
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "RAIS_VINC_PUB_NI.txt")
+    vinculos = pd.read_csv(path, sep=';', encoding='latin-1', nrows=100, **read_csv_options())
+    RowFilter.parse(text).apply(vinculos)
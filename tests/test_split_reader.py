@@ -0,0 +1,59 @@
+"""Leitura paralela por faixas de bytes (split_reader) contra a leitura sequencial."""
+import os
+
+import pandas as pd
+import pytest
+
+from src.controllers.download_manager import _prepare_chunk
+from src.controllers.line_index import LineIndex
+from src.controllers.rais_schema import read_csv_options
+from src.controllers.split_reader import byte_ranges, iter_split_chunks, read_header
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "RAIS_VINC_PUB_NI.txt")
+READ_CSV_ARGS = {'sep': ';', 'encoding': 'latin-1', 'low_memory': False, **read_csv_options()}
+TRANSFORM_ARGS = (2020, True, None, [], True)
+
+@pytest.fixture(params=['lf', 'crlf', 'sem_quebra_final'])
+def sample(request, tmp_path):
+    with open(SAMPLE, 'rb') as f:
+        data = f.read()
+    if request.param == 'crlf':
+        data = data.replace(b"\r\n", b"\n").replace(b"\n", b"\r\n")
+    elif request.param == 'sem_quebra_final':
+        data = data.rstrip(b"\r\n")
+    path = tmp_path / "2020_RAIS_VINC_PUB_NI.txt"
+    path.write_bytes(data)
+    return str(path)
+
+def _serial(path, read_csv_args=READ_CSV_ARGS):
+    return _prepare_chunk(pd.read_csv(path, **read_csv_args), *TRANSFORM_ARGS)
+
+def _split(path, read_csv_args=READ_CSV_ARGS, range_bytes=64 * 1024):
+    chunks = list(iter_split_chunks(path, read_csv_args, 2, _prepare_chunk, TRANSFORM_ARGS, range_bytes=range_bytes))
+    return chunks, pd.concat(chunks, ignore_index=True)
+
+def test_byte_ranges_split_at_line_starts(sample):
+    _, header_end = read_header(sample)
+    ranges = byte_ranges(sample, header_end, 64 * 1024)
+    data = open(sample, 'rb').read()
+    assert len(ranges) > 3
+    assert ranges[0][0] == header_end and ranges[-1][1] == len(data)
+    assert all(a[1] == b[0] and data[b[0] - 1:b[0]] == b"\n" for a, b in zip(ranges, ranges[1:]))
+
+def test_split_read_matches_serial_read(sample):
+    chunks, parallel = _split(sample)
+    assert len(chunks) > 3
+    pd.testing.assert_frame_equal(parallel, _serial(sample))
+
+def test_split_read_with_line_index(sample):
+    LineIndex.load_or_build(sample)
+    chunks, parallel = _split(sample)
+    assert len(chunks) > 1
+    pd.testing.assert_frame_equal(parallel, _serial(sample))
+
+def test_split_read_with_selected_columns(sample):
+    wanted = {'Município', 'CBO Ocupação 2002', 'Vl Remun Média Nom'}
+    for usecols in (sorted(wanted), wanted.__contains__):
+        read_csv_args = {**READ_CSV_ARGS, 'usecols': usecols}
+        _, parallel = _split(sample, read_csv_args)
+        pd.testing.assert_frame_equal(parallel, _serial(sample, read_csv_args))